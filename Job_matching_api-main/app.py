@@ -1,25 +1,133 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Depends
+from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, Header, Query, Response
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from fastapi.responses import JSONResponse
+from typing import List, Literal, Optional, Dict, Any, Tuple
 from sqlalchemy.orm import Session
 from dotenv import load_dotenv
+from contextlib import asynccontextmanager
+import asyncio
 import os
+import secrets
 
 from services.job_matching import JobMatchingService
 from services.cv_processing import CVProcessingService
-from database.session import get_db
-from models.schemas import JobResponse, CVMatchResponse
+from services.match_sessions import MatchSessionStore, MatchSession, encode_cursor, decode_cursor
+from services.metrics import MetricsMiddleware, TimedRoute, metrics_response, record_cache, stage
+from services.singleflight import SingleFlight, request_key
+from services.profiling import Profiler, ProfilingMiddleware
+from services.warmup import Warmup
+from services.text_cleanup import get_encoding
+from services.azure_gateway import get_gateway
+from services.compression import CompressionMiddleware
+from services.resilience import DegradedModeMiddleware
+from services.projection import parse_fields
+from services.job_cache import JobDetailCache, etag_matches
+from services.suggest import KINDS, SuggestIndex
+from services.rebuild import RebuildOrchestrator, with_session
+from services.result_cache import corpus_version
+from services.task_queue import PRIORITIES, QueueFull, TaskQueue, validate_webhook_url
+from database.session import ReadSessionLocal, engine, init_db, read_engine, run_read, warm_pool
+from models.schemas import JobResponse, CVMatchResponse, JobFilters, MatchPage, MatchTask, Suggestion
 
 # Load environment variables
 load_dotenv()
 
+# Services are created on first use (or during warm-up), so a missing Azure setting or an
+# unreachable database keeps the pod unready instead of crashing the import
+job_matching_service: Optional[JobMatchingService] = None
+cv_processing_service: Optional[CVProcessingService] = None
+match_session_store = MatchSessionStore()
+# Typeahead over job titles, companies and skills; rebuilt when ingestion bumps the corpus version
+suggest_index = SuggestIndex()
+# Serialised job detail payloads with content-hash ETags, so repeat views skip the database
+job_detail_cache = JobDetailCache()
+# Shared caches may store job details but must revalidate them (cheap 304s thanks to the ETag)
+JOB_DETAIL_CACHE_CONTROL = os.getenv("JOB_DETAIL_CACHE_CONTROL", "public, no-cache")
+# Identical concurrent uploads (double clicks, client retries) share one extract + GPT + embed run
+match_flights = SingleFlight()
+
+def get_job_matching_service() -> JobMatchingService:
+    global job_matching_service
+    if job_matching_service is None:
+        job_matching_service = JobMatchingService()
+    return job_matching_service
+
+def get_cv_processing_service() -> CVProcessingService:
+    global cv_processing_service
+    if cv_processing_service is None:
+        cv_processing_service = CVProcessingService()
+    return cv_processing_service
+
+async def run_match_task(params: Dict[str, Any], content: bytes) -> List[Dict[str, Any]]:
+    """Worker side of /api/match-tasks: the /api/match-cv pipeline, with JSON-safe output"""
+    cv_content = await get_cv_processing_service().process_cv_content(content, params["filename"], params["mode"])
+    fields = tuple(params["fields"]) if params["fields"] is not None else None
+    matches = await run_read(lambda db: get_job_matching_service().find_matches(
+        cv_content=cv_content,
+        interests=params["interests"],
+        soft_skills=params["soft_skills"],
+        db=db,
+        limit=params["limit"],
+        filters=JobFilters(**params["filters"]),
+        mmr_lambda=params["mmr_lambda"],
+        fields=fields
+    ))
+    return jsonable_encoder(matches, exclude_unset=True)
+
+# Submit/poll matching: a bounded worker pool drains queued CVs by priority
+task_queue = TaskQueue(run_match_task)
+
+# Background rebuilds of the in-process indexes: each new generation is built, validated, then swapped in
+rebuilds = RebuildOrchestrator()
+
+def _start_rebuilds() -> None:
+    """Schedule the rebuilds once warm-up has built (or tried to build) the first generations"""
+    rebuilds.register(
+        "suggest_index", suggest_index.slot, lambda: with_session(ReadSessionLocal, suggest_index.build_generation),
+        suggest_index.refresh_seconds, validate=suggest_index.validate,
+        due=lambda: str(with_session(ReadSessionLocal, corpus_version)) != suggest_index.slot.version
+    )
+    get_job_matching_service().register_rebuilds(rebuilds, ReadSessionLocal)
+    rebuilds.start()
+
+# Startup work done in the background; /readyz reports 503 until the required steps succeed
+warmup = Warmup()
+warmup.add_step("database", init_db)
+warmup.add_step("connection_pool", warm_pool)
+warmup.add_step("services", lambda: (get_job_matching_service(), get_cv_processing_service()))
+warmup.add_step("tokenizer", lambda: (get_job_matching_service().warm_up(), get_encoding()), required=False)
+# Local keyword ranking used while the embedding provider is failing (FALLBACK_RANKER=none disables it)
+warmup.add_step("fallback_ranker", lambda: get_job_matching_service().build_fallback(ReadSessionLocal), required=False)
+warmup.add_step("suggest_index", lambda: with_session(ReadSessionLocal, suggest_index.build), required=False)
+if os.getenv("JOB_INDEX_MODE", "none") != "none":
+    warmup.add_step("job_index", lambda: get_job_matching_service().load_index())
+warmup.add_step("rebuilds", _start_rebuilds, required=False)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    task = asyncio.create_task(warmup.run())
+    await task_queue.start()
+    yield
+    task.cancel()
+    await task_queue.stop()
+    rebuilds.stop()
+    if job_matching_service is not None:
+        job_matching_service.close()
+    await get_gateway().aclose()
+    engine.dispose()
+    read_engine.dispose()
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Job Matching API",
     description="API for CV processing and job matching",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
+# Marks when each endpoint returns so response serialization shows up as its own stage
+app.router.route_class = TimedRoute
 
 # Configure CORS
 app.add_middleware(
@@ -30,36 +138,87 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize services
-job_matching_service = JobMatchingService()
-cv_processing_service = CVProcessingService()
+# X-Degraded header on responses served by a fallback (GPT summary or embeddings unavailable)
+app.add_middleware(DegradedModeMiddleware)
+
+# gzip / brotli response compression, negotiated per request from Accept-Encoding
+app.add_middleware(CompressionMiddleware)
+
+# Sampled and slow-request profiles, toggled through /admin/profiling
+profiler = Profiler()
+app.add_middleware(ProfilingMiddleware, profiler=profiler)
+
+# Per-stage latency histograms and Server-Timing headers (outermost, so it times everything)
+app.add_middleware(MetricsMiddleware)
+
+# Number of ranked matches kept per match session (upper bound for pagination)
+MATCH_SESSION_MAX_RESULTS = int(os.getenv("MATCH_SESSION_MAX_RESULTS", 200))
+# Largest `limit` / `page_size` a request may ask for
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", 100))
 
 class InterestsRequest(BaseModel):
     interests: str
     soft_skills: Optional[str] = None
 
-@app.post("/api/match-cv", response_model=List[JobResponse])
+class ProfilingSettings(BaseModel):
+    sample_rate: float = 0.0 # Fraction of requests to profile, 0 disables sampling
+    duration_seconds: Optional[int] = 300 # Sampling switches itself off after this long
+    slow_request_ms: Optional[float] = None # Requests slower than this are always captured
+    format: Optional[str] = None # "folded" (collapsed stacks) or "pstats"
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Allow the request only with the X-Admin-Token matching ADMIN_TOKEN"""
+    admin_token = os.getenv("ADMIN_TOKEN")
+    if not admin_token or not x_admin_token or not secrets.compare_digest(x_admin_token, admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+def field_projection(
+    fields: Optional[str] = Query(None, description="Comma-separated job fields to return, e.g. job_title,company,location "
+                                                    "(id and match_score are always included)")
+) -> Optional[Tuple[str, ...]]:
+    """Parse `fields=`; only the listed columns are selected from the database and serialized"""
+    try:
+        return parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/api/match-cv", response_model=List[JobResponse], response_model_exclude_unset=True)
 async def match_cv(
     cv_file: UploadFile = File(...),
     interests: Optional[str] = None,
     soft_skills: Optional[str] = None,
-    limit: int = 50, # Add limit parameter with default 50
-    db: Session = Depends(get_db)
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    mode: Optional[Literal["summary", "fast"]] = None, # "fast" skips the GPT summary (CV_PROCESSING_MODE default)
+    mmr_lambda: Optional[float] = Query(None, ge=0, le=1), # < 1 diversifies the results (MMR_LAMBDA default)
+    fields: Optional[Tuple[str, ...]] = Depends(field_projection),
+    filters: JobFilters = Depends()
 ):
     """Match CV with jobs in the database"""
     try:
-        # Process CV
-        cv_content = await cv_processing_service.process_cv(cv_file)
-        
-        # Match with jobs
-        matches = job_matching_service.find_matches(
-            cv_content=cv_content,
-            interests=interests,
-            soft_skills=soft_skills,
-            db=db,
-            limit=limit # Pass limit to the service function
-        )
-        
+        with stage("upload_read"):
+            content = await cv_file.read()
+
+        async def compute() -> List[JobResponse]:
+            # Process CV
+            cv_content = await get_cv_processing_service().process_cv_content(content, cv_file.filename, mode)
+
+            # Match with jobs (read-only, served by the replica when configured)
+            return await run_read(lambda db: get_job_matching_service().find_matches(
+                cv_content=cv_content,
+                interests=interests,
+                soft_skills=soft_skills,
+                db=db,
+                limit=limit, # Pass limit to the service function
+                filters=filters,
+                mmr_lambda=mmr_lambda,
+                fields=fields
+            ))
+
+        key = request_key(content, endpoint="match-cv", filename=cv_file.filename, interests=interests,
+                          soft_skills=soft_skills, limit=limit, mode=mode, mmr_lambda=mmr_lambda,
+                          fields=fields, filters=filters.model_dump())
+        matches, shared = await match_flights.do(key, compute)
+        record_cache("singleflight", shared)
         return matches
     except Exception as e:
         import traceback
@@ -67,30 +226,215 @@ async def match_cv(
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/jobs/{job_id}", response_model=JobResponse)
-async def get_job(job_id: int, db: Session = Depends(get_db)):
-    """Get job details by ID"""
+def _match_page(session: MatchSession, offset: int, page_size: int, db: Session,
+                fields: Optional[Tuple[str, ...]] = None) -> MatchPage:
+    """Hydrate one page of a cached ranking"""
+    page = session.ranked[offset:offset + page_size]
+    next_offset = offset + len(page)
+    return MatchPage(
+        result_id=session.result_id,
+        matches=get_job_matching_service().hydrate_matches(page, db, fields),
+        next_cursor=encode_cursor(next_offset) if next_offset < len(session.ranked) else None,
+        total=len(session.ranked),
+        expires_at=session.expires_at
+    )
+
+@app.post("/api/match-sessions", response_model=MatchPage, response_model_exclude_unset=True)
+async def create_match_session(
+    cv_file: UploadFile = File(...),
+    interests: Optional[str] = None,
+    soft_skills: Optional[str] = None,
+    page_size: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    mode: Optional[Literal["summary", "fast"]] = None,
+    mmr_lambda: Optional[float] = Query(None, ge=0, le=1),
+    fields: Optional[Tuple[str, ...]] = Depends(field_projection),
+    filters: JobFilters = Depends()
+):
+    """Match a CV once and keep the ranking so later pages are served by cursor"""
     try:
-        job = job_matching_service.get_job_by_id(job_id, db)
-        if not job:
-            raise HTTPException(status_code=404, detail="Job not found")
-        return job
+        with stage("upload_read"):
+            content = await cv_file.read()
+
+        async def compute() -> MatchSession:
+            cv_content = await get_cv_processing_service().process_cv_content(content, cv_file.filename, mode)
+            ranked = await run_read(lambda db: get_job_matching_service().rank_matches(
+                cv_content=cv_content,
+                interests=interests,
+                soft_skills=soft_skills,
+                db=db,
+                limit=MATCH_SESSION_MAX_RESULTS,
+                filters=filters,
+                mmr_lambda=mmr_lambda
+            ))
+            return match_session_store.create(ranked)
+
+        key = request_key(content, endpoint="match-sessions", filename=cv_file.filename, interests=interests,
+                          soft_skills=soft_skills, mode=mode, mmr_lambda=mmr_lambda, filters=filters.model_dump())
+        session, shared = await match_flights.do(key, compute)
+        record_cache("singleflight", shared)
+        return await run_read(lambda db: _match_page(session, 0, page_size, db, fields))
+    except Exception as e:
+        import traceback
+        print("Error in /api/match-sessions endpoint:")
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/match-sessions/{result_id}", response_model=MatchPage, response_model_exclude_unset=True)
+async def get_match_session_page(
+    result_id: str,
+    cursor: Optional[str] = None,
+    page_size: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[Tuple[str, ...]] = Depends(field_projection)
+):
+    """Return the page at `cursor` from a cached match ranking (no CV re-processing)"""
+    session = match_session_store.get(result_id)
+    record_cache("match_session", session is not None)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Match session not found or expired")
+    try:
+        offset = decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        return await run_read(lambda db: _match_page(session, offset, page_size, db, fields))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/jobs/search", response_model=List[JobResponse])
+@app.post("/api/match-tasks", response_model=MatchTask, status_code=202)
+async def create_match_task(
+    response: Response,
+    cv_file: UploadFile = File(...),
+    interests: Optional[str] = None,
+    soft_skills: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    mode: Optional[Literal["summary", "fast"]] = None,
+    mmr_lambda: Optional[float] = Query(None, ge=0, le=1),
+    fields: Optional[Tuple[str, ...]] = Depends(field_projection),
+    priority: Literal["low", "normal", "high"] = "normal",
+    webhook_url: Optional[str] = None, # Receives the finished task as a JSON POST
+    filters: JobFilters = Depends()
+):
+    """Queue a CV match and return its task id at once; poll /api/match-tasks/{task_id} or wait for the webhook"""
+    if webhook_url:
+        try:
+            await asyncio.to_thread(validate_webhook_url, webhook_url) # Resolves the host
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    with stage("upload_read"):
+        content = await cv_file.read()
+    params = {
+        "filename": cv_file.filename,
+        "interests": interests,
+        "soft_skills": soft_skills,
+        "limit": limit,
+        "mode": mode,
+        "mmr_lambda": mmr_lambda,
+        "fields": list(fields) if fields is not None else None,
+        "filters": filters.model_dump(mode="json"),
+    }
+    try:
+        task = await task_queue.submit(params, content, PRIORITIES[priority], webhook_url)
+    except QueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    response.headers["Location"] = f"/api/match-tasks/{task.task_id}"
+    return MatchTask(**task.to_dict())
+
+@app.get("/api/match-tasks/{task_id}", response_model=MatchTask, response_model_exclude_unset=True)
+async def get_match_task(task_id: str):
+    """Status of a queued match, with its results once it has succeeded"""
+    task = await task_queue.get(task_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail="Task not found or expired")
+    return MatchTask(**task.to_dict())
+
+# Declared before /api/jobs/{job_id} so that "search" is not captured as a job id
+@app.get("/api/jobs/search", response_model=List[JobResponse], response_model_exclude_unset=True)
 async def search_jobs(
     keyword: str,
-    limit: int = 10,
-    db: Session = Depends(get_db)
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[Tuple[str, ...]] = Depends(field_projection),
+    filters: JobFilters = Depends()
 ):
-    """Search jobs by keyword"""
+    """Search jobs by keyword, optionally narrowed by salary / seniority / work mode / location"""
     try:
-        jobs = job_matching_service.search_jobs_by_keyword(keyword, limit, db)
+        jobs = await run_read(lambda db: get_job_matching_service().search_jobs_by_keyword(
+            keyword, limit, db, filters=filters, fields=fields))
         return jobs
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Also declared before /api/jobs/{job_id}
+@app.get("/api/jobs/suggest", response_model=List[Suggestion])
+async def suggest_jobs(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=50),
+    kind: Optional[Literal["title", "company", "skill"]] = None
+):
+    """Typeahead: most frequent job titles, companies and skills with a word starting with `q` (served from memory)"""
+    return suggest_index.suggest(q, limit, (kind,) if kind else KINDS)
+
+@app.get("/api/jobs/{job_id}", response_model=JobResponse,
+         responses={304: {"description": "Not modified (If-None-Match matched the ETag)"}})
+async def get_job(job_id: str, if_none_match: Optional[str] = Header(None)):
+    """Get job details by ID (cached in memory, with a strong ETag for conditional requests)"""
+    entry = job_detail_cache.get(job_id)
+    record_cache("job_detail", entry is not None)
+    if entry is None:
+        try:
+            entry = await run_read(lambda db: job_detail_cache.load(job_id, db, get_job_matching_service().get_job_by_id))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        if entry is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+    headers = {"ETag": entry.etag, "Cache-Control": JOB_DETAIL_CACHE_CONTROL}
+    if etag_matches(if_none_match, entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+@app.get("/healthz", include_in_schema=False)
+async def healthz():
+    """Liveness: the process is up and the event loop is responsive"""
+    return {"status": "ok"}
+
+@app.get("/readyz", include_in_schema=False)
+async def readyz():
+    """Readiness: database, pools and services are warm"""
+    report = warmup.report()
+    return JSONResponse(status_code=200 if report["ready"] else 503, content=report)
+
+@app.get("/admin/profiling", include_in_schema=False, dependencies=[Depends(require_admin)])
+async def get_profiling():
+    """Current profiling settings and captured profiles"""
+    return profiler.status()
+
+@app.post("/admin/profiling", include_in_schema=False, dependencies=[Depends(require_admin)])
+async def set_profiling(settings: ProfilingSettings):
+    """Turn request sampling on or off and adjust the slow-request threshold"""
+    try:
+        profiler.configure(settings.sample_rate, settings.duration_seconds,
+                           settings.slow_request_ms, settings.format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return profiler.status()
+
+@app.get("/admin/rebuilds", include_in_schema=False, dependencies=[Depends(require_admin)])
+async def get_rebuilds():
+    """Served generation, in-flight and draining requests, and last rebuild outcome of each in-process index"""
+    return rebuilds.status()
+
+@app.post("/admin/rebuilds/{name}", status_code=202, include_in_schema=False, dependencies=[Depends(require_admin)])
+async def trigger_rebuild(name: str):
+    """Rebuild one index now (in the background), whether or not it is due"""
+    if name not in rebuilds.status():
+        raise HTTPException(status_code=404, detail=f"Unknown index: {name}")
+    rebuilds.trigger(name)
+    return {"structure": name, "status": "scheduled"}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics"""
+    return metrics_response()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8001)
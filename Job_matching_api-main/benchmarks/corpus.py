@@ -0,0 +1,137 @@
+"""Synthetic `job_postings_jobposting` corpus for offline benchmarks and load tests."""
+import random
+from typing import Dict, Iterator, List
+
+from sqlalchemy import insert
+from sqlalchemy.engine import Engine
+
+from models.database import Base, JobPosting
+from services.job_fields import extract_structured_fields
+
+_ROLES = [
+    "Software Engineer", "Data Scientist", "Data Engineer", "Machine Learning Engineer", "DevOps Engineer",
+    "Frontend Developer", "Backend Developer", "Product Manager", "UI/UX Designer", "Cloud Architect",
+    "Security Engineer", "QA Automation Engineer", "Mobile Developer", "Business Analyst", "Site Reliability Engineer",
+]
+_PREFIXES = ["", "", "Senior ", "Junior ", "Lead ", "Principal ", "Stagiaire ", "Staff "]
+_LEVELS = ["Entry level", "Associate", "Mid-Senior level", "Director", "Internship", "Not Applicable"]
+_COMPANIES = ["TechCorp", "DataTech", "CloudOps", "AILabs", "WebSolutions", "FinServe", "RetailCo", "HealthPlus",
+              "MobileApps", "SecureNet", "ProductCo", "DesignStudio", "ServerTech", "DataFlow", "BlockTech"]
+_LOCATIONS = [
+    "Paris, Île-de-France, France", "Casablanca, Casablanca-Settat, Morocco", "Rabat, Morocco (Hybrid)",
+    "New York, NY", "San Francisco, CA (Remote)", "London, England, United Kingdom", "Berlin, Germany",
+    "Remote", "Madrid, Spain (Hybrid)", "Toronto, Ontario, Canada", "Lyon, Auvergne-Rhône-Alpes, France",
+]
+_SKILLS = [
+    "Python", "Java", "JavaScript", "TypeScript", "React", "FastAPI", "Django", "Spring Boot", "SQL", "PostgreSQL",
+    "Docker", "Kubernetes", "Terraform", "AWS", "Azure", "GCP", "Spark", "Airflow", "TensorFlow", "PyTorch",
+    "scikit-learn", "Kafka", "Redis", "Go", "Rust", "Figma", "Swift", "Kotlin", "CI/CD", "Linux",
+]
+_SALARIES = [
+    "€45k-€55k", "€60,000 - €75,000 per year", "$120k-$150k", "$55/hour", "15 000 - 25 000 DH par mois",
+    "£70,000", "Up to £90k", "Competitive", "", "90000 USD", "400€ par jour",
+]
+
+def generate_jobs(count: int, seed: int = 42, id_prefix: str = "job", reposts: float = 0.0) -> Iterator[Dict[str, str]]:
+    """Yield `count` deterministic job posting rows (as column dicts).
+
+    A `reposts` fraction of the rows re-publish an earlier posting in another
+    location, as scraped LinkedIn data does.
+    """
+    rng = random.Random(seed)
+    previous: List[Dict[str, str]] = []
+    for i in range(count):
+        if reposts and previous and rng.random() < reposts:
+            row = dict(rng.choice(previous), id=f"{id_prefix}-{i:07d}", location=rng.choice(_LOCATIONS))
+            yield row
+            continue
+        role = rng.choice(_ROLES)
+        title = rng.choice(_PREFIXES) + role
+        skills = rng.sample(_SKILLS, 6)
+        company = rng.choice(_COMPANIES)
+        row = {
+            "id": f"{id_prefix}-{i:07d}",
+            "company": company,
+            "job_title": title,
+            "level": rng.choice(_LEVELS),
+            "location": rng.choice(_LOCATIONS),
+            "description": f"{company} is hiring a {title} to build products with {', '.join(skills[:3])}.",
+            "job_description": f"As a {role} you will design, ship and operate systems using {', '.join(skills)}. "
+                               f"You will collaborate with product, data and platform teams in an agile setup.",
+            "key_responsibilities": f"Own {skills[0]} services; improve {skills[1]} pipelines; mentor peers on {skills[2]}.",
+            "required_qualifications": f"{rng.randint(1, 8)}+ years with {skills[0]} and {skills[1]}; solid {skills[3]}.",
+            "preferred_qualifications": f"Experience with {skills[4]} or {skills[5]}.",
+            "benefits": "Health insurance, remote days, training budget.",
+            "salary": rng.choice(_SALARIES),
+            "application_instructions": "Apply on our careers page.",
+            "structured_content": None,
+        }
+        if reposts:
+            previous.append(row)
+        yield row
+
+def with_structured_fields(row: Dict[str, str]) -> Dict[str, str]:
+    """Add the typed columns the ingestion stage would have written"""
+    row.update(extract_structured_fields(JobPosting(**row)))
+    return row
+
+def seed_database(engine: Engine, count: int, seed: int = 42, chunk_size: int = 5000) -> int:
+    """Create the schema on `engine` and bulk insert `count` synthetic postings"""
+    Base.metadata.create_all(bind=engine)
+    inserted = 0
+    chunk: List[Dict[str, str]] = []
+    with engine.begin() as conn:
+        for row in generate_jobs(count, seed):
+            chunk.append(with_structured_fields(row))
+            if len(chunk) >= chunk_size:
+                conn.execute(insert(JobPosting), chunk)
+                inserted += len(chunk)
+                chunk = []
+        if chunk:
+            conn.execute(insert(JobPosting), chunk)
+            inserted += len(chunk)
+    return inserted
+
+SAMPLE_CV = """# Jane Doe
+Senior Data Engineer
+
+## Experience
+- Data Engineer at DataFlow (2019-Present): built Spark and Airflow pipelines on Azure, PostgreSQL warehousing
+- Backend Developer at TechCorp (2016-2019): Python, FastAPI and Docker microservices
+
+## Skills
+Python, SQL, Spark, Airflow, Kafka, Docker, Kubernetes, Azure, Terraform
+"""
+
+_NAMES = ["Jane Doe", "Amine El Idrissi", "Sofia Rossi", "Lukas Schmidt", "Chloé Martin", "Omar Benali", "Emily Chen"]
+
+def generate_cvs(count: int, seed: int = 7) -> Iterator[str]:
+    """Yield `count` markdown CVs shaped like pymupdf4llm output (repeated page headers, tables, contact lines)"""
+    rng = random.Random(seed)
+    for i in range(count):
+        name = rng.choice(_NAMES)
+        role = rng.choice(_ROLES)
+        skills = rng.sample(_SKILLS, 8)
+        companies = rng.sample(_COMPANIES, 2)
+        start = rng.randint(2012, 2018)
+        yield "\n".join([
+            f"{name} - Curriculum Vitae",
+            f"# {name}",
+            f"{name.split()[0].lower()}@example.com | +33 6 {rng.randint(10, 99)} 34 56 78 | [GitHub](https://github.com/u{i})",
+            f"## {rng.choice(_PREFIXES)}{role}",
+            "## Experience",
+            f"- **{role}** at {companies[0]} ({start + 3}-Present): {skills[0]} and {skills[1]} services, "
+            f"{skills[2]} pipelines",
+            f"- **{rng.choice(_ROLES)}** at {companies[1]} ({start}-{start + 3}): {skills[3]}, {skills[4]}",
+            "Page 1 of 2",
+            f"{name} - Curriculum Vitae",
+            "## Skills",
+            "|Skill|Level|",
+            "|---|---|",
+            *[f"|{skill}|{rng.choice(['Expert', 'Advanced', 'Intermediate'])}|" for skill in skills[:5]],
+            f"Also: {', '.join(skills[5:])}",
+            "## Education",
+            f"MSc Computer Science ({start - 2})",
+            "References available upon request",
+            "Page 2 of 2",
+        ])
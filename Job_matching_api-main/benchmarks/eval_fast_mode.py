@@ -0,0 +1,163 @@
+"""Offline comparison of fast-mode (no GPT) and summary-mode rankings on a sample of CVs.
+
+For every CV both modes rank the corpus; the report gives how much of the
+summary-mode top-k fast mode recovers (overlap@10, overlap@k, rank-biased
+overlap) next to each mode's CV processing latency:
+
+    python -m benchmarks.eval_fast_mode --azure --database-url "$DATABASE_URL" --cv cvs/*.pdf
+    python -m benchmarks.eval_fast_mode --rows 5000 --cvs 20   # dry run: synthetic corpus, fake clients
+
+Both modes rank the whole corpus through a job index: the one given with
+--index (a path saved by `python -m services.job_index build`), else one built
+in memory by embedding every posting. The scan path only scores the first
+max(3k, 100) rows, which would compare rankings of an arbitrary subset.
+
+Only runs with --azure measure real quality; the fake GPT client echoes the CV,
+so dry runs only exercise the pipeline.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+from sqlalchemy import func, inspect, select
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.corpus import generate_cvs, seed_database
+from benchmarks.fakes import FakeEmbeddings, FakeOpenAIClient
+from benchmarks.run import RESULTS_DIR, git_commit, make_engine
+from models.database import JobPosting
+from services.cv_processing import CVProcessingService
+from services.job_index import JobIndex
+from services.job_matching import JobMatchingService
+
+def rank_biased_overlap(a: Sequence[str], b: Sequence[str], p: float = 0.9) -> float:
+    """Extrapolated RBO of two rankings (1.0 = identical order), weighting the top ranks most"""
+    depth = min(len(a), len(b))
+    if depth == 0:
+        return 0.0
+    seen_a, seen_b, overlap, total = set(), set(), 0, 0.0
+    for d in range(1, depth + 1):
+        x, y = a[d - 1], b[d - 1]
+        if x == y:
+            overlap += 1
+        else:
+            overlap += (x in seen_b) + (y in seen_a)
+        seen_a.add(x)
+        seen_b.add(y)
+        total += p ** (d - 1) * overlap / d
+    return (1 - p) * total + p ** depth * overlap / depth
+
+def overlap_at(a: Sequence[str], b: Sequence[str], k: int) -> float:
+    return len(set(a[:k]) & set(b[:k])) / k if k else 0.0
+
+def load_cvs(paths: Optional[List[str]], count: int) -> List[Tuple[str, bytes]]:
+    if not paths:
+        return [(f"synthetic-{i}.md", cv.encode()) for i, cv in enumerate(generate_cvs(count))]
+    cvs = []
+    for path in paths:
+        with open(path, "rb") as f:
+            cvs.append((os.path.basename(path), f.read()))
+    return cvs
+
+async def evaluate(cvs: List[Tuple[str, bytes]], cv_service: CVProcessingService, matching: JobMatchingService,
+                   db, k: int) -> List[Dict[str, object]]:
+    rows = []
+    for filename, content in cvs:
+        rankings, latencies = {}, {}
+        for mode in ("summary", "fast"):
+            start = time.perf_counter()
+            text = await cv_service.process_cv_content(content, filename, mode)
+            latencies[mode] = (time.perf_counter() - start) * 1000
+            with contextlib.redirect_stdout(io.StringIO()):
+                rankings[mode] = [job_id for job_id, _ in matching.rank_matches(text, db=db, limit=k)]
+        row = {
+            "cv": filename,
+            "overlap_at_10": overlap_at(rankings["summary"], rankings["fast"], 10),
+            f"overlap_at_{k}": overlap_at(rankings["summary"], rankings["fast"], k),
+            "rbo": rank_biased_overlap(rankings["summary"], rankings["fast"]),
+            "summary_ms": latencies["summary"],
+            "fast_ms": latencies["fast"],
+        }
+        print(f"{filename:<32} overlap@10={row['overlap_at_10']:.2f} overlap@{k}={row[f'overlap_at_{k}']:.2f} "
+              f"rbo={row['rbo']:.3f} summary={row['summary_ms']:8.1f}ms fast={row['fast_ms']:7.1f}ms")
+        rows.append(row)
+    return rows
+
+def main(argv: Optional[List[str]] = None) -> None:
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--azure", action="store_true", help="use the Azure OpenAI clients configured in the environment")
+    parser.add_argument("--database-url", default="sqlite://",
+                        help="corpus to rank (default: in-memory SQLite seeded with --rows synthetic postings)")
+    parser.add_argument("--rows", type=int, default=2000, help="postings to seed into an empty database")
+    parser.add_argument("--cv", nargs="*", help="CV files (PDF or markdown); default: synthetic CVs")
+    parser.add_argument("--cvs", type=int, default=10, help="number of synthetic CVs")
+    parser.add_argument("--k", type=int, default=50)
+    parser.add_argument("--index", help="saved job index to rank with (default: embed the corpus into a new one)")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<timestamp>-<commit>-fast-mode-eval.json)")
+    args = parser.parse_args(argv)
+
+    engine = make_engine(args.database_url)
+    has_rows = inspect(engine).has_table(JobPosting.__tablename__) and engine.connect().execute(
+        select(func.count()).select_from(JobPosting)).scalar()
+    if not has_rows:
+        seed_database(engine, args.rows)
+    db = sessionmaker(bind=engine, autocommit=False, autoflush=False)()
+
+    if args.azure:
+        cv_service, matching = CVProcessingService(), JobMatchingService()
+    else:
+        cv_service = CVProcessingService(openai_client=FakeOpenAIClient())
+        matching = JobMatchingService(embeddings_client=FakeEmbeddings())
+    matching.result_cache = None # Every ranking is computed, not served from the other mode's run
+    if args.index:
+        index = JobIndex.load(args.index)
+    else:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            index = JobIndex.build(db, matching.embed_documents, model=matching.embedding_deployment_name,
+                                   version="eval")
+        print(f"Embedded {len(index)} postings into an in-memory index in {time.perf_counter() - start:.1f}s")
+    matching.index_slot.swap((index, matching._query_client(index.model)), index.version)
+
+    try:
+        rows = asyncio.run(evaluate(load_cvs(args.cv, args.cvs), cv_service, matching, db, args.k))
+    finally:
+        db.close()
+
+    summary = {key: float(np.mean([row[key] for row in rows]))
+               for key in rows[0] if key != "cv"} if rows else {}
+    summary["summary_p50_ms"] = float(np.percentile([row["summary_ms"] for row in rows], 50)) if rows else 0.0
+    summary["fast_p50_ms"] = float(np.percentile([row["fast_ms"] for row in rows], 50)) if rows else 0.0
+    print("\nMean: " + "  ".join(f"{key}={value:.3f}" for key, value in summary.items()))
+
+    commit = git_commit()
+    timestamp = datetime.now(timezone.utc)
+    output = args.output or os.path.join(RESULTS_DIR, f"{timestamp:%Y%m%dT%H%M%S}-{commit}-fast-mode-eval.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({
+            "meta": {
+                "commit": commit,
+                "timestamp": timestamp.isoformat(),
+                "python": platform.python_version(),
+                "clients": "azure" if args.azure else "fake",
+                "k": args.k,
+                "indexed_jobs": len(index),
+            },
+            "summary": summary,
+            "cvs": rows,
+        }, f, indent=2)
+    print(f"\nResults written to {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Deterministic, offline stand-ins for the Azure OpenAI and Redis clients used by the services."""
+import re
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+_TOKEN_RE = re.compile(r"[a-z0-9+#]+")
+
+class FakeEmbeddings:
+    """Hashed bag-of-words embeddings with the same interface as langchain's AzureOpenAIEmbeddings.
+
+    Texts sharing words get similar vectors, so rankings are meaningful, and the
+    same text always maps to the same vector across runs and processes.
+    """
+
+    def __init__(self, dimension: int = 1536):
+        self.dimension = dimension
+        self.calls = 0
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for token in _TOKEN_RE.findall(text.lower()):
+            h = zlib.crc32(token.encode())
+            vector[h % self.dimension] += 1.0 if (h >> 16) & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        self.calls += 1
+        return self._embed(text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        return [self._embed(text) for text in texts]
+
+class _Obj:
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+class FakeOpenAIClient:
+    """Subset of the openai client (`embeddings.create`, `chat.completions.create`) backed by FakeEmbeddings"""
+
+    def __init__(self, dimension: int = 1536):
+        self._embeddings = FakeEmbeddings(dimension)
+        self.embeddings = _Obj(create=self._create_embeddings)
+        self.chat = _Obj(completions=_Obj(create=self._create_completion))
+
+    def _create_embeddings(self, input: Union[str, List[str]], model: str = None, **kwargs):
+        texts = [input] if isinstance(input, str) else list(input)
+        vectors = self._embeddings.embed_documents(texts)
+        return _Obj(data=[_Obj(embedding=v, index=i) for i, v in enumerate(vectors)])
+
+    def _create_completion(self, messages=None, model: str = None, **kwargs):
+        # Echo the prompt's tail: summaries stay deterministic and keep the CV's vocabulary
+        content = messages[-1]["content"] if messages else ""
+        summary = "**Keywords**: " + " ".join(_TOKEN_RE.findall(content.lower())[-300:])
+        return _Obj(choices=[_Obj(message=_Obj(content=summary, role="assistant"))])
+
+class FakeRedis:
+    """In-memory subset of redis.Redis (get / set with ex= / delete / incr) for RedisBackend without a server"""
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[Optional[float], bytes]] = {}
+
+    def get(self, key: str) -> Optional[bytes]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry[0] is not None and entry[0] < time.time():
+            del self._data[key]
+            return None
+        return entry[1]
+
+    def set(self, key: str, value: Union[bytes, str, int], ex: Optional[int] = None) -> bool:
+        if not isinstance(value, bytes):
+            value = str(value).encode()
+        self._data[key] = (time.time() + ex if ex else None, value)
+        return True
+
+    def delete(self, *keys: str) -> int:
+        return sum(self._data.pop(key, None) is not None for key in keys)
+
+    def incr(self, key: str) -> int:
+        value = int(self.get(key) or 0) + 1
+        self.set(key, value)
+        return value
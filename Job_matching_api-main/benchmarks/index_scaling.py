@@ -0,0 +1,126 @@
+"""Query throughput of the job index in-process and sharded across 1..N worker processes.
+
+Builds a random normalised job matrix, then drives each configuration with
+concurrent client threads and reports queries/s, latency percentiles and the
+speedup over a single shard:
+
+    python -m benchmarks.index_scaling --rows 200000 --workers 1 2 4 8 --clients 16
+"""
+import argparse
+import json
+import os
+import platform
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.run import RESULTS_DIR, git_commit
+from services.job_index import JobIndex, ShardedJobIndex, normalize_rows
+
+def build_index(path: str, rows: int, dimension: int, seed: int = 42) -> None:
+    rng = np.random.default_rng(seed)
+    vectors = np.empty((rows, dimension), dtype=np.float32)
+    for start in range(0, rows, 50_000):
+        stop = min(rows, start + 50_000)
+        vectors[start:stop] = normalize_rows(rng.standard_normal((stop - start, dimension), dtype=np.float32))
+    ids = np.array([f"job-{i:07d}" for i in range(rows)], dtype=str)
+    JobIndex(ids, vectors, version="benchmark").save(path)
+
+def drive(index, name: str, rows: int, queries: np.ndarray, clients: int, k: int) -> Dict[str, float]:
+    """Run all queries through `clients` threads and summarize throughput and latency"""
+    latencies: List[float] = []
+    lock = threading.Lock()
+    next_query = iter(range(len(queries)))
+
+    def client() -> None:
+        local = []
+        while True:
+            with lock:
+                i = next(next_query, None)
+            if i is None:
+                break
+            start = time.perf_counter()
+            index.search(queries[i], k)
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    for query in queries[:3]: # Warm page cache and connections
+        index.search(query, k)
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies_ms = np.array(latencies) * 1000
+    result = {
+        "name": name,
+        "rows": rows,
+        "queries": len(queries),
+        "clients": clients,
+        "qps": len(queries) / elapsed,
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+    }
+    print(f"{name:<14} rows={rows:<8} qps={result['qps']:9.1f} p50={result['p50_ms']:8.2f}ms p99={result['p99_ms']:8.2f}ms")
+    return result
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--dimension", type=int, default=1536)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--clients", type=int, default=8, help="concurrent query threads")
+    parser.add_argument("--queries", type=int, default=400)
+    parser.add_argument("--k", type=int, default=50)
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<timestamp>-<commit>-index-scaling.json)")
+    args = parser.parse_args(argv)
+
+    queries = normalize_rows(np.random.default_rng(7).standard_normal((args.queries, args.dimension), dtype=np.float32))
+    results = []
+    with tempfile.TemporaryDirectory() as path:
+        print(f"Building a {args.rows} x {args.dimension} index ...")
+        build_index(path, args.rows, args.dimension)
+
+        results.append(drive(JobIndex.load(path), "in-process", args.rows, queries, args.clients, args.k))
+        for workers in args.workers:
+            index = ShardedJobIndex.spawn(path, workers)
+            try:
+                results.append(drive(index, f"shards={workers}", args.rows, queries, args.clients, args.k))
+            finally:
+                index.close()
+
+    sharded = [r for r in results if r["name"].startswith("shards=")]
+    if sharded:
+        print("\nScaling (qps relative to shards=%s):" % sharded[0]["name"].split("=")[1])
+        for result in sharded:
+            speedup = result["qps"] / sharded[0]["qps"]
+            print(f"  {result['name']:<10} {speedup:5.2f}x {'#' * int(round(speedup * 10))}")
+
+    commit = git_commit()
+    timestamp = datetime.now(timezone.utc)
+    output = args.output or os.path.join(RESULTS_DIR, f"{timestamp:%Y%m%dT%H%M%S}-{commit}-index-scaling.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({
+            "meta": {
+                "commit": commit,
+                "timestamp": timestamp.isoformat(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "dimension": args.dimension,
+                "k": args.k,
+            },
+            "results": results,
+        }, f, indent=2)
+    print(f"\nResults written to {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+"""Offline micro-benchmarks for the matching, search and ingestion hot paths.
+
+Runs against a synthetic corpus in SQLite (or any DATABASE_URL-style URL passed
+with --database-url) with deterministic fake embeddings, so no Azure quota or
+network is needed. Results are written as JSON for comparison across commits:
+
+    python -m benchmarks.run --rows 1000 100000
+    python -m benchmarks.run --rows 1000 --compare benchmarks/results/<previous>.json
+"""
+import argparse
+import contextlib
+import gzip
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from benchmarks.corpus import SAMPLE_CV, generate_jobs, seed_database
+from benchmarks.fakes import FakeEmbeddings, FakeOpenAIClient
+from models.database import JobPosting, WorkMode
+from models.schemas import JobFilters
+from services.ingestion import JobIngestionPipeline
+from services.job_index import JobIndex
+from services.job_matching import JobMatchingService
+from services.suggest import SuggestIndex
+from services.job_cache import JobDetailCache
+from services.rebuild import RebuildOrchestrator, with_session
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+MIN_ROWS, MAX_ROWS = 1_000, 1_000_000
+
+def measure(name: str, rows: int, fn: Callable[[int], None], iterations: int,
+            items_per_call: int = 1, warmup: int = 2) -> Dict[str, float]:
+    """Time `fn(i)` over `iterations` calls and summarize latency percentiles and throughput"""
+    # The services print progress on every call; keep it out of the timings' terminal output
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(warmup):
+            fn(i)
+        samples = []
+        for i in range(iterations):
+            start = time.perf_counter()
+            fn(warmup + i)
+            samples.append(time.perf_counter() - start)
+    latencies_ms = np.array(samples) * 1000
+    total = float(np.sum(samples))
+    result = {
+        "name": name,
+        "rows": rows,
+        "iterations": iterations,
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+        "mean_ms": float(np.mean(latencies_ms)),
+        "ops_per_sec": iterations / total if total else float("inf"),
+        "items_per_sec": items_per_call * iterations / total if total else float("inf"),
+    }
+    print(f"{name:<28} rows={rows:<8} p50={result['p50_ms']:9.3f}ms p99={result['p99_ms']:9.3f}ms "
+          f"{result['items_per_sec']:12.1f} items/s")
+    return result
+
+def make_engine(database_url: str):
+    """Create an engine; in-memory SQLite needs a single shared connection"""
+    if database_url in ("sqlite://", "sqlite:///:memory:"):
+        return create_engine(database_url, connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    return create_engine(database_url)
+
+def bench_corpus(rows: int, database_url: str, iterations: int, only: Optional[List[str]]) -> List[Dict[str, float]]:
+    """Seed a corpus of `rows` postings and run every benchmark against it"""
+    engine = make_engine(database_url)
+    start = time.perf_counter()
+    seed_database(engine, rows)
+    print(f"Seeded {rows} postings in {time.perf_counter() - start:.1f}s")
+
+    Session = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+    service = JobMatchingService(embeddings_client=FakeEmbeddings())
+    # The same CV is matched on every iteration; measure the uncached path unless asked otherwise
+    result_cache, service.result_cache = service.result_cache, None
+    rng = random.Random(7)
+    ids = [f"job-{rng.randrange(rows):07d}" for _ in range(1024)]
+    results = []
+
+    def wanted(name: str) -> bool:
+        return not only or any(name.startswith(prefix) for prefix in only)
+
+    db = Session()
+    try:
+        for limit in (10, 50):
+            if wanted(f"find_matches[limit={limit}]"):
+                results.append(measure(f"find_matches[limit={limit}]", rows,
+                                       lambda i, limit=limit: service.find_matches(SAMPLE_CV, db=db, limit=limit),
+                                       iterations))
+
+        if wanted("find_matches_diverse"):
+            results.append(measure("find_matches_diverse[limit=10]", rows,
+                                   lambda i: service.find_matches(SAMPLE_CV, db=db, limit=10, mmr_lambda=0.7),
+                                   iterations))
+
+        if wanted("find_matches_cached") and result_cache is not None:
+            # Only rankings of the whole corpus are cached, so this one is served from a job index
+            indexed = JobMatchingService(embeddings_client=FakeEmbeddings())
+            indexed.result_cache = result_cache
+            with contextlib.redirect_stdout(io.StringIO()):
+                index = JobIndex.build(db, indexed.embed_documents, model=indexed.embedding_deployment_name,
+                                       version="bench")
+                indexed.index_slot.swap((index, None), index.version)
+                indexed.find_matches(SAMPLE_CV, db=db, limit=50)
+            # limit=10 is answered from the cached limit=50 ranking
+            results.append(measure("find_matches_cached[limit=10]", rows,
+                                   lambda i: indexed.find_matches(SAMPLE_CV, db=db, limit=10),
+                                   iterations))
+
+        if wanted("fallback_rank"):
+            # Keyword ranking served while the embedding provider is down
+            with contextlib.redirect_stdout(io.StringIO()):
+                service.build_fallback(Session)
+            results.append(measure("fallback_rank[limit=10]", rows,
+                                   lambda i: service._fallback_rank(SAMPLE_CV, db, 10, None),
+                                   iterations))
+
+        keywords = ["python", "kubernetes", "data engineer", "figma", "nonexistent-term"]
+        if wanted("search_jobs_by_keyword"):
+            results.append(measure("search_jobs_by_keyword", rows,
+                                   lambda i: service.search_jobs_by_keyword(keywords[i % len(keywords)], 10, db),
+                                   iterations))
+        list_fields = ("job_title", "company", "location", "salary")
+        if wanted("search_jobs_projected"):
+            results.append(measure("search_jobs_projected", rows,
+                                   lambda i: service.search_jobs_by_keyword(keywords[i % len(keywords)], 10, db,
+                                                                            fields=list_fields),
+                                   iterations))
+        if wanted("search_jobs_filtered"):
+            filters = JobFilters(work_mode=WorkMode.REMOTE, min_salary=50000)
+            results.append(measure("search_jobs_filtered", rows,
+                                   lambda i: service.search_jobs_by_keyword(keywords[i % len(keywords)], 10, db, filters),
+                                   iterations))
+
+        if wanted("suggest"):
+            suggest_index = SuggestIndex()
+            with contextlib.redirect_stdout(io.StringIO()):
+                suggest_index.build(db)
+            prefixes = ["d", "da", "dat", "eng", "py", "senior d", "kub", "fig", "dataf", "zz"]
+            results.append(measure("suggest[limit=10]", rows,
+                                   lambda i: suggest_index.suggest(prefixes[i % len(prefixes)], 10),
+                                   iterations * 100))
+
+        if wanted("suggest_during_rebuild"):
+            # The same lookups while the orchestrator rebuilds the suggestion index back to back in the background
+            rebuilt_index = SuggestIndex()
+            rebuilds = RebuildOrchestrator()
+            rebuilds.register("suggest_index", rebuilt_index.slot,
+                              lambda: with_session(Session, rebuilt_index.build_generation), 3600,
+                              validate=rebuilt_index.validate)
+            with contextlib.redirect_stdout(io.StringIO()):
+                rebuilds.run("suggest_index")
+            stop = threading.Event()
+
+            def rebuild_continuously():
+                while not stop.is_set():
+                    rebuilds.run("suggest_index", force=True)
+
+            thread = threading.Thread(target=rebuild_continuously, daemon=True)
+            thread.start()
+            prefixes = ["d", "da", "dat", "eng", "py", "senior d", "kub", "fig", "dataf", "zz"]
+            try:
+                results.append(measure("suggest_during_rebuild[limit=10]", rows,
+                                       lambda i: rebuilt_index.suggest(prefixes[i % len(prefixes)], 10),
+                                       iterations * 100))
+            finally:
+                stop.set()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    thread.join()
+
+        if wanted("get_job_by_id"):
+            results.append(measure("get_job_by_id", rows,
+                                   lambda i: service.get_job_by_id(ids[i % len(ids)], db),
+                                   iterations * 10))
+
+        if wanted("job_detail_cache"):
+            job_cache = JobDetailCache(max_entries=len(ids))
+            for job_id in ids:
+                job_cache.load(job_id, db, service.get_job_by_id)
+            results.append(measure("job_detail_cache[hit]", rows,
+                                   lambda i: job_cache.get(ids[i % len(ids)]),
+                                   iterations * 100))
+
+        if wanted("serialize_responses"):
+            with contextlib.redirect_stdout(io.StringIO()):
+                matches = service.find_matches(SAMPLE_CV, db=db, limit=50)
+            results.append(measure("serialize_responses[50]", rows,
+                                   lambda i: JSONResponse(content=jsonable_encoder(matches)).body,
+                                   iterations * 10, items_per_call=len(matches)))
+        if wanted("serialize_responses_projected"):
+            # List-view payload: only the columns a result card shows
+            with contextlib.redirect_stdout(io.StringIO()):
+                matches = service.find_matches(SAMPLE_CV, db=db, limit=50, fields=list_fields)
+            results.append(measure("serialize_responses_projected[50]", rows,
+                                   lambda i: JSONResponse(content=jsonable_encoder(matches, exclude_unset=True)).body,
+                                   iterations * 10, items_per_call=len(matches)))
+        if wanted("compress_responses"):
+            with contextlib.redirect_stdout(io.StringIO()):
+                body = JSONResponse(content=jsonable_encoder(service.find_matches(SAMPLE_CV, db=db, limit=50))).body
+            results.append(measure("compress_responses[gzip]", rows,
+                                   lambda i: gzip.compress(body, compresslevel=6),
+                                   iterations * 10))
+
+        batch = 500
+        pipeline = JobIngestionPipeline()
+        if wanted("ingest_jobs"):
+            results.append(measure("ingest_jobs[batch=500]", rows,
+                                   lambda i: pipeline.ingest(
+                                       (JobPosting(**row) for row in generate_jobs(batch, seed=i, id_prefix=f"ingest-{i}")),
+                                       db, batch_size=batch),
+                                   max(3, iterations // 10), items_per_call=batch))
+        if wanted("ingest_jobs_reposts"):
+            # A third of the batch re-posts earlier postings: exercises near-duplicate clustering
+            results.append(measure("ingest_jobs_reposts[batch=500]", rows,
+                                   lambda i: pipeline.ingest(
+                                       (JobPosting(**row) for row in generate_jobs(batch, seed=i, id_prefix=f"repost-{i}",
+                                                                                   reposts=0.3)),
+                                       db, batch_size=batch),
+                                   max(3, iterations // 10), items_per_call=batch))
+    finally:
+        db.close()
+
+    if wanted("store_batch_jobs"):
+        if engine.dialect.name == "postgresql":
+            results.append(bench_store_batch_jobs(engine, rows, iterations))
+        else:
+            print("store_batch_jobs                skipped (JobEmbeddingStore needs PostgreSQL; pass --database-url)")
+    engine.dispose()
+    return results
+
+def bench_store_batch_jobs(engine, rows: int, iterations: int) -> Dict[str, float]:
+    """Time the legacy JobEmbeddingStore.store_batch_jobs with the fake embedding client"""
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from add_data_to_db import Base as EmbeddingBase, JobEmbeddingStore
+
+    EmbeddingBase.metadata.create_all(engine)
+    # Skip __init__: it builds live Azure clients from the environment
+    store = JobEmbeddingStore.__new__(JobEmbeddingStore)
+    store.engine = engine
+    store.Session = sessionmaker(bind=engine)
+    store.openai_client = FakeOpenAIClient()
+
+    batch = 100
+    jobs = list(generate_jobs(batch, seed=11))
+    titles = [job["job_title"] for job in jobs]
+    descriptions = [job["job_description"] for job in jobs]
+    metadata = [{"company": job["company"], "location": job["location"]} for job in jobs]
+    return measure("store_batch_jobs[batch=100]", rows,
+                   lambda i: store.store_batch_jobs(titles, descriptions, metadata_list=metadata, batch_size=batch),
+                   max(3, iterations // 10), items_per_call=batch)
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def compare(current: List[Dict[str, float]], baseline_path: str) -> None:
+    """Print p50/p99 changes against a previous results file"""
+    with open(baseline_path) as f:
+        baseline = {(r["name"], r["rows"]): r for r in json.load(f)["results"]}
+    print(f"\nCompared with {baseline_path}:")
+    for result in current:
+        old = baseline.get((result["name"], result["rows"]))
+        if not old:
+            continue
+        p50 = (result["p50_ms"] / old["p50_ms"] - 1) * 100 if old["p50_ms"] else 0.0
+        p99 = (result["p99_ms"] / old["p99_ms"] - 1) * 100 if old["p99_ms"] else 0.0
+        print(f"{result['name']:<28} rows={result['rows']:<8} p50 {p50:+7.1f}%  p99 {p99:+7.1f}%")
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000],
+                        help=f"corpus sizes to benchmark ({MIN_ROWS}-{MAX_ROWS})")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--database-url", default="sqlite://",
+                        help="database to seed (default: in-memory SQLite); use a scratch database")
+    parser.add_argument("--only", nargs="*", help="run only benchmarks whose name starts with one of these")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<timestamp>-<commit>.json)")
+    parser.add_argument("--compare", help="previous results file to diff against")
+    args = parser.parse_args(argv)
+
+    for rows in args.rows:
+        if not MIN_ROWS <= rows <= MAX_ROWS:
+            parser.error(f"--rows must be between {MIN_ROWS} and {MAX_ROWS}")
+
+    results = []
+    for rows in args.rows:
+        results.extend(bench_corpus(rows, args.database_url, args.iterations, args.only))
+
+    commit = git_commit()
+    timestamp = datetime.now(timezone.utc)
+    output = args.output or os.path.join(RESULTS_DIR, f"{timestamp:%Y%m%dT%H%M%S}-{commit}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({
+            "meta": {
+                "commit": commit,
+                "timestamp": timestamp.isoformat(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "database": make_engine(args.database_url).dialect.name,
+            },
+            "results": results,
+        }, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+from models.database import CorpusState, JobPosting
+
+def upgrade_schema(engine: Engine) -> None:
+    """Add columns/indices declared on the models that are missing from an existing table.
+
+    `Base.metadata.create_all` only creates missing tables, while
+    `job_postings_jobposting` is usually created by the scraper beforehand.
+    """
+    table = JobPosting.__table__
+    inspector = inspect(engine)
+    if not inspector.has_table(table.name):
+        return
+
+    existing_columns = {col["name"] for col in inspector.get_columns(table.name)}
+    with engine.begin() as conn:
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+            column_type = column.type.compile(dialect=engine.dialect)
+            print(f"Adding column {table.name}.{column.name} ({column_type})")
+            conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+
+    for index in table.indexes:
+        index.create(bind=engine, checkfirst=True)
+
+    install_corpus_version_trigger(engine)
+
+def install_corpus_version_trigger(engine: Engine) -> None:
+    """Bump the corpus version on any write to the postings table (PostgreSQL only).
+
+    The ingestion pipeline bumps it itself; the trigger also covers writes that
+    bypass it (the scraper, manual SQL), so cached rankings and job details never
+    outlive the rows they were built from.
+    """
+    if engine.dialect.name != "postgresql":
+        return
+    postings, state = JobPosting.__table__.name, CorpusState.__table__.name
+    with engine.begin() as conn:
+        conn.execute(text(f"""
+            CREATE OR REPLACE FUNCTION job_matching_bump_corpus_version() RETURNS trigger AS $$
+            BEGIN
+                INSERT INTO {state} (id, version) VALUES (1, 1)
+                ON CONFLICT (id) DO UPDATE SET version = {state}.version + 1;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+        """))
+        conn.execute(text(f"DROP TRIGGER IF EXISTS job_matching_corpus_version ON {postings}"))
+        conn.execute(text(f"""
+            CREATE TRIGGER job_matching_corpus_version
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {postings}
+            FOR EACH STATEMENT EXECUTE FUNCTION job_matching_bump_corpus_version()
+        """))
@@ -1,9 +1,15 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, Session
+from starlette.concurrency import run_in_threadpool
 from dotenv import load_dotenv
+from typing import Any, Callable, Dict, TypeVar
 import os
 
 from models.database import Base
+from database.migrations import upgrade_schema
+
+T = TypeVar("T")
 
 # Load environment variables
 load_dotenv()
@@ -14,14 +20,52 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if DATABASE_URL is None:
     raise ValueError("DATABASE_URL environment variable not set")
 
-# Create engine
-engine = create_engine(DATABASE_URL)
+# Read-only queries (matching, search, job lookups) go to the replica when one is configured
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL") or DATABASE_URL
+
+def engine_options(url: str) -> Dict[str, Any]:
+    """Pool settings from the environment; SQLite keeps SQLAlchemy's defaults"""
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}
+    return {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", 10)),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", 20)),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", 30)),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", 1800)), # Seconds; below Azure's idle connection timeout
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes"),
+    }
 
-# Create all tables
-Base.metadata.create_all(bind=engine)
+# Create engines
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+read_engine = engine if DATABASE_READ_URL == DATABASE_URL else create_engine(
+    DATABASE_READ_URL, **engine_options(DATABASE_READ_URL)
+)
 
-# Create session factory
+# Create session factories
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+def init_db() -> None:
+    """Create all tables, then add columns/indices missing from pre-existing ones"""
+    Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
+
+def warm_pool() -> None:
+    """Open DB_POOL_WARM connections up front so the first requests do not pay for connecting"""
+    count = int(os.getenv("DB_POOL_WARM", 4))
+    for target in {engine, read_engine}:
+        # QueuePool.size() is a method; SingletonThreadPool.size is an int; Static/NullPool have neither
+        size = getattr(target.pool, "size", None)
+        size = size() if callable(size) else count
+        connections = []
+        try:
+            for _ in range(max(1, min(count, size))):
+                connection = target.connect()
+                connection.exec_driver_sql("SELECT 1")
+                connections.append(connection)
+        finally:
+            for connection in connections:
+                connection.close()
 
 def get_db() -> Session:
     """Dependency for getting database session"""
@@ -30,3 +74,26 @@ def get_db() -> Session:
         yield db
     finally:
         db.close()
+
+def get_read_db() -> Session:
+    """Dependency for a session on the read replica (falls back to the primary)"""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def run_read(fn: Callable[[Session], T]) -> T:
+    """Run `fn(db)` against the read database in the thread pool, so the event loop stays free.
+
+    `fn` does more than SQL (Azure embedding calls, numpy scoring), so it is
+    never run on the event loop thread, e.g. through an async session's `run_sync`.
+    """
+    def call() -> T:
+        db = ReadSessionLocal()
+        try:
+            return fn(db)
+        finally:
+            db.close()
+
+    return await run_in_threadpool(call)
@@ -0,0 +1,135 @@
+"""Local stand-in for the Azure OpenAI REST API used by the services.
+
+Speaks the chat-completions and embeddings shapes under
+`/openai/deployments/{deployment}/...`, so pointing AZURE_OPENAI_ENDPOINT at it
+is enough for both the openai SDK and langchain clients. Latency is drawn from
+a configurable distribution and a fraction of calls can be answered with 429:
+
+    python -m loadtest.mock_azure --port 9000 \\
+        --chat-latency lognormal:1500,0.4 --embedding-latency lognormal:80,0.3 --rate-limit 0.02
+"""
+import argparse
+import asyncio
+import math
+import random
+import time
+import uuid
+from typing import Callable, List, Union
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from benchmarks.fakes import FakeEmbeddings
+
+def parse_latency(spec: str) -> Callable[[], float]:
+    """Parse a latency distribution spec (milliseconds) into a sampler returning seconds.
+
+    fixed:MS | uniform:LOW,HIGH | normal:MEAN,STDDEV | lognormal:MEDIAN,SIGMA
+    """
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",")] if params else []
+    if kind == "fixed" and len(values) == 1:
+        return lambda: values[0] / 1000
+    if kind == "uniform" and len(values) == 2:
+        return lambda: random.uniform(values[0], values[1]) / 1000
+    if kind == "normal" and len(values) == 2:
+        return lambda: max(0.0, random.gauss(values[0], values[1])) / 1000
+    if kind == "lognormal" and len(values) == 2:
+        mu = math.log(values[0])
+        return lambda: random.lognormvariate(mu, values[1]) / 1000
+    raise ValueError(f"Invalid latency spec: {spec!r}")
+
+class MockConfig(BaseModel):
+    chat_latency: str = "lognormal:1500,0.4"
+    embedding_latency: str = "lognormal:80,0.3"
+    rate_limit: float = 0.0 # Fraction of calls answered with 429
+    retry_after: int = 1
+    dimension: int = 1536
+
+class ChatRequest(BaseModel):
+    messages: List[dict]
+    model: str = None
+    max_tokens: int = None
+
+class EmbeddingRequest(BaseModel):
+    input: Union[str, List[str], List[int], List[List[int]]]
+    model: str = None
+
+def create_app(config: MockConfig) -> FastAPI:
+    app = FastAPI(title="Mock Azure OpenAI")
+    chat_latency = parse_latency(config.chat_latency)
+    embedding_latency = parse_latency(config.embedding_latency)
+    embeddings = FakeEmbeddings(config.dimension)
+    counters = {"chat": 0, "embeddings": 0, "rate_limited": 0}
+
+    def rate_limited() -> JSONResponse:
+        counters["rate_limited"] += 1
+        return JSONResponse(
+            status_code=429,
+            headers={"Retry-After": str(config.retry_after), "x-ratelimit-remaining-requests": "0"},
+            content={"error": {"code": "429", "message": "Requests to the deployment have exceeded the rate limit (mock)."}},
+        )
+
+    @app.post("/openai/deployments/{deployment}/chat/completions")
+    async def chat_completions(deployment: str, body: ChatRequest):
+        counters["chat"] += 1
+        if random.random() < config.rate_limit:
+            return rate_limited()
+        await asyncio.sleep(chat_latency())
+        prompt = body.messages[-1].get("content", "") if body.messages else ""
+        content = "**Keywords**: " + " ".join(str(prompt).split()[-300:])
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": deployment,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": len(str(prompt)) // 4, "completion_tokens": len(content) // 4,
+                      "total_tokens": (len(str(prompt)) + len(content)) // 4},
+        }
+
+    @app.post("/openai/deployments/{deployment}/embeddings")
+    async def create_embeddings(deployment: str, body: EmbeddingRequest):
+        counters["embeddings"] += 1
+        if random.random() < config.rate_limit:
+            return rate_limited()
+        await asyncio.sleep(embedding_latency())
+        texts = body.input
+        if isinstance(texts, str) or (texts and isinstance(texts[0], int)):
+            texts = [texts]
+        # langchain sends token id arrays; those are embedded as their id sequence
+        texts = [t if isinstance(t, str) else " ".join(map(str, t)) for t in texts]
+        data = [{"object": "embedding", "index": i, "embedding": v}
+                for i, v in enumerate(embeddings.embed_documents(texts))]
+        return {"object": "list", "data": data, "model": deployment,
+                "usage": {"prompt_tokens": sum(len(t) // 4 for t in texts), "total_tokens": sum(len(t) // 4 for t in texts)}}
+
+    @app.get("/stats")
+    async def stats():
+        return counters
+
+    return app
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--chat-latency", default=MockConfig().chat_latency)
+    parser.add_argument("--embedding-latency", default=MockConfig().embedding_latency)
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--dimension", type=int, default=1536)
+    args = parser.parse_args()
+
+    config = MockConfig(chat_latency=args.chat_latency, embedding_latency=args.embedding_latency,
+                        rate_limit=args.rate_limit, retry_after=args.retry_after, dimension=args.dimension)
+    # Validate the specs before starting the server
+    parse_latency(config.chat_latency)
+    parse_latency(config.embedding_latency)
+
+    import uvicorn
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""Drive concurrent CV uploads and keyword searches at target rates and report per-endpoint latency.
+
+Arrivals are open-loop (Poisson at the target RPS), so a slow server shows up as
+growing latency and errors rather than a silently lower request rate:
+
+    python -m loadtest.run --base-url http://localhost:8001 --match-rps 2 --search-rps 20 --duration 60
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+from collections import Counter
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+import numpy as np
+
+from benchmarks.corpus import SAMPLE_CV
+
+BUCKETS_MS = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, math.inf]
+KEYWORDS = ["python", "data engineer", "kubernetes", "react", "azure", "machine learning", "figma", "sql"]
+EXTRA_SKILLS = ["Go", "Rust", "Terraform", "PyTorch", "Kafka", "Figma", "Swift", "Spark", "dbt", "Snowflake"]
+
+class EndpointStats:
+    """Latencies and outcomes collected for one endpoint"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies_ms: List[float] = []
+        self.outcomes: Counter = Counter()
+        self.dropped = 0 # Arrivals skipped because the client hit --max-in-flight
+
+    def record(self, latency_ms: float, outcome: str) -> None:
+        self.latencies_ms.append(latency_ms)
+        self.outcomes[outcome] += 1
+
+    def summary(self, duration: float) -> Dict[str, object]:
+        total = sum(self.outcomes.values())
+        errors = total - self.outcomes.get("200", 0)
+        latencies = np.array(self.latencies_ms) if self.latencies_ms else np.zeros(1)
+        counts = [0] * len(BUCKETS_MS)
+        for latency in self.latencies_ms:
+            counts[next(i for i, bound in enumerate(BUCKETS_MS) if latency <= bound)] += 1
+        return {
+            "endpoint": self.name,
+            "requests": total,
+            "dropped": self.dropped,
+            "achieved_rps": total / duration if duration else 0.0,
+            "error_rate": errors / total if total else 0.0,
+            "outcomes": dict(self.outcomes),
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p90_ms": float(np.percentile(latencies, 90)),
+            "p99_ms": float(np.percentile(latencies, 99)),
+            "max_ms": float(latencies.max()),
+            "histogram": [{"le_ms": "inf" if math.isinf(b) else b, "count": c} for b, c in zip(BUCKETS_MS, counts)],
+        }
+
+def print_summary(summary: Dict[str, object]) -> None:
+    print(f"\n== {summary['endpoint']} ==")
+    print(f"requests={summary['requests']} dropped={summary['dropped']} rps={summary['achieved_rps']:.2f} "
+          f"error_rate={summary['error_rate']:.2%} outcomes={summary['outcomes']}")
+    print(f"p50={summary['p50_ms']:.1f}ms p90={summary['p90_ms']:.1f}ms p99={summary['p99_ms']:.1f}ms "
+          f"max={summary['max_ms']:.1f}ms")
+    peak = max((b["count"] for b in summary["histogram"]), default=0) or 1
+    for bucket in summary["histogram"]:
+        bar = "#" * int(40 * bucket["count"] / peak)
+        print(f"  <= {str(bucket['le_ms']):>6} ms | {bucket['count']:>6} {bar}")
+
+async def drive(rps: float, duration: float, max_in_flight: int, stats: EndpointStats,
+                send: Callable[[int], Awaitable[httpx.Response]]) -> None:
+    """Issue requests with Poisson arrivals at `rps` for `duration` seconds"""
+    if rps <= 0:
+        return
+    loop = asyncio.get_running_loop()
+    in_flight = set()
+
+    async def one(i: int) -> None:
+        start = time.perf_counter()
+        try:
+            response = await send(i)
+            outcome = str(response.status_code)
+        except httpx.TimeoutException:
+            outcome = "timeout"
+        except httpx.HTTPError as e:
+            outcome = type(e).__name__
+        stats.record((time.perf_counter() - start) * 1000, outcome)
+
+    end = loop.time() + duration
+    next_arrival = loop.time()
+    i = 0
+    while next_arrival < end:
+        await asyncio.sleep(max(0.0, next_arrival - loop.time()))
+        if len(in_flight) >= max_in_flight:
+            stats.dropped += 1
+        else:
+            task = asyncio.create_task(one(i))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        i += 1
+        next_arrival += random.expovariate(rps)
+    if in_flight:
+        await asyncio.gather(*in_flight)
+
+def load_cvs(paths: Optional[List[str]]) -> List[tuple]:
+    """Return (filename, bytes, content type) tuples to upload"""
+    if not paths:
+        return [("cv.md", SAMPLE_CV.encode(), "text/markdown")]
+    cvs = []
+    for path in paths:
+        with open(path, "rb") as f:
+            content_type = "application/pdf" if path.lower().endswith(".pdf") else "text/markdown"
+            cvs.append((path.rsplit("/", 1)[-1], f.read(), content_type))
+    return cvs
+
+async def run(args: argparse.Namespace) -> List[Dict[str, object]]:
+    cvs = load_cvs(args.cv)
+    limits = httpx.Limits(max_connections=args.max_in_flight * 2, max_keepalive_connections=args.max_in_flight * 2)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        match_stats = EndpointStats("POST /api/match-cv")
+        search_stats = EndpointStats("GET /api/jobs/search")
+
+        async def send_match(i: int) -> httpx.Response:
+            name, content, content_type = cvs[i % len(cvs)]
+            if args.unique_cvs and content_type == "text/markdown":
+                # Vary the text so server-side caches do not turn the test into a cache benchmark
+                content += f"\n- {random.choice(EXTRA_SKILLS)} ({i})\n".encode()
+            return await client.post("/api/match-cv", params={"limit": args.limit},
+                                      files={"cv_file": (name, content, content_type)})
+
+        async def send_search(i: int) -> httpx.Response:
+            return await client.get("/api/jobs/search", params={"keyword": KEYWORDS[i % len(KEYWORDS)], "limit": 10})
+
+        start = time.perf_counter()
+        await asyncio.gather(
+            drive(args.match_rps, args.duration, args.max_in_flight, match_stats, send_match),
+            drive(args.search_rps, args.duration, args.max_in_flight, search_stats, send_search),
+        )
+        elapsed = time.perf_counter() - start
+    return [stats.summary(elapsed) for stats in (match_stats, search_stats) if stats.outcomes or stats.dropped]
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8001")
+    parser.add_argument("--match-rps", type=float, default=1.0)
+    parser.add_argument("--search-rps", type=float, default=10.0)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--max-in-flight", type=int, default=64, help="per endpoint; arrivals beyond it are dropped")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--limit", type=int, default=50, help="limit passed to /api/match-cv")
+    parser.add_argument("--cv", nargs="*", help="CV files to upload (default: a built-in markdown CV)")
+    parser.add_argument("--no-unique-cvs", dest="unique_cvs", action="store_false",
+                        help="upload identical markdown CVs instead of varying them per request")
+    parser.add_argument("--output", help="write the summaries as JSON")
+    args = parser.parse_args()
+
+    summaries = asyncio.run(run(args))
+    for summary in summaries:
+        print_summary(summary)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": vars(args), "endpoints": summaries}, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""Seed a local PostgreSQL or SQLite database with synthetic job postings for load tests.
+
+    DATABASE_URL=sqlite:///loadtest.db python -m loadtest.seed --rows 20000
+"""
+import argparse
+import os
+import time
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, func, inspect, select
+from sqlalchemy.engine import make_url
+
+from benchmarks.corpus import seed_database
+from models.database import JobPosting
+
+def main() -> None:
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--allow-remote", action="store_true", help="seed a database that is not on localhost")
+    args = parser.parse_args()
+
+    if not args.database_url:
+        parser.error("--database-url or DATABASE_URL is required")
+    url = make_url(args.database_url)
+    if not args.allow_remote and url.host not in (None, "localhost", "127.0.0.1", "::1", "postgres", "db"):
+        parser.error(f"refusing to seed {url.host}; use a local PostgreSQL/SQLite URL or pass --allow-remote")
+
+    engine = create_engine(args.database_url)
+    if inspect(engine).has_table(JobPosting.__tablename__):
+        with engine.connect() as conn:
+            existing = conn.execute(select(func.count()).select_from(JobPosting)).scalar()
+        if existing:
+            print(f"{existing} postings already present; skipping seed.")
+            return
+
+    start = time.perf_counter()
+    count = seed_database(engine, args.rows, seed=args.seed)
+    print(f"Seeded {count} synthetic postings in {time.perf_counter() - start:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,26 @@
-from sqlalchemy import Column, Text
+import enum
+
+from sqlalchemy import Column, Text, Float, Enum, Index, Integer, BigInteger, LargeBinary
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
 
+class Seniority(str, enum.Enum):
+    """Normalized seniority levels parsed from `level` / `job_title`"""
+    INTERN = "intern"
+    JUNIOR = "junior"
+    MID = "mid"
+    SENIOR = "senior"
+    LEAD = "lead"
+    DIRECTOR = "director"
+    EXECUTIVE = "executive"
+
+class WorkMode(str, enum.Enum):
+    """Normalized remote / hybrid / onsite flag parsed from `location`"""
+    REMOTE = "remote"
+    HYBRID = "hybrid"
+    ONSITE = "onsite"
+
 class JobPosting(Base):
     __tablename__ = 'job_postings_jobposting'
 
@@ -22,8 +40,38 @@ class JobPosting(Base):
     salary = Column(Text)
     application_instructions = Column(Text)
 
+    # Typed columns derived from the free-text fields above at ingestion time
+    # (see services/job_fields.py). Salaries are annualised.
+    salary_min = Column(Float)
+    salary_max = Column(Float)
+    salary_currency = Column(Text)
+    seniority = Column(Enum(Seniority, native_enum=False, length=16,
+                            values_callable=lambda e: [m.value for m in e]))
+    work_mode = Column(Enum(WorkMode, native_enum=False, length=16,
+                            values_callable=lambda e: [m.value for m in e]))
+    city = Column(Text)
+    country = Column(Text)
+
+    # Near-duplicate detection (see services/dedup.py): reposts share the cluster id of the first posting seen
+    cluster_id = Column(Text)
+    minhash = Column(LargeBinary)
+
     def __repr__(self):
         return f"<JobPosting(id={self.id}, title={self.job_title}, company={self.company})>"
 
-# Note: Removed previous indices related to the old JobEmbedding model.
-# New indices can be added here if needed for performance based on query patterns.
+class CorpusState(Base):
+    """Single-row counter bumped whenever postings are added or changed (invalidates cached rankings)"""
+    __tablename__ = 'job_matching_corpus_state'
+
+    id = Column(Integer, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+
+# B-tree indices backing the structured range / equality filters on the search endpoints
+Index('idx_job_posting_salary_min', JobPosting.salary_min)
+Index('idx_job_posting_salary_max', JobPosting.salary_max)
+Index('idx_job_posting_salary_currency', JobPosting.salary_currency)
+Index('idx_job_posting_seniority', JobPosting.seniority)
+Index('idx_job_posting_work_mode', JobPosting.work_mode)
+Index('idx_job_posting_country_city', JobPosting.country, JobPosting.city)
+Index('idx_job_posting_city', JobPosting.city)
+Index('idx_job_posting_cluster_id', JobPosting.cluster_id)
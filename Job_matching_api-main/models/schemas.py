@@ -1,6 +1,8 @@
 from pydantic import BaseModel, Field
 from typing import Optional, List, Any # Removed Dict import
 
+from models.database import Seniority, WorkMode
+
 # Simplified JobBase to match JobPosting fields more closely
 class JobBase(BaseModel):
     job_title: Optional[str] = None # Made optional as it might not always be present
@@ -27,13 +29,59 @@ class JobResponse(JobBase):
     salary: Optional[str] = None
     application_instructions: Optional[str] = None
 
+    # Typed fields parsed from salary / level / location at ingestion
+    salary_min: Optional[float] = None
+    salary_max: Optional[float] = None
+    salary_currency: Optional[str] = None
+    seniority: Optional[Seniority] = None
+    work_mode: Optional[WorkMode] = None
+    city: Optional[str] = None
+    country: Optional[str] = None
+    cluster_id: Optional[str] = None # Shared by near-duplicate reposts of the same posting
+
     class Config:
         from_attributes = True
 
+class JobFilters(BaseModel):
+    """Structured filters served by the indexed typed columns"""
+    min_salary: Optional[float] = Field(None, description="Annual salary the job must reach (matches on salary_max)")
+    max_salary: Optional[float] = Field(None, description="Annual salary the job must start at or below (matches on salary_min)")
+    currency: Optional[str] = Field(None, description="ISO currency code, e.g. EUR")
+    seniority: Optional[Seniority] = None
+    work_mode: Optional[WorkMode] = None
+    city: Optional[str] = None
+    country: Optional[str] = None
+
 class CVMatchResponse(BaseModel):
     matches: List[JobResponse]
     summary: Optional[str] = None
 
+class MatchPage(BaseModel):
+    """One page of a cached match ranking; pass next_cursor back to get the following page"""
+    result_id: str
+    matches: List[JobResponse]
+    next_cursor: Optional[str] = None
+    total: int
+    expires_at: float
+
+class MatchTask(BaseModel):
+    """State of a queued CV match; result holds the matches once status is "succeeded" """
+    task_id: str
+    status: str # queued, running, succeeded or failed
+    priority: int
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[List[JobResponse]] = None
+    error: Optional[str] = None
+    degraded: Optional[List[str]] = None # Fallbacks used, e.g. "embeddings" (keyword ranking) or "cv_summary"
+
+class Suggestion(BaseModel):
+    """A typeahead completion and the number of postings it appears in"""
+    text: str
+    kind: str # title, company or skill
+    count: int
+
 class JobSearchResponse(BaseModel):
     jobs: List[JobResponse]
     total: int
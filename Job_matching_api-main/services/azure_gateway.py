@@ -0,0 +1,252 @@
+import asyncio
+import os
+import re
+import threading
+from typing import Dict, Optional
+
+import httpx
+from openai import AsyncAzureOpenAI, AzureOpenAI
+
+from services.metrics import AZURE_IN_FLIGHT
+
+# Azure OpenAI REST paths name the deployment: /openai/deployments/{deployment}/embeddings
+_DEPLOYMENT_PATH = re.compile(r"/openai/deployments/([^/]+)/")
+
+# Per-attempt deadlines and retries by kind of call (the environment variables predate the gateway)
+_KINDS = {
+    "embeddings": ("AZURE_EMBEDDING_TIMEOUT_SECONDS", 10.0, "AZURE_EMBEDDING_MAX_RETRIES"),
+    "chat": ("AZURE_GPT_TIMEOUT_SECONDS", 60.0, "AZURE_GPT_MAX_RETRIES"),
+}
+
+def http2_available() -> bool:
+    """Whether the optional `h2` package httpx needs for HTTP/2 is installed"""
+    try:
+        import h2 # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def parse_limits(spec: str) -> Dict[str, int]:
+    """"deployment=limit,..." (AZURE_DEPLOYMENT_CONCURRENCY_OVERRIDES) as a dict"""
+    limits = {}
+    for part in spec.split(","):
+        name, _, value = part.strip().partition("=")
+        if name and value:
+            limits[name.strip()] = int(value)
+    return limits
+
+class DeploymentLimiter:
+    """Caps the requests in flight to one deployment, shared by the sync and async clients.
+
+    A request waits up to AZURE_QUEUE_TIMEOUT_SECONDS for a slot, then fails
+    with httpx.PoolTimeout, which the SDK reports (and retries) as a timeout.
+    """
+
+    def __init__(self, deployment: str, limit: int, queue_timeout: float):
+        self.deployment = deployment
+        self.limit = limit
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(limit)
+
+    def acquire(self) -> None:
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise httpx.PoolTimeout(f"{self.limit} requests already in flight to deployment {self.deployment}")
+        AZURE_IN_FLIGHT.labels(deployment=self.deployment).inc()
+
+    async def acquire_async(self) -> None:
+        if not self._slots.acquire(blocking=False):
+            # Wait in a worker thread so the event loop keeps running; a slot it gets after cancellation is returned
+            waiter = asyncio.ensure_future(asyncio.to_thread(self._slots.acquire, True, self.queue_timeout))
+            try:
+                acquired = await asyncio.shield(waiter)
+            except asyncio.CancelledError:
+                waiter.add_done_callback(self._release_late)
+                raise
+            if not acquired:
+                raise httpx.PoolTimeout(f"{self.limit} requests already in flight to deployment {self.deployment}")
+        AZURE_IN_FLIGHT.labels(deployment=self.deployment).inc()
+
+    def _release_late(self, waiter: asyncio.Future) -> None:
+        if not waiter.cancelled() and waiter.exception() is None and waiter.result():
+            self._slots.release()
+
+    def release(self) -> None:
+        AZURE_IN_FLIGHT.labels(deployment=self.deployment).dec()
+        self._slots.release()
+
+class _LimitedTransport(httpx.BaseTransport):
+    def __init__(self, gateway: "AzureGateway", transport: httpx.BaseTransport):
+        self._gateway = gateway
+        self._transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        limiter = self._gateway.limiter_for(request.url.path)
+        if limiter is None:
+            return self._transport.handle_request(request)
+        limiter.acquire()
+        try:
+            response = self._transport.handle_request(request)
+            response.read() # The SDKs parse the whole body anyway; the slot is held until it has arrived
+        finally:
+            limiter.release()
+        return response
+
+    def close(self) -> None:
+        self._transport.close()
+
+class _AsyncLimitedTransport(httpx.AsyncBaseTransport):
+    def __init__(self, gateway: "AzureGateway", transport: httpx.AsyncBaseTransport):
+        self._gateway = gateway
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        limiter = self._gateway.limiter_for(request.url.path)
+        if limiter is None:
+            return await self._transport.handle_async_request(request)
+        await limiter.acquire_async()
+        try:
+            response = await self._transport.handle_async_request(request)
+            await response.aread()
+        finally:
+            limiter.release()
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+class AzureGateway:
+    """The one HTTP connection pool every Azure OpenAI client of the process goes through.
+
+    The embeddings and chat clients of all services share keep-alive
+    connections (HTTP/2 when the optional `h2` package is installed, so one TLS
+    connection multiplexes concurrent calls), the same per-attempt deadlines
+    and retries, and a cap on the requests in flight to each deployment
+    (AZURE_DEPLOYMENT_CONCURRENCY, overridden per deployment by
+    AZURE_DEPLOYMENT_CONCURRENCY_OVERRIDES). The sync pool serves calls made
+    from worker threads; the async pool serves coroutines (`aembed_*`,
+    AsyncAzureOpenAI). Both are created on first use.
+    """
+
+    def __init__(self):
+        self.api_key = os.getenv("AZURE_OPENAI_API_KEY")
+        self.endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
+        self.api_version = os.getenv("AZURE_OPENAI_API_VERSION", "2023-05-15")
+        self.http2 = os.getenv("AZURE_HTTP2", "true").lower() == "true"
+        if self.http2 and not http2_available():
+            print("AZURE_HTTP2 is on but the h2 package is not installed; Azure calls use HTTP/1.1 "
+                  "(pip install 'httpx[http2]')")
+            self.http2 = False
+        self.max_connections = int(os.getenv("AZURE_MAX_CONNECTIONS", 100))
+        self.max_keepalive = int(os.getenv("AZURE_MAX_KEEPALIVE_CONNECTIONS", 20))
+        # Below Azure's idle timeout, so a pooled connection is never reused just as the server drops it
+        self.keepalive_expiry = float(os.getenv("AZURE_KEEPALIVE_EXPIRY_SECONDS", 60))
+        self.connect_timeout = float(os.getenv("AZURE_CONNECT_TIMEOUT_SECONDS", 5))
+        self.queue_timeout = float(os.getenv("AZURE_QUEUE_TIMEOUT_SECONDS", 10))
+        self.default_concurrency = int(os.getenv("AZURE_DEPLOYMENT_CONCURRENCY", 16)) # 0: unlimited
+        self.concurrency = parse_limits(os.getenv("AZURE_DEPLOYMENT_CONCURRENCY_OVERRIDES", ""))
+        self._limiters: Dict[str, Optional[DeploymentLimiter]] = {}
+        self._client: Optional[httpx.Client] = None
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._lock = threading.Lock()
+
+    def timeout(self, kind: str) -> httpx.Timeout:
+        """Deadlines of one attempt of a `kind` ("embeddings" or "chat") call"""
+        variable, default, _ = _KINDS[kind]
+        return httpx.Timeout(float(os.getenv(variable, default)), connect=self.connect_timeout)
+
+    def max_retries(self, kind: str) -> int:
+        return int(os.getenv(_KINDS[kind][2], 1))
+
+    def limiter_for(self, path: str) -> Optional[DeploymentLimiter]:
+        """The concurrency limiter of the deployment a request path targets (None: not limited)"""
+        match = _DEPLOYMENT_PATH.search(path)
+        if match is None:
+            return None
+        deployment = match.group(1)
+        limiter = self._limiters.get(deployment, False)
+        if limiter is False:
+            with self._lock:
+                if deployment not in self._limiters:
+                    limit = self.concurrency.get(deployment, self.default_concurrency)
+                    self._limiters[deployment] = DeploymentLimiter(deployment, limit, self.queue_timeout) if limit > 0 else None
+                limiter = self._limiters[deployment]
+        return limiter
+
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_keepalive,
+                            keepalive_expiry=self.keepalive_expiry)
+
+    @property
+    def http_client(self) -> httpx.Client:
+        """Pooled sync client (pass as `http_client` to AzureOpenAI / AzureOpenAIEmbeddings)"""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    transport = httpx.HTTPTransport(http2=self.http2, limits=self._limits())
+                    self._client = httpx.Client(transport=_LimitedTransport(self, transport),
+                                                timeout=self.timeout("chat"))
+        return self._client
+
+    @property
+    def http_async_client(self) -> httpx.AsyncClient:
+        """Pooled async client (pass as `http_client` to AsyncAzureOpenAI, `http_async_client` to langchain)"""
+        if self._async_client is None:
+            with self._lock:
+                if self._async_client is None:
+                    transport = httpx.AsyncHTTPTransport(http2=self.http2, limits=self._limits())
+                    self._async_client = httpx.AsyncClient(transport=_AsyncLimitedTransport(self, transport),
+                                                           timeout=self.timeout("chat"))
+        return self._async_client
+
+    def _require_credentials(self) -> None:
+        if not self.api_key or not self.endpoint:
+            raise ValueError("Azure OpenAI API key and endpoint are required")
+
+    def openai_client(self, kind: str = "chat") -> AzureOpenAI:
+        """openai SDK client on the shared pool; the deployment is given per call (`model=`)"""
+        self._require_credentials()
+        return AzureOpenAI(api_key=self.api_key, api_version=self.api_version, azure_endpoint=self.endpoint,
+                           timeout=self.timeout(kind), max_retries=self.max_retries(kind),
+                           http_client=self.http_client)
+
+    def async_openai_client(self, kind: str = "chat") -> AsyncAzureOpenAI:
+        self._require_credentials()
+        return AsyncAzureOpenAI(api_key=self.api_key, api_version=self.api_version, azure_endpoint=self.endpoint,
+                                timeout=self.timeout(kind), max_retries=self.max_retries(kind),
+                                http_client=self.http_async_client)
+
+    def embeddings(self, deployment: str, api_version: Optional[str] = None):
+        """langchain AzureOpenAIEmbeddings for `deployment`, sync and async calls on the shared pools"""
+        from langchain_openai import AzureOpenAIEmbeddings
+
+        self._require_credentials()
+        return AzureOpenAIEmbeddings(
+            azure_deployment=deployment,
+            openai_api_version=api_version or self.api_version,
+            azure_endpoint=self.endpoint,
+            openai_api_key=self.api_key,
+            request_timeout=self.timeout("embeddings"),
+            max_retries=self.max_retries("embeddings"),
+            http_client=self.http_client,
+            http_async_client=self.http_async_client
+        )
+
+    async def aclose(self) -> None:
+        """Close both pools (the next call opens new ones)"""
+        client, self._client = self._client, None
+        async_client, self._async_client = self._async_client, None
+        if client is not None:
+            client.close()
+        if async_client is not None:
+            await async_client.aclose()
+
+_gateway: Optional[AzureGateway] = None
+_gateway_lock = threading.Lock()
+
+def get_gateway() -> AzureGateway:
+    """The process-wide gateway, shared by every service instance"""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = AzureGateway()
+        return _gateway
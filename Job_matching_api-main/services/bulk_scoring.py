@@ -0,0 +1,290 @@
+"""Offline bulk scoring: every CV in a directory against every job posting, top-k per CV written to Parquet.
+
+    python -m services.bulk_scoring cvs/ --output reports/2026-q3 --top-k 50
+    python -m services.bulk_scoring cvs/ --output reports/2026-q3 --mode fast --memory-mb 1024
+
+The output directory gets one part-NNNNN.parquet per batch of CVs. Rerunning the same command skips
+CVs already written, so an interrupted run resumes where it stopped. CV summaries and embeddings are
+cached in <output>/_cache by content hash, so a CV is never summarized or embedded twice. Job vectors
+come from the job index at --index (JOB_INDEX_PATH); without one, the postings are embedded once
+into <output>/_job_index. Underscore-prefixed entries are ignored by Parquet dataset readers, so
+`pandas.read_parquet(<output>)` loads all parts.
+"""
+import argparse
+import hashlib
+import logging
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+from sqlalchemy.orm import Session
+
+from models.database import JobPosting
+from services.cv_processing import CVProcessingService, extract_cv_text
+from services.index_store import IndexStore
+from services.job_index import JobIndex
+from services.job_matching import JobMatchingService
+
+CV_EXTENSIONS = (".pdf", ".md")
+
+logger = logging.getLogger(__name__)
+
+def find_cvs(cv_dir: str) -> List[str]:
+    """CV files under `cv_dir`, as sorted paths relative to it"""
+    found = []
+    for root, _, files in os.walk(cv_dir):
+        for name in files:
+            if name.lower().endswith(CV_EXTENSIONS):
+                found.append(os.path.relpath(os.path.join(root, name), cv_dir))
+    return sorted(found)
+
+def _file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _extract(path: str) -> str:
+    # Runs in a worker process: PDF extraction is CPU-bound
+    with open(path, "rb") as f:
+        return extract_cv_text(f.read(), os.path.basename(path))
+
+def top_k_blocks(queries: np.ndarray, vectors: np.ndarray, k: int, block_rows: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Row indices and scores of each query's `k` best rows of `vectors`, best first.
+
+    `vectors` (e.g. a memory-mapped index) is read `block_rows` rows at a time;
+    each block's top-k is merged into the running top-k, so memory stays at one
+    block of vectors plus one queries x block score matrix.
+    """
+    if k < 1:
+        raise ValueError(f"k must be at least 1, got {k}")
+    k = min(k, len(vectors))
+    best_rows = np.empty((len(queries), 0), dtype=np.int64)
+    best_scores = np.empty((len(queries), 0), dtype=np.float32)
+    for start in range(0, len(vectors), block_rows):
+        scores = queries @ np.asarray(vectors[start:start + block_rows], dtype=np.float32).T
+        block_k = min(k, scores.shape[1])
+        top = np.argpartition(-scores, block_k - 1, axis=1)[:, :block_k]
+        best_scores = np.concatenate([best_scores, np.take_along_axis(scores, top, axis=1)], axis=1)
+        best_rows = np.concatenate([best_rows, top + start], axis=1)
+        if best_scores.shape[1] > k:
+            keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+            best_scores = np.take_along_axis(best_scores, keep, axis=1)
+            best_rows = np.take_along_axis(best_rows, keep, axis=1)
+    order = np.argsort(-best_scores, axis=1)
+    return np.take_along_axis(best_rows, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+class ScoringCache:
+    """CV texts and embeddings on disk, keyed by content hash (written atomically)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, key: str, suffix: str) -> str:
+        return os.path.join(self.path, f"{key}{suffix}")
+
+    def _write(self, path: str, data: bytes) -> None:
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def get_text(self, key: str) -> Optional[str]:
+        path = self._file(key, ".txt")
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+
+    def put_text(self, key: str, text: str) -> None:
+        self._write(self._file(key, ".txt"), text.encode("utf-8"))
+
+    def get_vector(self, key: str) -> Optional[np.ndarray]:
+        path = self._file(key, ".npy")
+        return np.load(path) if os.path.exists(path) else None
+
+    def put_vector(self, key: str, vector: np.ndarray) -> None:
+        tmp = self._file(key, ".npy.tmp")
+        with open(tmp, "wb") as f:
+            np.save(f, np.asarray(vector, dtype=np.float32))
+        os.replace(tmp, self._file(key, ".npy"))
+
+class BulkScorer:
+    """Scores batches of CVs against a job index and appends each batch's top-k as a Parquet part"""
+
+    def __init__(self, cv_service: CVProcessingService, matching_service: JobMatchingService, output_dir: str,
+                 mode: Optional[str] = None, top_k: int = 50, batch_size: int = 64, workers: Optional[int] = None,
+                 concurrency: int = 8, memory_mb: int = 512):
+        if top_k < 1:
+            raise ValueError(f"top_k must be at least 1, got {top_k}")
+        self.cv_service = cv_service
+        self.matching_service = matching_service
+        self.output_dir = output_dir
+        self.mode = mode or cv_service.default_mode
+        self.top_k = top_k
+        self.batch_size = batch_size
+        self.workers = workers or os.cpu_count() or 1
+        self.concurrency = concurrency
+        self.memory_bytes = memory_mb * 1024 * 1024
+        self.cache = ScoringCache(os.path.join(output_dir, "_cache"))
+        os.makedirs(output_dir, exist_ok=True)
+
+    def _parts(self) -> List[str]:
+        return sorted(name for name in os.listdir(self.output_dir)
+                      if name.startswith("part-") and name.endswith(".parquet"))
+
+    def completed(self) -> Set[str]:
+        """CVs already written by an earlier (possibly interrupted) run"""
+        import pyarrow.parquet as pq
+
+        done = set()
+        for name in self._parts():
+            done.update(pq.read_table(os.path.join(self.output_dir, name), columns=["cv"]).column("cv").to_pylist())
+        return done
+
+    def _embed_batch(self, cv_dir: str, batch: List[str], processes: Executor,
+                     threads: Executor) -> List[Tuple[str, str, np.ndarray]]:
+        """(cv, content hash, vector) for the CVs of a batch that could be processed"""
+        hashes = {cv: _file_hash(os.path.join(cv_dir, cv)) for cv in batch}
+        # Cached per mode and per embedding deployment, so changing either re-embeds
+        text_keys = {cv: f"{hashes[cv]}-{self.mode}" for cv in batch}
+        vector_keys = {cv: f"{text_keys[cv]}-{self.matching_service.embedding_deployment_name}" for cv in batch}
+        vectors = {cv: self.cache.get_vector(vector_keys[cv]) for cv in batch}
+        texts = {cv: self.cache.get_text(text_keys[cv]) for cv in batch if vectors[cv] is None}
+
+        missing = [cv for cv, text in texts.items() if text is None]
+        extractions = {cv: processes.submit(_extract, os.path.join(cv_dir, cv)) for cv in missing}
+        summaries = {}
+        for cv, future in extractions.items():
+            try:
+                summaries[cv] = threads.submit(self.cv_service.prepare_text, future.result(), self.mode)
+            except Exception as e:
+                logger.warning("Skipping %s: text extraction failed: %s", cv, e)
+        for cv, future in summaries.items():
+            try:
+                texts[cv] = future.result()
+                self.cache.put_text(text_keys[cv], texts[cv])
+            except Exception as e:
+                logger.warning("Skipping %s: %s processing failed: %s", cv, self.mode, e)
+
+        to_embed = [cv for cv, text in texts.items() if text]
+        if to_embed:
+            # One batched embedding request for the whole batch
+            embedded = self.matching_service.embed_documents([texts[cv] for cv in to_embed], purpose="cv")
+            for cv, vector in zip(to_embed, embedded):
+                vectors[cv] = vector
+                self.cache.put_vector(vector_keys[cv], vector)
+        return [(cv, hashes[cv], vectors[cv]) for cv in batch if vectors.get(cv) is not None]
+
+    def _write_part(self, number: int, rows: Dict[str, list]) -> str:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        path = os.path.join(self.output_dir, f"part-{number:05d}.parquet")
+        tmp = os.path.join(self.output_dir, f".part-{number:05d}.parquet.tmp")
+        pq.write_table(pa.table(rows), tmp)
+        os.replace(tmp, path) # A part is either complete or absent
+        return path
+
+    def run(self, cv_dir: str, index: JobIndex, db: Session) -> int:
+        """Score every CV under `cv_dir` not yet written; returns the number of CVs scored"""
+        done = self.completed()
+        pending = [cv for cv in find_cvs(cv_dir) if cv not in done]
+        logger.info("%d CVs already scored, %d to go against %d jobs", len(done), len(pending), len(index))
+        if not pending or len(index) == 0:
+            return 0
+        dimension = index.vectors.shape[1]
+        part = len(self._parts())
+        scored = 0
+        with ProcessPoolExecutor(self.workers) as processes, ThreadPoolExecutor(self.concurrency) as threads:
+            for start in range(0, len(pending), self.batch_size):
+                batch_start = time.perf_counter()
+                cvs = self._embed_batch(cv_dir, pending[start:start + self.batch_size], processes, threads)
+                if not cvs:
+                    continue
+                queries = np.stack([vector for _, _, vector in cvs]).astype(np.float32)
+                # One block of job vectors plus its score matrix must fit the memory budget
+                block_rows = max(1, self.memory_bytes // (4 * (len(queries) + dimension)))
+                rows, scores = top_k_blocks(queries, index.vectors, self.top_k, block_rows)
+
+                job_ids = index.ids[rows.ravel()].astype(str).reshape(rows.shape)
+                jobs = {job.id: job for job in db.query(JobPosting.id, JobPosting.job_title, JobPosting.company,
+                                                        JobPosting.location)
+                        .filter(JobPosting.id.in_(set(job_ids.ravel().tolist())))}
+                columns = {name: [] for name in ("cv", "cv_sha256", "rank", "job_id", "score", "job_title",
+                                                 "company", "location", "mode", "index_version")}
+                for (cv, sha, _), ids, row_scores in zip(cvs, job_ids, scores):
+                    for rank, (job_id, score) in enumerate(zip(ids.tolist(), row_scores.tolist()), start=1):
+                        job = jobs.get(job_id)
+                        columns["cv"].append(cv)
+                        columns["cv_sha256"].append(sha)
+                        columns["rank"].append(rank)
+                        columns["job_id"].append(job_id)
+                        columns["score"].append(score)
+                        columns["job_title"].append(job.job_title if job else None)
+                        columns["company"].append(job.company if job else None)
+                        columns["location"].append(job.location if job else None)
+                        columns["mode"].append(self.mode)
+                        columns["index_version"].append(index.version)
+                path = self._write_part(part, columns)
+                part += 1
+                scored += len(cvs)
+                logger.info("Scored %d/%d CVs (%d in %.1fs) -> %s", scored, len(pending), len(cvs),
+                            time.perf_counter() - batch_start, path)
+        return scored
+
+def open_job_index(index_path: Optional[str], output_dir: str, matching_service: JobMatchingService,
+                   db: Session) -> JobIndex:
+    """The job index at `index_path`, else one embedded once into <output>/_job_index and reused on reruns"""
+    for path in filter(None, (index_path, os.path.join(output_dir, "_job_index"))):
+        if IndexStore.is_store(path) or os.path.exists(os.path.join(path, "meta.json")):
+            index = JobIndex.load(path)
+            deployment = matching_service.embedding_deployment_name
+            if index.model and index.model != deployment:
+                # CVs are embedded with the configured deployment; scoring them against another model's vectors is meaningless
+                raise ValueError(f"Job index at {path} was built with {index.model}, not {deployment}")
+            return index
+    path = os.path.join(output_dir, "_job_index")
+    logger.info("No job index found, embedding all postings into %s", path)
+    index = JobIndex.build(db, matching_service.embed_documents, model=matching_service.embedding_deployment_name)
+    index.save(path)
+    return JobIndex.load(path)
+
+def main() -> None:
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("cv_dir", help="directory of CVs (.pdf, .md), searched recursively")
+    parser.add_argument("--output", required=True, help="directory for the Parquet parts and caches")
+    parser.add_argument("--top-k", type=int, default=50)
+    parser.add_argument("--mode", choices=["summary", "fast"], help="CV processing mode (default: CV_PROCESSING_MODE)")
+    parser.add_argument("--index", default=os.getenv("JOB_INDEX_PATH"), help="prebuilt job index directory")
+    parser.add_argument("--batch-size", type=int, default=64, help="CVs per embedding request and Parquet part")
+    parser.add_argument("--workers", type=int, help="PDF extraction processes (default: CPU count)")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent GPT summary requests")
+    parser.add_argument("--memory-mb", type=int, default=512, help="budget for job vector blocks and score matrices")
+    args = parser.parse_args()
+    if args.top_k < 1:
+        parser.error("--top-k must be at least 1")
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    from database.session import ReadSessionLocal
+
+    cv_service = CVProcessingService()
+    matching_service = JobMatchingService()
+    scorer = BulkScorer(cv_service, matching_service, args.output, args.mode, args.top_k, args.batch_size,
+                        args.workers, args.concurrency, args.memory_mb)
+    db = ReadSessionLocal()
+    try:
+        index = open_job_index(args.index, args.output, matching_service, db)
+        total = scorer.run(args.cv_dir, index, db)
+    finally:
+        db.close()
+    logger.info("Bulk scoring complete: %d CVs scored, results in %s", total, args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import re
+from typing import Callable, List, Sequence, Tuple
+
+import numpy as np
+
+from services.job_index import normalize_rows
+from services.text_cleanup import get_encoding
+
+# Split points tried in order until every piece fits: sections / paragraphs, lines, sentences, words
+_SEPARATORS = [
+    re.compile(r"\n\s*\n+|\n(?=\s*(?:#+\s|\d+\.\s*\*\*|\*\*))"),
+    re.compile(r"\n+"),
+    re.compile(r"(?<=[.!?;])\s+"),
+    re.compile(r"\s+"),
+]
+
+# Characters per token when tiktoken is unavailable; errs low so chunks stay under the limit
+_CHARS_PER_TOKEN = 3
+
+def count_tokens(text: str) -> int:
+    """Embedding tokens in `text` (estimated from its length without tiktoken)"""
+    encoding = get_encoding()
+    if encoding is None:
+        return -(-len(text) // _CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+def _fits(text: str, max_tokens: int) -> bool:
+    # A byte-level BPE token covers at least one UTF-8 byte, so short texts skip tokenization
+    return len(text.encode()) <= max_tokens or count_tokens(text) <= max_tokens
+
+def _hard_split(text: str, max_tokens: int) -> List[str]:
+    encoding = get_encoding()
+    if encoding is None:
+        step = max_tokens * _CHARS_PER_TOKEN
+        return [text[i:i + step] for i in range(0, len(text), step)]
+    tokens = encoding.encode(text, disallowed_special=())
+    return [encoding.decode(tokens[i:i + max_tokens]) for i in range(0, len(tokens), max_tokens)]
+
+def _pieces(text: str, max_tokens: int, level: int) -> List[str]:
+    if _fits(text, max_tokens):
+        return [text]
+    if level == len(_SEPARATORS):
+        return _hard_split(text, max_tokens)
+    pieces = []
+    for part in _SEPARATORS[level].split(text):
+        if part.strip():
+            pieces.extend(_pieces(part.strip(), max_tokens, level + 1))
+    return pieces
+
+def split_text(text: str, max_tokens: int) -> List[str]:
+    """Split `text` into chunks of at most `max_tokens`, on the coarsest boundary that fits.
+
+    Texts that fit are returned whole. Otherwise the text is split on section and
+    paragraph breaks (then lines, sentences, words), and adjacent pieces are packed
+    back together up to the limit.
+    """
+    if _fits(text, max_tokens):
+        return [text]
+    chunks: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+    for piece in _pieces(text, max_tokens, 0):
+        tokens = count_tokens(piece)
+        if current and current_tokens + tokens + 1 > max_tokens:
+            chunks.append("\n".join(current))
+            current, current_tokens = [], 0
+        current.append(piece)
+        current_tokens += tokens + 1
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+def embed_chunked(
+    embed_documents: Callable[[List[str]], List[List[float]]],
+    texts: Sequence[str],
+    max_tokens: int
+) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """Embed every chunk of every text in one batched call.
+
+    Returns, per text, its normalised chunk vectors (one row per chunk) and the
+    chunks' token counts, for pooling or late interaction.
+    """
+    chunked = [split_text(text, max_tokens) for text in texts]
+    flat = [chunk for chunks in chunked for chunk in chunks]
+    vectors = normalize_rows(embed_documents(flat))
+    result = []
+    start = 0
+    for chunks in chunked:
+        end = start + len(chunks)
+        weights = np.array([count_tokens(chunk) if len(chunks) > 1 else 1 for chunk in chunks], dtype=np.float32)
+        result.append((vectors[start:end], weights))
+        start = end
+    return result
+
+def pool(vectors: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """Token-weighted mean of normalised chunk vectors (the vector itself for a single chunk)"""
+    if len(vectors) == 1:
+        return vectors[0]
+    return (vectors * weights[:, None]).sum(axis=0) / weights.sum()
@@ -0,0 +1,159 @@
+import os
+import zlib
+from typing import Dict, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+# Response types worth compressing; images, PDFs and archives are already compressed
+_COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "application/xml", "+json", "+xml")
+
+_brotli = None
+
+def get_brotli():
+    """The brotli module, or None when the optional `brotli` package is not installed"""
+    global _brotli
+    if _brotli is None:
+        try:
+            import brotli
+            _brotli = brotli
+        except ImportError:
+            _brotli = False
+    return _brotli or None
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """Strong ETag of the `encoding`-encoded representation: '"abc"' -> '"abc-gzip"' (weak ETags are kept)"""
+    if etag.startswith("W/") or not etag.endswith('"'):
+        return etag
+    return etag[:-1] + "-" + encoding + '"'
+
+def strip_encoding_suffix(etag: str) -> str:
+    """The identity ETag an `encoded_etag` was derived from"""
+    for encoding in ("br", "gzip"):
+        suffix = "-" + encoding + '"'
+        if etag.endswith(suffix):
+            return etag[:-len(suffix)] + '"'
+    return etag
+
+def negotiate(accept_encoding: str, available=("br", "gzip")) -> Optional[str]:
+    """Best of `available` by the Accept-Encoding q-values (earlier entries win ties), or None"""
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding.strip():
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding.strip()] = q
+    best, best_q = None, 0.0
+    for coding in available:
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+class _Compressor:
+    """Incremental gzip or brotli encoder"""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        if encoding == "br":
+            self._brotli = get_brotli().Compressor(quality=brotli_quality)
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, 31) # wbits 31: gzip container
+
+    def compress(self, data: bytes) -> bytes:
+        return self._brotli.process(data) if self._brotli else self._zlib.compress(data)
+
+    def finish(self) -> bytes:
+        return self._brotli.finish() if self._brotli else self._zlib.flush()
+
+class CompressionMiddleware:
+    """ASGI middleware compressing responses with brotli or gzip, as negotiated from Accept-Encoding.
+
+    Brotli is offered only when the `brotli` package is installed. Bodies smaller
+    than COMPRESSION_MIN_SIZE bytes, non-text content types and responses that
+    already carry a Content-Encoding are sent as they are. A compressed response
+    gets its own strong ETag (the identity ETag with an encoding suffix), and a
+    304 echoes the encoded ETag the client revalidated with.
+    """
+
+    def __init__(self, app, minimum_size: Optional[int] = None):
+        self.app = app
+        self.minimum_size = minimum_size if minimum_size is not None else int(os.getenv("COMPRESSION_MIN_SIZE", 1000))
+        self.gzip_level = int(os.getenv("COMPRESSION_GZIP_LEVEL", 6))
+        self.brotli_quality = int(os.getenv("COMPRESSION_BROTLI_QUALITY", 4)) # 4 is about as fast as gzip -6
+        self.encodings = ("br", "gzip") if get_brotli() else ("gzip",)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_headers = Headers(scope=scope)
+        encoding = negotiate(request_headers.get("accept-encoding", ""), self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        state = {"start": None, "compressor": None, "passthrough": False}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["start"] = message # Held until the first body chunk shows whether to compress
+                return
+            if message["type"] != "http.response.body" or state["passthrough"]:
+                await send(message)
+                return
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            compressor = state["compressor"]
+            if compressor is None:
+                start = state["start"]
+                headers = MutableHeaders(raw=list(start.get("headers", [])))
+                content_type = headers.get("content-type", "")
+                if ("content-encoding" in headers or (not more_body and len(body) < self.minimum_size)
+                        or not any(kind in content_type for kind in _COMPRESSIBLE_TYPES)):
+                    state["passthrough"] = True
+                    if start["status"] == 304:
+                        start = {**start, "headers": self._not_modified_headers(
+                            headers, encoding, request_headers.get("if-none-match", "")).raw}
+                    await send(start)
+                    await send(message)
+                    return
+                compressor = state["compressor"] = _Compressor(encoding, self.gzip_level, self.brotli_quality)
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                etag = headers.get("etag")
+                if etag:
+                    headers["ETag"] = encoded_etag(etag, encoding) # A strong ETag names exact bytes
+                if more_body:
+                    del headers["Content-Length"] # Streamed: the compressed length is unknown up front
+                    data = compressor.compress(body)
+                else:
+                    data = compressor.compress(body) + compressor.finish()
+                    headers["Content-Length"] = str(len(data))
+                await send({**start, "headers": headers.raw})
+                await send({"type": "http.response.body", "body": data, "more_body": more_body})
+                return
+            data = compressor.compress(body)
+            if not more_body:
+                data += compressor.finish()
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
+
+    @staticmethod
+    def _not_modified_headers(headers: MutableHeaders, encoding: str, if_none_match: str) -> MutableHeaders:
+        """A 304 carries the ETag of the representation the client holds, which may be the encoded one"""
+        etag = headers.get("etag")
+        if etag:
+            encoded = encoded_etag(etag, encoding)
+            if encoded in (candidate.strip() for candidate in if_none_match.split(",")):
+                headers["ETag"] = encoded
+            headers.add_vary_header("Accept-Encoding")
+        return headers
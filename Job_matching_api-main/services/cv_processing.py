@@ -1,26 +1,59 @@
 import os
 import tempfile
 from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
 from typing import Optional
 import pymupdf4llm
-from openai import AzureOpenAI
+
+from services.azure_gateway import get_gateway
+from services.metrics import stage
+from services.resilience import get_breaker, mark_degraded
+from services.text_cleanup import prepare_cv_text
+
+# "summary": GPT structured summary (best quality); "fast": cleaned extracted text embedded directly
+CV_MODES = ("summary", "fast")
+
+def extract_cv_text(content: bytes, filename: str) -> str:
+    """CV text from markdown bytes, or from a PDF (or other PyMuPDF format) via pymupdf4llm"""
+    # If file is markdown, use content directly
+    if filename.endswith('.md'):
+        return content.decode('utf-8')
+
+    # For other file types (e.g. PDF), use temporary file and PyMuPDF
+    with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(filename)[1]) as temp_file:
+        temp_file.write(content)
+        temp_path = temp_file.name
+
+    try:
+        # Extract text using PyMuPDF
+        cv_markdown = pymupdf4llm.to_markdown(temp_path, page_chunks=True)
+        return " ".join([chunk['text'] for chunk in cv_markdown])
+    finally:
+        # Clean up temporary file
+        os.remove(temp_path)
 
 class CVProcessingService:
-    def __init__(self):
+    def __init__(self, openai_client=None):
         self.azure_api_key = os.getenv("AZURE_OPENAI_API_KEY")
         self.azure_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
         self.api_version = os.getenv("AZURE_OPENAI_API_VERSION")
         self.gpt4_deployment_name = os.getenv("AZURE_OPENAI_GPT4_DEPLOYMENT")
+        self.default_mode = os.getenv("CV_PROCESSING_MODE", "summary")
+        # When the GPT summary fails or its circuit is open, embed the cleaned CV text instead (fast mode)
+        self.summary_fallback = os.getenv("CV_SUMMARY_FALLBACK", "true").lower() == "true"
+        self.gpt_breaker = get_breaker("azure_gpt")
 
-        if not all([self.azure_api_key, self.azure_endpoint, self.api_version, self.gpt4_deployment_name]):
-            raise ValueError("Missing required Azure OpenAI environment variables (API Key, Endpoint, API Version, GPT4 Deployment)")
+        if openai_client is not None:
+            # Any object exposing chat.completions.create (e.g. benchmarks.fakes.FakeOpenAIClient)
+            self.openai_client = openai_client
+            self.gpt4_deployment_name = self.gpt4_deployment_name or "custom"
+        else:
+            if not all([self.azure_api_key, self.azure_endpoint, self.api_version, self.gpt4_deployment_name]):
+                raise ValueError("Missing required Azure OpenAI environment variables (API Key, Endpoint, API Version, GPT4 Deployment)")
 
-        self.openai_client = AzureOpenAI(
-            api_key=self.azure_api_key,
-            api_version=self.api_version,
-            azure_endpoint=self.azure_endpoint
+            # Shares the embeddings' connection pool; a 2048-token summary normally takes well under a minute
+            self.openai_client = get_gateway().openai_client("chat")
             # Note: azure_deployment is often specified per-call, not globally here
-        )
         self.cv_prompt = """
         You are a highly intelligent assistant tasked with analyzing CVs and creating concise, structured summaries optimized for comparing with job descriptions.
 
@@ -48,40 +81,60 @@ class CVProcessingService:
         Respond in the requested structured format.
         """
 
-    async def process_cv(self, cv_file: UploadFile) -> str:
+    async def process_cv(self, cv_file: UploadFile, mode: Optional[str] = None) -> str:
         """Process CV file and return structured content"""
-        try:
-            # Read file content
+        # Read file content
+        with stage("upload_read"):
             content = await cv_file.read()
-            
-            # If file is markdown, use content directly
-            if cv_file.filename.endswith('.md'):
-                cv_text = content.decode('utf-8')
+        return await self.process_cv_content(content, cv_file.filename, mode)
+
+    async def process_cv_content(self, content: bytes, filename: str, mode: Optional[str] = None) -> str:
+        """Turn uploaded CV bytes into the text to embed (extraction and GPT run in the thread pool)"""
+        mode = mode or self.default_mode
+        if mode not in CV_MODES:
+            raise ValueError(f"Unknown CV processing mode: {mode}")
+        try:
+            if filename.endswith('.md'):
+                cv_text = extract_cv_text(content, filename)
             else:
-                # For other file types (e.g. PDF), use temporary file and PyMuPDF
-                with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(cv_file.filename)[1]) as temp_file:
-                    temp_file.write(content)
-                    temp_path = temp_file.name
-
-                # Extract text using PyMuPDF
-                cv_markdown = pymupdf4llm.to_markdown(temp_path, page_chunks=True)
-                cv_text = " ".join([chunk['text'] for chunk in cv_markdown])
-                
-                # Clean up temporary file
-                os.remove(temp_path)
+                with stage("pdf_extraction"):
+                    cv_text = await run_in_threadpool(extract_cv_text, content, filename)
+
+            if mode == "fast":
+                # Skip the LLM: cleaned text goes straight to the embedding
+                with stage("text_cleanup"):
+                    return await run_in_threadpool(prepare_cv_text, cv_text)
 
             # Generate structured summary using OpenAI
-            response = self.openai_client.chat.completions.create(
-                model=self.gpt4_deployment_name, # Use the deployment name from env
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant."},
-                    {"role": "user", "content": self.cv_prompt.format(content=cv_text)}
-                ],
-                temperature=0,
-                max_tokens=2048
-            )
-
-            return response.choices[0].message.content
+            try:
+                with stage("gpt_summary"):
+                    return await run_in_threadpool(self.gpt_breaker.call, self._summarize, cv_text)
+            except Exception as e:
+                if not self.summary_fallback:
+                    raise
+                print(f"GPT summary unavailable, embedding the cleaned CV text instead: {e}")
+                mark_degraded("cv_summary")
+            with stage("text_cleanup"):
+                return await run_in_threadpool(prepare_cv_text, cv_text)
 
         except Exception as e:
             raise Exception(f"Error processing CV: {str(e)}")
+
+    def prepare_text(self, cv_text: str, mode: Optional[str] = None) -> str:
+        """Text to embed for already extracted CV text (blocking; used by batch jobs)"""
+        mode = mode or self.default_mode
+        if mode not in CV_MODES:
+            raise ValueError(f"Unknown CV processing mode: {mode}")
+        return prepare_cv_text(cv_text) if mode == "fast" else self.gpt_breaker.call(self._summarize, cv_text)
+
+    def _summarize(self, cv_text: str) -> str:
+        response = self.openai_client.chat.completions.create(
+            model=self.gpt4_deployment_name, # Use the deployment name from env
+            messages=[
+                {"role": "system", "content": "You are a helpful assistant."},
+                {"role": "user", "content": self.cv_prompt.format(content=cv_text)}
+            ],
+            temperature=0,
+            max_tokens=2048
+        )
+        return response.choices[0].message.content
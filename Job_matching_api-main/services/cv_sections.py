@@ -0,0 +1,44 @@
+import re
+from typing import List, Tuple
+
+# Section headers produced by CVProcessingService.cv_prompt, e.g. "2. **Key Skills and Expertise**: ..."
+_HEADER_RE = re.compile(r"^\s*(?:#+\s*|\d+\.\s*)?\*\*(?P<title>[^*]+?)\*\*\s*:?\s*(?P<rest>.*)$")
+_EMPTY_RE = re.compile(r"^(n/?a|none|-|not (specified|mentioned|provided|available))\.?$", re.IGNORECASE)
+
+# Relative weight of each section in the late-interaction score, matched on a lowercase substring. The
+# first matching key wins, so qualified keys come before the words they qualify ("Soft Skills" is not "skill")
+SECTION_WEIGHTS = [
+    ("soft", 0.5),
+    ("programming", 1.5),
+    ("language", 0.3),
+    ("skill", 1.5),
+    ("technolog", 1.5),
+    ("experience", 1.2),
+    ("keyword", 1.2),
+    ("project", 1.0),
+    ("summary", 1.0),
+    ("interest", 1.0),
+    ("certif", 0.8),
+    ("education", 0.6),
+]
+
+def section_weight(title: str) -> float:
+    title = title.lower()
+    return next((weight for key, weight in SECTION_WEIGHTS if key in title), 1.0)
+
+def split_sections(summary: str) -> List[Tuple[str, str]]:
+    """Split the structured CV summary into (title, text) pairs, dropping empty sections"""
+    sections: List[Tuple[str, List[str]]] = []
+    for line in summary.splitlines():
+        match = _HEADER_RE.match(line)
+        # Sub-items ("- **Job Title**: ...") are indented; only top-level bold headers start a section
+        if match and not line[:1].isspace() and not line.startswith(("-", "+")):
+            sections.append((match.group("title").strip(), [match.group("rest")]))
+        elif sections:
+            sections[-1][1].append(line)
+    result = []
+    for title, lines in sections:
+        text = " ".join(part.strip() for part in lines if part.strip())
+        if text and not _EMPTY_RE.match(text):
+            result.append((title, text))
+    return result
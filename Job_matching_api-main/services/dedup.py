@@ -0,0 +1,225 @@
+"""Near-duplicate detection for job postings (MinHash signatures + LSH banding).
+
+Reposts of the same role (other city, other date, small edits) get the
+`cluster_id` of the first posting seen, so they share its embedding and can be
+collapsed at query time. Runs as an ingestion stage; existing rows are
+clustered with:
+
+    python -m services.dedup
+"""
+import os
+import re
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from models.database import JobPosting
+from services.job_index import job_text
+
+_WORD_RE = re.compile(r"\w+")
+_MASK = np.uint64(0xFFFFFFFF)
+_WORD_CACHE_SIZE = 200_000
+
+class MinHasher:
+    """MinHash signatures over word k-shingles, computed for all permutations in one numpy pass"""
+
+    def __init__(self, num_perm: int = 128, shingle_size: int = 5, seed: int = 1, chunk_shingles: int = 8192):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        # Shingles permuted per array operation: bounds the (num_perm x chunk) uint64 temporary (8 MiB by default)
+        self.chunk_shingles = chunk_shingles
+        rng = np.random.RandomState(seed)
+        # Multiply-add-shift hashing: (a * h + b) mod 2**64, top 32 bits; a is odd, wrap-around is the modulo
+        self._a = rng.randint(0, 1 << 63, size=(num_perm, 1), dtype=np.int64).astype(np.uint64) | np.uint64(1)
+        self._b = rng.randint(0, 1 << 63, size=(num_perm, 1), dtype=np.int64).astype(np.uint64)
+        self._word_hashes: Dict[str, int] = {} # Postings share most of their vocabulary
+
+    def _word_hash(self, word: str) -> int:
+        if len(self._word_hashes) >= _WORD_CACHE_SIZE:
+            self._word_hashes.clear()
+        value = self._word_hashes[word] = zlib.crc32(word.encode())
+        return value
+
+    def shingles(self, text: str) -> np.ndarray:
+        """32-bit hashes of the text's word k-shingles (stable across processes)"""
+        cache = self._word_hashes
+        hashes = np.array([cache[word] if word in cache else self._word_hash(word)
+                           for word in _WORD_RE.findall(text.lower())], dtype=np.uint64)
+        if len(hashes) == 0:
+            return hashes
+        k = min(self.shingle_size, len(hashes))
+        # Polynomial rolling hash of each window of k word hashes
+        windows = np.zeros(len(hashes) - k + 1, dtype=np.uint64)
+        for offset in range(k):
+            windows = (windows * np.uint64(1000003) + hashes[offset:len(hashes) - k + 1 + offset]) & _MASK
+        return windows
+
+    def signatures(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """uint32 signature of `num_perm` minimums per text (None for texts without words).
+
+        The shingles of the batch are permuted `chunk_shingles` at a time, each
+        chunk in one array operation reduced per text (a text may span chunks),
+        so the per-posting cost is mostly tokenisation and memory stays bounded.
+        """
+        shingles = [self.shingles(text) for text in texts]
+        present = [i for i, hashes in enumerate(shingles) if len(hashes)]
+        result: List[Optional[np.ndarray]] = [None] * len(texts)
+        if not present:
+            return result
+        hashes = np.concatenate([shingles[i] for i in present])
+        offsets = np.cumsum([0] + [len(shingles[i]) for i in present[:-1]])
+        minimums = np.full((self.num_perm, len(present)), np.iinfo(np.uint32).max, dtype=np.uint32)
+        for start in range(0, len(hashes), self.chunk_shingles):
+            stop = min(start + self.chunk_shingles, len(hashes))
+            permuted = self._a * hashes[None, start:stop]
+            permuted += self._b
+            permuted >>= np.uint64(32)
+            # Texts overlapping [start, stop) and where each one begins within the chunk
+            first, last = np.searchsorted(offsets, start, side="right") - 1, np.searchsorted(offsets, stop)
+            bounds = np.maximum(offsets[first:last], start) - start
+            np.minimum(minimums[:, first:last], np.minimum.reduceat(permuted, bounds, axis=1).astype(np.uint32),
+                       out=minimums[:, first:last])
+        for column, i in enumerate(present):
+            result[i] = np.ascontiguousarray(minimums[:, column])
+        return result
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        return self.signatures([text])[0]
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of the shingle sets behind two signatures"""
+    return float(np.mean(a == b))
+
+class MinHashLSH:
+    """Banded LSH over MinHash signatures: postings sharing any band are candidate duplicates.
+
+    With `bands` bands of r rows, the chance of becoming a candidate is
+    1 - (1 - s**r)**bands for Jaccard similarity s, so lookup cost depends on the
+    bucket sizes, not on the number of postings indexed.
+    """
+
+    def __init__(self, num_perm: int = 128, bands: int = 16):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.bands = bands
+        # Multipliers folding each band's rows into one 64-bit bucket key
+        self._fold = np.uint64(0x9E3779B97F4A7C15) ** np.arange(num_perm // bands, dtype=np.uint64)
+        self._buckets: Dict[Tuple[int, int], Set[str]] = defaultdict(set)
+        self._entries: Dict[str, Tuple[np.ndarray, str]] = {} # job id -> (signature, cluster id)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _keys(self, signature: np.ndarray) -> List[Tuple[int, int]]:
+        folded = (signature.reshape(self.bands, -1).astype(np.uint64) * self._fold).sum(axis=1, dtype=np.uint64)
+        return list(enumerate(folded.tolist()))
+
+    def insert(self, job_id: str, signature: np.ndarray, cluster_id: str) -> None:
+        self.remove(job_id)
+        self._entries[job_id] = (signature, cluster_id)
+        for key in self._keys(signature):
+            self._buckets[key].add(job_id)
+
+    def remove(self, job_id: str) -> None:
+        entry = self._entries.pop(job_id, None)
+        if entry is None:
+            return
+        for key in self._keys(entry[0]):
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(job_id)
+                if not bucket:
+                    del self._buckets[key]
+
+    def query(self, signature: np.ndarray, threshold: float) -> Optional[Tuple[str, float]]:
+        """Cluster id and similarity of the closest indexed posting at or above `threshold`"""
+        candidates = set()
+        for key in self._keys(signature):
+            candidates.update(self._buckets.get(key, ()))
+        best = None
+        for job_id in candidates:
+            candidate, cluster_id = self._entries[job_id]
+            score = similarity(signature, candidate)
+            if score >= threshold and (best is None or score > best[1]):
+                best = (cluster_id, score)
+        return best
+
+class NearDuplicateStage:
+    """Ingestion stage that stores each posting's MinHash signature and assigns its cluster id.
+
+    A posting joins the cluster of its most similar indexed posting when their
+    estimated Jaccard similarity reaches DEDUP_THRESHOLD; otherwise it starts a
+    cluster named after its own id. The LSH index is loaded from the stored
+    signatures on first use and then kept in memory (num_perm * 4 bytes per posting).
+    """
+
+    def __init__(self, threshold: Optional[float] = None, num_perm: Optional[int] = None,
+                 bands: Optional[int] = None, shingle_size: Optional[int] = None):
+        self.threshold = threshold or float(os.getenv("DEDUP_THRESHOLD", 0.8))
+        num_perm = num_perm or int(os.getenv("DEDUP_NUM_PERM", 128))
+        self.hasher = MinHasher(num_perm, shingle_size or int(os.getenv("DEDUP_SHINGLE_SIZE", 5)))
+        self.lsh = MinHashLSH(num_perm, bands or int(os.getenv("DEDUP_BANDS", 16)))
+        self._loaded = False
+
+    def _load(self, db: Session, batch_size: int = 5000) -> None:
+        """Index the signatures already stored (keyset-paginated by id)"""
+        query = db.query(JobPosting.id, JobPosting.cluster_id, JobPosting.minhash).filter(
+            JobPosting.minhash.isnot(None)).order_by(JobPosting.id)
+        last_id = None
+        while True:
+            page = query if last_id is None else query.filter(JobPosting.id > last_id)
+            rows = page.limit(batch_size).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            for job_id, cluster_id, minhash in rows:
+                if minhash and len(minhash) == self.hasher.num_perm * 4:
+                    self.lsh.insert(job_id, np.frombuffer(minhash, dtype=np.uint32), cluster_id or job_id)
+        print(f"Loaded {len(self.lsh)} MinHash signatures")
+        self._loaded = True
+
+    def __call__(self, jobs: List[JobPosting], db: Session) -> None:
+        if not self._loaded:
+            self._load(db)
+        duplicates = 0
+        signatures = self.hasher.signatures([job_text(job) for job in jobs])
+        for job, signature in zip(jobs, signatures):
+            if signature is None:
+                # Empty postings are never clustered; b"" marks them as processed
+                job.minhash, job.cluster_id = b"", job.id
+                self.lsh.remove(job.id)
+                continue
+            self.lsh.remove(job.id) # An updated posting must not match its own previous version
+            match = self.lsh.query(signature, self.threshold)
+            job.cluster_id = match[0] if match else job.id
+            job.minhash = signature.tobytes()
+            self.lsh.insert(job.id, signature, job.cluster_id)
+            duplicates += match is not None and job.cluster_id != job.id
+        if duplicates:
+            print(f"Clustered {duplicates} of {len(jobs)} postings as near-duplicates")
+
+def collapse_duplicates(scored: List[Tuple[JobPosting, float]]) -> List[Tuple[JobPosting, float]]:
+    """Keep the best-scored posting of each cluster (input sorted by score, descending)"""
+    seen = set()
+    collapsed = []
+    for job, score in scored:
+        key = job.cluster_id or job.id
+        if key not in seen:
+            seen.add(key)
+            collapsed.append((job, score))
+    return collapsed
+
+if __name__ == "__main__":
+    from database.session import SessionLocal, init_db
+    from services.ingestion import JobIngestionPipeline
+
+    init_db()
+    db = SessionLocal()
+    try:
+        total = JobIngestionPipeline([NearDuplicateStage()]).backfill(db, only_missing=False)
+        print(f"Clustering complete: {total} job postings processed.")
+    finally:
+        db.close()
@@ -0,0 +1,33 @@
+import numpy as np
+
+def similarity_matrix(vectors: np.ndarray) -> np.ndarray:
+    """Shortlist x shortlist cosine similarities of normalised rows (one matrix product)"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors @ vectors.T
+
+def mmr(relevance: np.ndarray, similarities: np.ndarray, k: int, lambda_: float) -> np.ndarray:
+    """Indices of `k` shortlist items in maximal-marginal-relevance order.
+
+    Each step picks the item maximising lambda * relevance - (1 - lambda) * (its
+    highest similarity to an item already picked), using the precomputed
+    `similarities` matrix. A step is three vector operations over the shortlist,
+    with no Python loop over items. lambda=1 keeps the relevance order.
+    """
+    n = len(relevance)
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    penalties = (1.0 - lambda_) * np.asarray(similarities, dtype=np.float32)
+    gains = lambda_ * np.asarray(relevance, dtype=np.float32)
+    selected = np.empty(k, dtype=np.intp)
+    selected[0] = int(np.argmax(gains))
+    max_penalty = penalties[selected[0]].copy()
+    gains[selected[0]] = -np.inf # Picked items can never win again
+    scores = np.empty_like(gains)
+    for step in range(1, k):
+        np.subtract(gains, max_penalty, out=scores)
+        chosen = int(np.argmax(scores))
+        selected[step] = chosen
+        gains[chosen] = -np.inf
+        np.maximum(max_penalty, penalties[chosen], out=max_penalty)
+    return selected
@@ -0,0 +1,93 @@
+import os
+import time
+from typing import List, Optional, Set, Tuple
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sqlalchemy.orm import Session
+
+from models.database import JobPosting
+from services.job_index import job_text
+from services.rebuild import VersionedSlot
+from services.result_cache import corpus_version
+
+class KeywordRanker:
+    """TF-IDF index of the job texts, used to rank matches locally when the embedding provider is down.
+
+    Built from the database at start-up (about 2 s per 20k postings, 8 bytes per
+    distinct term of each posting) and, once the corpus version has changed,
+    rebuilt every FALLBACK_REFRESH_SECONDS by the RebuildOrchestrator, so it
+    answers without any network call. Scores are cosine similarities of TF-IDF
+    vectors, on a different scale from the embedding scores.
+    """
+
+    def __init__(self, max_features: Optional[int] = None, refresh_seconds: Optional[int] = None):
+        self.max_features = max_features or int(os.getenv("FALLBACK_MAX_FEATURES", 100_000))
+        self.refresh_seconds = refresh_seconds or int(os.getenv("FALLBACK_REFRESH_SECONDS", 3600))
+        # Generations of (vectorizer, sparse matrix with one L2-normalised row per job, job ids)
+        self.slot: VersionedSlot[Tuple[TfidfVectorizer, object, np.ndarray]] = VersionedSlot("fallback_ranker")
+
+    def __len__(self) -> int:
+        index = self.slot.value
+        return len(index[2]) if index is not None else 0
+
+    @property
+    def ready(self) -> bool:
+        return self.slot.value is not None
+
+    def build(self, db: Session) -> None:
+        """Build a generation and serve it (start-up; later rebuilds go through the orchestrator)"""
+        self.slot.swap(*self.build_generation(db))
+
+    def build_generation(self, db: Session, batch_size: int = 5000) -> Tuple[Tuple, str]:
+        """Fit the vocabulary and index every posting (keyset-paginated by id), with the corpus version"""
+        start = time.perf_counter()
+        version = str(corpus_version(db))
+        ids, texts = [], []
+        query = db.query(JobPosting).order_by(JobPosting.id)
+        last_id = None
+        while True:
+            page = query if last_id is None else query.filter(JobPosting.id > last_id)
+            jobs = page.limit(batch_size).all()
+            if not jobs:
+                break
+            last_id = jobs[-1].id
+            ids.extend(job.id for job in jobs)
+            texts.extend(job_text(job) for job in jobs)
+            db.expunge_all() # Keep the session's identity map from holding the whole corpus
+        vectorizer = TfidfVectorizer(sublinear_tf=True, stop_words="english", max_features=self.max_features,
+                                     dtype=np.float32)
+        if not texts:
+            raise ValueError("no job postings to index")
+        index = (vectorizer, vectorizer.fit_transform(texts), np.array(ids, dtype=object))
+        print(f"Built keyword fallback index over {len(ids)} jobs in {time.perf_counter() - start:.1f}s")
+        return index, version
+
+    def validate(self, index: Tuple[TfidfVectorizer, object, np.ndarray]) -> None:
+        """Sample queries: the indexed text of a few jobs must find those jobs"""
+        vectorizer, matrix, ids = index
+        terms = vectorizer.get_feature_names_out()
+        for row in np.linspace(0, len(ids) - 1, min(3, len(ids))).astype(int):
+            text = " ".join(terms[matrix[row].indices])
+            if text and not _search(index, text, 10, None):
+                raise ValueError(f"no result for the terms of job {ids[row]}")
+
+    def search(self, text: str, limit: int, allowed_ids: Optional[Set[str]] = None) -> List[Tuple[str, float]]:
+        """Top `limit` (job id, score) pairs for the query text, best first"""
+        if not text.strip():
+            return []
+        with self.slot.acquire() as index:
+            return _search(index, text, limit, allowed_ids) if index is not None else []
+
+def _search(index: Tuple[TfidfVectorizer, object, np.ndarray], text: str, limit: int,
+            allowed_ids: Optional[Set[str]]) -> List[Tuple[str, float]]:
+    """Top `limit` (job id, score) pairs of one index generation"""
+    vectorizer, matrix, ids = index
+    scores = (matrix @ vectorizer.transform([text]).T).toarray().ravel()
+    if allowed_ids is not None:
+        scores[~np.isin(ids, list(allowed_ids))] = 0.0
+    candidates = np.flatnonzero(scores > 0)
+    if len(candidates) > limit:
+        candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+    candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+    return [(ids[i], float(scores[i])) for i in candidates]
@@ -0,0 +1,176 @@
+"""Job index generations, one per embedding model build, switched through a CURRENT pointer.
+
+    job_index/
+        CURRENT                                   name of the generation queries are served from
+        text-embedding-3-small-20250101T090000/   vectors.npy, ids.npy, meta.json (see JobIndex.save)
+        text-embedding-3-large-20250301T120000/
+        leases/<host>-<pid>.json                  generations each process is serving or building
+"""
+import json
+import os
+import re
+import shutil
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Set
+
+POINTER = "CURRENT"
+LEASES = "leases"
+BUILDING = ".building" # Marker of a generation still being embedded
+
+class IndexStore:
+    """Model-versioned index generations under one directory.
+
+    A new generation is built next to the served one and published by
+    atomically replacing CURRENT. Generations that are neither current nor named
+    by a lease refreshed in the last JOB_INDEX_LEASE_SECONDS are deleted by
+    `collect_garbage`.
+    """
+
+    def __init__(self, root: str, lease_seconds: Optional[float] = None):
+        self.root = root
+        self.lease_seconds = lease_seconds or float(os.getenv("JOB_INDEX_LEASE_SECONDS", 900))
+        self.owner = f"{socket.gethostname()}-{os.getpid()}"
+
+    @staticmethod
+    def is_store(path: str) -> bool:
+        return os.path.exists(os.path.join(path, POINTER))
+
+    def path(self, generation: str) -> str:
+        return os.path.join(self.root, generation)
+
+    def current(self) -> Optional[str]:
+        """Name of the published generation, None before the first publish"""
+        try:
+            with open(os.path.join(self.root, POINTER)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def generations(self) -> Dict[str, dict]:
+        """meta.json of every complete generation, by name"""
+        found = {}
+        for name in sorted(os.listdir(self.root)) if os.path.isdir(self.root) else []:
+            meta_path = os.path.join(self.root, name, "meta.json")
+            if os.path.exists(meta_path) and not os.path.exists(os.path.join(self.root, name, BUILDING)):
+                with open(meta_path) as f:
+                    found[name] = json.load(f)
+        return found
+
+    def create(self, model: str) -> str:
+        """Leased, empty directory for a new generation of `model`; returns its name"""
+        slug = re.sub(r"[^A-Za-z0-9._-]+", "-", model).strip("-.") or "model"
+        generation = f"{slug}-{time.strftime('%Y%m%dT%H%M%S')}"
+        self.lease(generation) # Before the directory exists, so a concurrent collect_garbage never sees it unleased
+        os.makedirs(self.path(generation))
+        open(os.path.join(self.path(generation), BUILDING), "w").close()
+        return generation
+
+    def complete(self, generation: str) -> None:
+        """Mark a generation written by JobIndex.save as complete (it can then be published)"""
+        os.remove(os.path.join(self.path(generation), BUILDING))
+
+    def publish(self, generation: str) -> None:
+        """Point CURRENT at a complete generation; readers see either the old or the new name"""
+        if generation not in self.generations():
+            raise ValueError(f"No complete index generation {generation!r} in {self.root}")
+        tmp = os.path.join(self.root, f".{POINTER}.{self.owner}.tmp")
+        with open(tmp, "w") as f:
+            f.write(generation)
+        os.replace(tmp, os.path.join(self.root, POINTER))
+        print(f"Published job index generation {generation}")
+
+    def lease(self, *generations: str) -> None:
+        """Record (or refresh) the generations this process uses, replacing its previous lease"""
+        os.makedirs(os.path.join(self.root, LEASES), exist_ok=True)
+        tmp = os.path.join(self.root, LEASES, f".{self.owner}.tmp")
+        with open(tmp, "w") as f:
+            json.dump({"generations": list(generations), "owner": self.owner, "updated": time.time()}, f)
+        os.replace(tmp, os.path.join(self.root, LEASES, f"{self.owner}.json"))
+
+    def release(self) -> None:
+        try:
+            os.remove(os.path.join(self.root, LEASES, f"{self.owner}.json"))
+        except FileNotFoundError:
+            pass
+
+    @contextmanager
+    def holding(self, generation: str):
+        """Keep the lease on `generation` fresh while the enclosed work runs (e.g. a long build)"""
+        stop = threading.Event()
+
+        def heartbeat():
+            while not stop.wait(self.lease_seconds / 3):
+                self.lease(generation)
+
+        self.lease(generation)
+        thread = threading.Thread(target=heartbeat, daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+            self.release()
+
+    def leased(self) -> Set[str]:
+        """Generations named by a fresh lease (stale lease files, e.g. of crashed processes, are removed)"""
+        leases_dir = os.path.join(self.root, LEASES)
+        names = set()
+        for entry in os.listdir(leases_dir) if os.path.isdir(leases_dir) else []:
+            if not entry.endswith(".json"):
+                continue
+            path = os.path.join(leases_dir, entry)
+            try:
+                with open(path) as f:
+                    lease = json.load(f)
+            except (FileNotFoundError, ValueError):
+                continue
+            if time.time() - lease["updated"] > self.lease_seconds:
+                os.remove(path)
+            else:
+                names.update(lease["generations"])
+        return names
+
+    def collect_garbage(self) -> List[str]:
+        """Delete generations that are neither current nor leased; returns their names"""
+        keep = self.leased() | {self.current()}
+        removed = []
+        for name in os.listdir(self.root) if os.path.isdir(self.root) else []:
+            path = self.path(name)
+            is_generation = os.path.exists(os.path.join(path, "meta.json")) or os.path.exists(os.path.join(path, BUILDING))
+            if name in keep or not os.path.isdir(path) or not is_generation:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            removed.append(name)
+            print(f"Removed unreferenced job index generation {name}")
+        return removed
+
+def paced(embed: Callable[[List[str]], object], texts_per_minute: float, attempts: int = 5) -> Callable:
+    """Wrap `embed` so a background build stays under `texts_per_minute` (0: unpaced) and rides out outages.
+
+    Keeps most of the embedding deployment's quota for live queries while a
+    new generation is built. A failed batch is retried with exponential backoff.
+    """
+    interval = 60.0 / texts_per_minute if texts_per_minute > 0 else 0.0
+    next_at = time.monotonic()
+
+    def embed_paced(texts: List[str]):
+        nonlocal next_at
+        for attempt in range(attempts):
+            wait = next_at - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            next_at = max(next_at, time.monotonic()) + len(texts) * interval
+            try:
+                return embed(texts)
+            except Exception as e:
+                if attempt == attempts - 1:
+                    raise
+                delay = 5 * 2 ** attempt
+                print(f"Embedding batch failed ({e}), retrying in {delay}s")
+                next_at = time.monotonic() + delay
+
+    return embed_paced
@@ -0,0 +1,86 @@
+import os
+from typing import Callable, Iterable, List
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from models.database import JobPosting
+from services.dedup import NearDuplicateStage
+from services.job_fields import populate_structured_fields
+from services.result_cache import bump_corpus_version
+
+# A stage receives the postings of one batch (already attached to the session) and enriches them in place
+IngestionStage = Callable[[List[JobPosting], Session], None]
+
+def structured_fields_stage(jobs: List[JobPosting], db: Session) -> None:
+    """Parse salary / level / location into the typed, indexed columns"""
+    for job in jobs:
+        populate_structured_fields(job)
+
+class JobIngestionPipeline:
+    """Runs job postings through the enrichment stages before they are committed"""
+
+    def __init__(self, stages: List[IngestionStage] = None):
+        if stages is None:
+            stages = [structured_fields_stage]
+            if os.getenv("DEDUP_ENABLED", "true").lower() == "true":
+                stages.append(NearDuplicateStage())
+        self.stages = stages
+
+    def _run_stages(self, jobs: List[JobPosting], db: Session) -> None:
+        for stage in self.stages:
+            stage(jobs, db)
+        # Committed with the batch, so cached rankings never outlive the postings they were built from
+        bump_corpus_version(db)
+
+    def ingest(self, jobs: Iterable[JobPosting], db: Session, batch_size: int = 500) -> int:
+        """Insert or update job postings, running every stage per batch"""
+        count = 0
+        batch = []
+        for job in jobs:
+            batch.append(db.merge(job))
+            if len(batch) >= batch_size:
+                self._run_stages(batch, db)
+                db.commit()
+                count += len(batch)
+                batch = []
+        if batch:
+            self._run_stages(batch, db)
+            db.commit()
+            count += len(batch)
+        return count
+
+    def backfill(self, db: Session, batch_size: int = 500, only_missing: bool = True) -> int:
+        """Re-run the stages over postings already stored (e.g. rows written by the scraper)"""
+        query = db.query(JobPosting).order_by(JobPosting.id)
+        if only_missing:
+            query = query.filter(or_(
+                and_(JobPosting.seniority.is_(None), JobPosting.work_mode.is_(None),
+                     JobPosting.salary_min.is_(None), JobPosting.salary_max.is_(None)),
+                JobPosting.minhash.is_(None),
+            ))
+
+        count = 0
+        last_id = None
+        while True:
+            # Keyset pagination keeps each batch an index scan on the primary key
+            page = query if last_id is None else query.filter(JobPosting.id > last_id)
+            jobs = page.limit(batch_size).all()
+            if not jobs:
+                break
+            last_id = jobs[-1].id
+            self._run_stages(jobs, db)
+            db.commit()
+            count += len(jobs)
+            print(f"Backfilled {count} job postings")
+        return count
+
+if __name__ == "__main__":
+    from database.session import SessionLocal, init_db
+
+    init_db()
+    db = SessionLocal()
+    try:
+        total = JobIngestionPipeline().backfill(db)
+        print(f"Backfill complete: {total} job postings updated.")
+    finally:
+        db.close()
@@ -0,0 +1,105 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, NamedTuple, Optional
+
+from sqlalchemy.orm import Session
+
+from models.schemas import JobResponse
+from services.compression import strip_encoding_suffix
+from services.result_cache import corpus_version
+
+class CachedJob(NamedTuple):
+    etag: str # Strong ETag: hash of the serialised body, identical on every worker and pod
+    body: bytes # JSON payload of the JobResponse
+    version: int # Corpus version the payload was last checked against
+    expires_at: float
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches the ETag (weak comparison, as RFC 9110 specifies for it).
+
+    The ETags CompressionMiddleware gives encoded responses match too.
+    """
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or strip_encoding_suffix(candidate.removeprefix("W/")) == etag:
+            return True
+    return False
+
+class JobDetailCache:
+    """Bounded LRU of serialised job detail responses, with strong content-hash ETags.
+
+    Entries are served without touching the database while the corpus version,
+    re-read at most every JOB_CACHE_VERSION_TTL_SECONDS, is the one they were
+    checked against. Once an ingestion batch bumps it, the next view of each job
+    reloads its row; the ETag only changes if the job's content did, so clients
+    and CDNs keep getting 304s for unchanged postings.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, ttl_seconds: Optional[int] = None,
+                 version_ttl_seconds: Optional[float] = None):
+        self.max_entries = max_entries or int(os.getenv("JOB_CACHE_MAX_ENTRIES", 10_000))
+        self.ttl_seconds = ttl_seconds or int(os.getenv("JOB_CACHE_TTL_SECONDS", 600))
+        self.version_ttl_seconds = version_ttl_seconds or float(os.getenv("JOB_CACHE_VERSION_TTL_SECONDS", 5))
+        self._entries: "OrderedDict[str, CachedJob]" = OrderedDict()
+        self._version: Optional[int] = None
+        self._version_checked = 0.0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, job_id: str) -> Optional[CachedJob]:
+        """The cached payload if it can be served as is, else None (the caller then calls `load`)"""
+        now = time.monotonic()
+        with self._lock:
+            if self._version is None or now - self._version_checked >= self.version_ttl_seconds:
+                return None
+            entry = self._entries.get(job_id)
+            if entry is None or entry.version != self._version or entry.expires_at <= now:
+                return None
+            self._entries.move_to_end(job_id)
+            return entry
+
+    def _current_version(self, db: Session) -> int:
+        now = time.monotonic()
+        with self._lock:
+            if self._version is not None and now - self._version_checked < self.version_ttl_seconds:
+                return self._version
+        version = corpus_version(db)
+        with self._lock:
+            self._version = version
+            self._version_checked = now
+        return version
+
+    def load(self, job_id: str, db: Session,
+             fetch: Callable[[str, Session], Optional[JobResponse]]) -> Optional[CachedJob]:
+        """Revalidate the corpus version and, if needed, rebuild the payload with `fetch` (None: no such job)"""
+        version = self._current_version(db)
+        entry = self.get(job_id)
+        if entry is not None:
+            return entry # Only the version check was due
+        job = fetch(job_id, db)
+        if job is None:
+            with self._lock:
+                self._entries.pop(job_id, None)
+            return None
+        body = job.model_dump_json().encode()
+        entry = CachedJob(make_etag(body), body, version, time.monotonic() + self.ttl_seconds)
+        with self._lock:
+            self._entries[job_id] = entry
+            self._entries.move_to_end(job_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
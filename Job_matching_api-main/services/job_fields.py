@@ -0,0 +1,254 @@
+import re
+from typing import Optional, Tuple, Dict, Any, List
+
+from models.database import JobPosting, Seniority, WorkMode
+
+# --- Salary -----------------------------------------------------------------
+
+_CURRENCY_SYMBOLS = {"$": "USD", "€": "EUR", "£": "GBP", "¥": "JPY", "₹": "INR"}
+_CURRENCY_WORDS = {
+    "USD": "USD", "US$": "USD", "DOLLARS": "USD",
+    "EUR": "EUR", "EURO": "EUR", "EUROS": "EUR",
+    "GBP": "GBP", "CAD": "CAD", "AUD": "AUD", "CHF": "CHF", "INR": "INR",
+    "JPY": "JPY", "AED": "AED", "SAR": "SAR",
+    "MAD": "MAD", "DH": "MAD", "DHS": "MAD", "DIRHAM": "MAD", "DIRHAMS": "MAD",
+}
+_CURRENCY_WORD_RE = re.compile(r"\b(" + "|".join(re.escape(w) for w in sorted(_CURRENCY_WORDS, key=len, reverse=True)) + r")\b", re.I)
+
+# "120,000" / "50 000" / "1.500" (grouped thousands) or "45.50" / "85" (plain), with an optional k/m suffix
+_NUMBER_RE = re.compile(r"(\d{1,3}(?:[,.\s ]\d{3})+|\d+(?:[.,]\d+)?)\s*([kKmM])?(?![a-zA-Z])")
+
+# Multipliers used to annualise a salary quoted per hour/day/week/month
+_PERIOD_RULES = [
+    (re.compile(r"(/|\bper\b|\bpar\b|\ban?\b)\s*(hour|hr|h)\b|\bhourly\b|\bde l'heure\b", re.I), 2080),
+    (re.compile(r"(/|\bper\b|\bpar\b|\ban?\b)\s*(day|jour)\b|\bdaily\b", re.I), 220),
+    (re.compile(r"(/|\bper\b|\bpar\b|\ban?\b)\s*(week|wk)\b|\bweekly\b", re.I), 52),
+    (re.compile(r"(/|\bper\b|\bpar\b|\ban?\b)\s*(month|mo|mois)\b|\bmonthly\b|\bmensuel", re.I), 12),
+]
+_UP_TO_RE = re.compile(r"\b(up to|max(imum)?|jusqu'?[àa])\b", re.I)
+
+# A figure only counts as salary next to one of these, so "3 years experience" or "401k" are not read as pay
+_CURRENCY_ALT = r"[$€£¥₹]|\b(?:" + "|".join(re.escape(w) for w in sorted(_CURRENCY_WORDS, key=len, reverse=True)) + r")\b"
+_CURRENCY_BEFORE_RE = re.compile(r"(?:" + _CURRENCY_ALT + r")\s*$", re.I)
+_CURRENCY_AFTER_RE = re.compile(r"^\s*(?:" + _CURRENCY_ALT + r")", re.I)
+_PERIOD_AFTER_RE = re.compile(
+    r"^\s*(?:(?:/|\bper\b|\bpar\b|\ban?\b)\s*(?:hour|hr|h|day|jour|week|wk|month|mo|mois|year|yr|an|annum)\b"
+    r"|(?:hourly|daily|weekly|monthly|yearly|annually|p\.\s?a\.))", re.I)
+_SALARY_WORD_BEFORE_RE = re.compile(
+    r"\b(?:salary|salaire|pay|compensation|r[ée]mun[ée]ration|wage|package)\b[^0-9]{0,15}$", re.I)
+_RANGE_GAP_RE = re.compile(r"\s*(?:-|–|—|\bto\b|\bà\b|\ba\b)\s*", re.I)
+_RETIREMENT_PLANS = {"401", "403", "457"} # "401k" is a US pension plan, not 401,000
+
+def _is_marked(text: str, match: re.Match) -> bool:
+    """Whether a figure carries a currency, k/m, period or salary marker right next to it"""
+    digits, suffix = match.group(1), match.group(2)
+    if suffix:
+        return not (suffix.lower() == "k" and digits in _RETIREMENT_PLANS)
+    before, after = text[:match.start()], text[match.end():]
+    return bool(_CURRENCY_BEFORE_RE.search(before) or _CURRENCY_AFTER_RE.search(after)
+                or _PERIOD_AFTER_RE.search(after) or _SALARY_WORD_BEFORE_RE.search(before))
+
+def _salary_figures(text: str) -> Tuple[List[float], str]:
+    """Marked figures, plus unmarked ones forming a range with a marked one ("50 - 60k", "€45 - 55").
+
+    Also returns the text the pay period is read from: the clauses right before
+    the first figure and after the last one ("Hourly: $50", not "5 days a week, $90k").
+    """
+    matches = list(_NUMBER_RE.finditer(text))
+    marked = [_is_marked(text, m) for m in matches]
+    suffixes = [m.group(2) for m in matches]
+    for i in range(1, len(matches)):
+        if _RANGE_GAP_RE.fullmatch(text[matches[i - 1].end():matches[i].start()]):
+            if marked[i - 1] or marked[i]:
+                marked[i - 1] = marked[i] = True
+                # "50 - 60k": the suffix applies to both ends of the range
+                suffixes[i - 1] = suffixes[i - 1] or suffixes[i]
+    chosen = [i for i, ok in enumerate(marked) if ok][:2]
+    if not chosen:
+        return [], ""
+    first, last = matches[chosen[0]], matches[chosen[-1]]
+    period_text = re.split(r"[,;)\n]", text[:first.start()])[-1] + " " + re.split(r"[,;(\n]", text[last.end():])[0]
+    return [_parse_number(matches[i].group(1), suffixes[i]) for i in chosen], period_text
+
+def _parse_number(digits: str, suffix: Optional[str]) -> float:
+    """Parse a salary figure, handling thousands separators and k/m suffixes"""
+    if re.fullmatch(r"\d{1,3}(?:[,.\s ]\d{3})+", digits):
+        value = float(re.sub(r"[,.\s ]", "", digits))
+    else:
+        value = float(digits.replace(",", "."))
+    if suffix:
+        value *= 1_000 if suffix.lower() == "k" else 1_000_000
+    return value
+
+def parse_salary(text: Optional[str]) -> Tuple[Optional[float], Optional[float], Optional[str]]:
+    """Parse a free-text salary into (annual_min, annual_max, currency)"""
+    if not text or not text.strip():
+        return None, None, None
+
+    currency = None
+    for symbol, code in _CURRENCY_SYMBOLS.items():
+        if symbol in text:
+            currency = code
+            break
+    if currency is None:
+        match = _CURRENCY_WORD_RE.search(text)
+        if match:
+            currency = _CURRENCY_WORDS[match.group(1).upper()]
+
+    values, period_text = _salary_figures(text)
+    # Only the first two figures describe the range ("50k-60k + bonus up to 10k")
+    values = [v for v in values if v > 0][:2]
+    if not values:
+        return None, None, currency
+
+    multiplier = 1
+    for pattern, factor in _PERIOD_RULES:
+        if pattern.search(period_text):
+            multiplier = factor
+            break
+    values = [v * multiplier for v in values]
+
+    if len(values) == 1:
+        if _UP_TO_RE.search(text):
+            return None, values[0], currency
+        return values[0], values[0], currency
+    return min(values), max(values), currency
+
+# --- Seniority --------------------------------------------------------------
+
+# LinkedIn "Seniority level" labels; None means "look at the title" (Mid-Senior covers both)
+_LEVEL_LABELS = {
+    "internship": Seniority.INTERN,
+    "entry level": Seniority.JUNIOR,
+    "associate": Seniority.JUNIOR,
+    "mid-senior level": None,
+    "director": Seniority.DIRECTOR,
+    "executive": Seniority.EXECUTIVE,
+}
+
+# Checked in order against level then title; the first match wins
+_SENIORITY_RULES = [
+    (Seniority.INTERN, re.compile(r"\b(intern|internship|stagiaire|stage|trainee|apprenti\w*|alternan\w*)\b", re.I)),
+    (Seniority.EXECUTIVE, re.compile(r"\b(chief|c[etoi]o|vp|vice[- ]president|executive|founder)\b", re.I)),
+    (Seniority.DIRECTOR, re.compile(r"\b(director|directeur|directrice|head of)\b", re.I)),
+    (Seniority.LEAD, re.compile(r"\b(lead|principal|staff|architect)\b", re.I)),
+    (Seniority.SENIOR, re.compile(r"\b(senior|sr\.?|confirm[ée]e?|expert)\b", re.I)),
+    (Seniority.JUNIOR, re.compile(r"\b(junior|jr\.?|entry[- ]level|graduate|d[ée]butant)\b", re.I)),
+    (Seniority.MID, re.compile(r"\b(mid|intermediate|medior)\b", re.I)),
+]
+
+def parse_seniority(level: Optional[str], job_title: Optional[str] = None) -> Optional[Seniority]:
+    """Map the free-text level / job title onto the Seniority enum"""
+    default = None
+    if level:
+        label = level.strip().lower()
+        if label in _LEVEL_LABELS:
+            if _LEVEL_LABELS[label] is not None:
+                return _LEVEL_LABELS[label]
+            default = Seniority.MID
+        else:
+            for seniority, pattern in _SENIORITY_RULES:
+                if pattern.search(level):
+                    return seniority
+    if job_title:
+        for seniority, pattern in _SENIORITY_RULES:
+            if pattern.search(job_title):
+                return seniority
+    return default
+
+# --- Work mode & location ---------------------------------------------------
+
+_HYBRID_RE = re.compile(r"\bhybrid\w*\b|\bhybride\b", re.I)
+_REMOTE_RE = re.compile(r"\b(remote|t[ée]l[ée]travail|work from home|wfh|anywhere)\b", re.I)
+_ONSITE_RE = re.compile(r"\b(on[- ]?site|in[- ]office|pr[ée]sentiel|sur site)\b", re.I)
+
+def parse_work_mode(location: Optional[str], job_title: Optional[str] = None) -> Optional[WorkMode]:
+    """Derive the remote / hybrid / onsite flag, defaulting to onsite when a place is given"""
+    text = " ".join(filter(None, [location, job_title]))
+    if not text.strip():
+        return None
+    if _HYBRID_RE.search(text):
+        return WorkMode.HYBRID
+    if _REMOTE_RE.search(text):
+        return WorkMode.REMOTE
+    if _ONSITE_RE.search(text):
+        return WorkMode.ONSITE
+    city, country = parse_location(location)
+    return WorkMode.ONSITE if (city or country) else None
+
+_COUNTRY_ALIASES = {
+    "us": "United States", "usa": "United States", "u.s.": "United States", "u.s.a.": "United States",
+    "united states": "United States", "united states of america": "United States",
+    "uk": "United Kingdom", "u.k.": "United Kingdom", "great britain": "United Kingdom",
+    "england": "United Kingdom", "united kingdom": "United Kingdom",
+    "uae": "United Arab Emirates", "united arab emirates": "United Arab Emirates",
+    "maroc": "Morocco", "morocco": "Morocco", "france": "France", "germany": "Germany",
+    "deutschland": "Germany", "spain": "Spain", "españa": "Spain", "canada": "Canada",
+    "netherlands": "Netherlands", "belgium": "Belgium", "belgique": "Belgium",
+    "switzerland": "Switzerland", "suisse": "Switzerland", "ireland": "Ireland",
+    "italy": "Italy", "portugal": "Portugal", "india": "India", "australia": "Australia",
+    "saudi arabia": "Saudi Arabia", "qatar": "Qatar", "tunisia": "Tunisia", "egypt": "Egypt",
+}
+
+_US_STATES = {
+    "AL", "AK", "AZ", "AR", "CA", "CO", "CT", "DE", "DC", "FL", "GA", "HI", "ID", "IL", "IN", "IA",
+    "KS", "KY", "LA", "ME", "MD", "MA", "MI", "MN", "MS", "MO", "MT", "NE", "NV", "NH", "NJ", "NM",
+    "NY", "NC", "ND", "OH", "OK", "OR", "PA", "RI", "SC", "SD", "TN", "TX", "UT", "VT", "VA", "WA",
+    "WV", "WI", "WY",
+}
+
+_LOCATION_NOISE_RE = re.compile(
+    r"\(.*?\)|\b(remote|hybrid|hybride|on[- ]?site|t[ée]l[ée]travail)\b|\bgreater\b|\bmetropolitan area\b|\bmetropolitan region\b|\barea\b|\bmetro\b",
+    re.I,
+)
+
+def normalize_place(value: Optional[str]) -> Optional[str]:
+    """Normalize a city/country name so it can be compared against the indexed columns"""
+    if not value:
+        return None
+    value = re.sub(r"\s+", " ", value).strip(" -,")
+    if not value:
+        return None
+    alias = _COUNTRY_ALIASES.get(value.lower())
+    if alias:
+        return alias
+    return " ".join(w if (w.isupper() and len(w) <= 3) else w.capitalize() for w in value.split(" "))
+
+def parse_location(location: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """Split a LinkedIn-style location ("Paris, Île-de-France, France") into (city, country)"""
+    if not location:
+        return None, None
+    cleaned = _LOCATION_NOISE_RE.sub(" ", location)
+    parts = [p.strip() for p in cleaned.split(",") if p.strip()]
+    if not parts:
+        return None, None
+    if len(parts) == 1:
+        if parts[0].lower() in _COUNTRY_ALIASES:
+            return None, normalize_place(parts[0])
+        return normalize_place(parts[0]), None
+    last = parts[-1]
+    if last.upper() in _US_STATES:
+        return normalize_place(parts[0]), "United States"
+    return normalize_place(parts[0]), normalize_place(last)
+
+# --- Ingestion stage --------------------------------------------------------
+
+def extract_structured_fields(job: JobPosting) -> Dict[str, Any]:
+    """Parse the free-text fields of a job posting into the typed columns"""
+    salary_min, salary_max, currency = parse_salary(job.salary)
+    city, country = parse_location(job.location)
+    return {
+        "salary_min": salary_min,
+        "salary_max": salary_max,
+        "salary_currency": currency,
+        "seniority": parse_seniority(job.level, job.job_title),
+        "work_mode": parse_work_mode(job.location, job.job_title),
+        "city": city,
+        "country": country,
+    }
+
+def populate_structured_fields(job: JobPosting) -> JobPosting:
+    """Set the typed columns on a job posting in place"""
+    for field, value in extract_structured_fields(job).items():
+        setattr(job, field, value)
+    return job
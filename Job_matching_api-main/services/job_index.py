@@ -0,0 +1,427 @@
+"""Precomputed job embedding index, served in-process or sharded across processes and nodes.
+
+    python -m services.job_index build --path job_index
+    python -m services.job_index build --path job_index --deployment text-embedding-3-large --rate 600
+    python -m services.job_index gc --path job_index
+    JOB_INDEX_AUTHKEY=... python -m services.job_index serve --path job_index --shard 0/2 --port 7100
+"""
+import argparse
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+from multiprocessing import get_context
+from multiprocessing.connection import Client, Connection, Listener
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from models.database import JobPosting
+from services.index_store import IndexStore, paced
+
+def job_text(job: JobPosting) -> str:
+    """Combine the job fields that are embedded into a single string"""
+    job_text_parts = [
+        job.job_title,
+        job.description,
+        job.job_description,
+        job.key_responsibilities,
+        job.required_qualifications,
+        job.preferred_qualifications,
+        job.company # Maybe include company name?
+    ]
+    return " ".join(filter(None, job_text_parts)) # Filter out None values
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalise each row (all-zero rows stay zero) so a dot product is the cosine similarity"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+def late_interaction(vectors: np.ndarray, queries: np.ndarray, weights: Optional[Sequence[float]] = None,
+                     offsets: Optional[np.ndarray] = None) -> np.ndarray:
+    """Per-job weighted sum over query vectors of each one's best cosine similarity among the job's vectors.
+
+    `vectors` and `queries` are normalised rows. Without `offsets` each job is one
+    row of `vectors`; with them, job i owns rows offsets[i]:offsets[i + 1]. One
+    query row with weight 1 reduces to the plain cosine similarity.
+    """
+    queries = np.atleast_2d(queries)
+    sims = vectors @ queries.T # (rows, queries): the only pass over the job matrix
+    if offsets is not None:
+        sims = np.maximum.reduceat(sims, offsets, axis=0)
+    weights = np.ones(len(queries), dtype=np.float32) if weights is None else np.asarray(weights, dtype=np.float32)
+    return sims @ (weights / weights.sum())
+
+class JobIndex:
+    """Normalised job vectors searched with a single matrix-vector product"""
+
+    def __init__(self, ids: np.ndarray, vectors: np.ndarray, version: str = "", model: str = ""):
+        self.ids = ids
+        self.vectors = vectors
+        self.version = version
+        self.model = model # Embedding deployment the vectors come from; queries must use the same one
+        self._rows: Optional[Dict[str, int]] = None # job id -> row, built on first vectors_for()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, db: Session, embed_documents: Callable[[List[str]], List[List[float]]],
+              batch_size: int = 256, model: str = "", version: Optional[str] = None) -> "JobIndex":
+        """Embed every posting (keyset-paginated by id) into a new index.
+
+        Near-duplicates (same `cluster_id`) are embedded once and share the vector.
+        """
+        ids: List[str] = []
+        chunks = []
+        cluster_rows: Dict[str, int] = {} # cluster id -> row of its embedded vector
+        rows: List[int] = []
+        last_id = None
+        while True:
+            query = db.query(JobPosting).order_by(JobPosting.id)
+            if last_id is not None:
+                query = query.filter(JobPosting.id > last_id)
+            jobs = query.limit(batch_size).all()
+            if not jobs:
+                break
+            last_id = jobs[-1].id
+            texts = []
+            embedded = len(cluster_rows)
+            for job in jobs:
+                cluster = job.cluster_id or job.id
+                if cluster not in cluster_rows:
+                    cluster_rows[cluster] = embedded + len(texts)
+                    texts.append(job_text(job) or " ")
+                rows.append(cluster_rows[cluster])
+            if texts:
+                chunks.append(normalize_rows(embed_documents(texts)))
+            ids.extend(job.id for job in jobs)
+            print(f"Embedded {len(ids)} job postings ({len(cluster_rows)} distinct)")
+        vectors = np.vstack(chunks)[rows] if chunks else np.zeros((0, 1536), dtype=np.float32)
+        return cls(np.array(ids, dtype=str), vectors, version=version or time.strftime("%Y%m%dT%H%M%S"), model=model)
+
+    def save(self, path: str) -> None:
+        """Write vectors.npy, ids.npy and meta.json; each file is replaced atomically"""
+        os.makedirs(path, exist_ok=True)
+        for name, array in (("vectors.npy", self.vectors), ("ids.npy", self.ids)):
+            tmp = os.path.join(path, f".{name}.tmp")
+            with open(tmp, "wb") as f:
+                np.save(f, np.ascontiguousarray(array))
+            os.replace(tmp, os.path.join(path, name))
+        tmp = os.path.join(path, ".meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump({"version": self.version, "model": self.model, "count": len(self),
+                       "dimension": int(self.vectors.shape[1])}, f)
+        os.replace(tmp, os.path.join(path, "meta.json"))
+
+    @classmethod
+    def load(cls, path: str, shard: Optional[Tuple[int, int]] = None) -> "JobIndex":
+        """Memory-map a saved index; `shard=(i, n)` keeps only the i-th of n contiguous slices.
+
+        `path` is an index directory, or a store whose CURRENT generation is loaded.
+        """
+        path = resolve_index_path(path)
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        ids = np.load(os.path.join(path, "ids.npy"), mmap_mode="r")
+        if shard is not None:
+            i, n = shard
+            bounds = np.linspace(0, len(ids), n + 1).astype(int)
+            vectors, ids = vectors[bounds[i]:bounds[i + 1]], ids[bounds[i]:bounds[i + 1]]
+        return cls(ids, vectors, version=meta["version"], model=meta.get("model", ""))
+
+    def search(self, query: np.ndarray, k: int, allowed_ids: Optional[Set[str]] = None,
+               weights: Optional[Sequence[float]] = None) -> List[Tuple[str, float]]:
+        """Top-k (job id, score) pairs, optionally restricted to `allowed_ids`.
+
+        A 1-D query scores by cosine similarity; a matrix of section vectors scores
+        by `late_interaction` with `weights`.
+        """
+        if k <= 0 or len(self) == 0:
+            return []
+        scores = late_interaction(self.vectors, normalize_rows(query), weights)
+        if allowed_ids is not None:
+            scores = np.where(np.isin(self.ids, list(allowed_ids)), scores, -np.inf)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(str(self.ids[i]), float(scores[i])) for i in top if scores[i] > -np.inf]
+
+    def vectors_for(self, ids: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Stored vectors of `ids` (ids outside this index or shard are skipped)"""
+        if self._rows is None:
+            self._rows = {str(job_id): row for row, job_id in enumerate(self.ids)}
+        return {job_id: np.array(self.vectors[self._rows[job_id]]) for job_id in ids if job_id in self._rows}
+
+    def close(self) -> None:
+        pass
+
+def _serve_connection(conn: Connection, index: JobIndex) -> None:
+    """Answer ("search", query, k, allowed_ids, weights), ("vectors", ids) and ("info",) messages until the peer goes away.
+
+    A failing request is answered with the exception, so every message still gets exactly one reply.
+    """
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            return
+        if message[0] not in ("search", "vectors", "info"):
+            return
+        try:
+            if message[0] == "search":
+                _, query, k, allowed_ids, weights = message
+                reply = index.search(query, k, allowed_ids, weights)
+            elif message[0] == "vectors":
+                reply = index.vectors_for(message[1])
+            else:
+                reply = {"count": len(index), "version": index.version, "model": index.model}
+        except Exception as e:
+            reply = ShardError(f"{type(e).__name__}: {e}")
+        conn.send(reply)
+
+def _shard_process(conn: Connection, path: str, shard: int, shards: int) -> None:
+    _serve_connection(conn, JobIndex.load(path, shard=(shard, shards)))
+
+class ShardError(Exception):
+    """A shard could not answer a request"""
+
+class _Shard:
+    """Connection to one shard, with the means to reopen it (respawn the process or reconnect)"""
+
+    def __init__(self, name: str, open_shard: Callable[[], Tuple[Connection, Optional[object]]]):
+        self.name = name
+        self.open = open_shard
+        self.lock = threading.Lock()
+        self.conn, self.process = open_shard()
+
+    def shut(self) -> None:
+        try:
+            self.conn.close()
+        except OSError:
+            pass
+        if self.process is not None:
+            self.process.join(timeout=5)
+            if self.process.is_alive():
+                self.process.terminate()
+
+class ShardedJobIndex:
+    """Scatter a query to every shard, then merge the shards' local top-k with a heap.
+
+    Shards are local worker processes (`spawn`) or remote `serve` nodes
+    (`connect`); both speak the same protocol over multiprocessing connections.
+    Each shard answers one query at a time, so concurrent queries pipeline
+    across shards. When a query fails, every shard it reached is drained of its
+    reply (or reopened), so the next query never reads a stale answer.
+    """
+
+    drain_seconds = 5.0 # Longest wait for the reply of a shard being drained before reopening it
+
+    def __init__(self, shards: Sequence[_Shard]):
+        self._shards = list(shards)
+        infos = self._broadcast(("info",))
+        versions = {info["version"] for info in infos}
+        if len(versions) > 1:
+            raise ValueError(f"Shards serve different index versions: {sorted(versions)}")
+        self.version = versions.pop() if versions else ""
+        self.model = infos[0].get("model", "") if infos else ""
+        self.count = sum(info["count"] for info in infos)
+
+    def __len__(self) -> int:
+        return self.count
+
+    @classmethod
+    def spawn(cls, path: str, workers: int) -> "ShardedJobIndex":
+        """Start `workers` processes, each memory-mapping its slice of the index at `path`"""
+        context = get_context("spawn")
+
+        def opener(shard: int):
+            def open_shard():
+                parent, child = context.Pipe()
+                process = context.Process(target=_shard_process, args=(child, path, shard, workers),
+                                          name=f"job-index-shard-{shard}", daemon=True)
+                process.start()
+                child.close()
+                return parent, process
+            return open_shard
+
+        return cls([_Shard(f"shard {shard}", opener(shard)) for shard in range(workers)])
+
+    @classmethod
+    def connect(cls, addresses: Sequence[Tuple[str, int]], authkey: bytes) -> "ShardedJobIndex":
+        """Use shards served on other nodes by `python -m services.job_index serve`"""
+        return cls([_Shard(f"{host}:{port}", lambda address=(host, port): (Client(address, authkey=authkey), None))
+                    for host, port in addresses])
+
+    def _broadcast(self, message: tuple) -> List[object]:
+        # Locks are taken in shard order and released as each reply arrives, so a
+        # second query can start on shard 0 while this one waits on the others
+        held: List[_Shard] = []
+        sent: List[_Shard] = []
+        try:
+            for shard in self._shards:
+                shard.lock.acquire()
+                held.append(shard)
+                shard.conn.send(message)
+                sent.append(shard)
+            replies, error = [], None
+            for shard in self._shards:
+                reply = shard.conn.recv()
+                sent.remove(shard)
+                held.remove(shard)
+                shard.lock.release()
+                if isinstance(reply, ShardError):
+                    error = error or ShardError(f"{shard.name}: {reply}")
+                replies.append(reply)
+            if error is not None:
+                raise error # Every reply was read, so the connections are in step
+            return replies
+        except Exception:
+            for shard in held:
+                self._recover(shard, awaiting_reply=shard in sent)
+            raise
+        finally:
+            for shard in held:
+                shard.lock.release()
+
+    def _recover(self, shard: _Shard, awaiting_reply: bool) -> None:
+        """Read the reply `shard` still owes us, or reopen it; called with its lock held"""
+        if awaiting_reply:
+            try:
+                if shard.conn.poll(self.drain_seconds):
+                    shard.conn.recv()
+                    return
+            except (EOFError, OSError):
+                pass
+        print(f"Job index {shard.name} is out of step after a failed query, reopening it")
+        shard.shut()
+        try:
+            shard.conn, shard.process = shard.open()
+        except Exception as e:
+            print(f"Could not reopen job index {shard.name}: {e}")
+
+    def search(self, query: np.ndarray, k: int, allowed_ids: Optional[Set[str]] = None,
+               weights: Optional[Sequence[float]] = None) -> List[Tuple[str, float]]:
+        """Global top-k from the shards' local top-k lists"""
+        if k <= 0:
+            return []
+        replies = self._broadcast(("search", normalize_rows(query), k, allowed_ids, weights))
+        return heapq.nlargest(k, itertools.chain.from_iterable(replies), key=lambda item: item[1])
+
+    def vectors_for(self, ids: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Stored vectors of `ids`, gathered from the shards holding them"""
+        vectors: Dict[str, np.ndarray] = {}
+        for reply in self._broadcast(("vectors", list(ids))):
+            vectors.update(reply)
+        return vectors
+
+    def close(self) -> None:
+        for shard in self._shards:
+            with shard.lock:
+                try:
+                    shard.conn.send(("close",))
+                except OSError:
+                    pass
+                shard.shut()
+
+def _parse_address(address: str) -> Tuple[str, int]:
+    host, _, port = address.strip().rpartition(":")
+    return host, int(port)
+
+def resolve_index_path(path: str) -> str:
+    """Directory of the CURRENT generation when `path` is an IndexStore, else `path` itself"""
+    if IndexStore.is_store(path):
+        store = IndexStore(path)
+        return store.path(store.current())
+    return path
+
+def open_index(path: Optional[str] = None):
+    """Open the job index selected by JOB_INDEX_MODE (none | local | sharded), or None"""
+    mode = os.getenv("JOB_INDEX_MODE", "none")
+    path = resolve_index_path(path or os.getenv("JOB_INDEX_PATH", "job_index")) # Every shard maps the same generation
+    if mode == "none":
+        return None
+    if mode == "local":
+        return JobIndex.load(path)
+    if mode == "sharded":
+        shards = os.getenv("JOB_INDEX_SHARDS")
+        if shards:
+            return ShardedJobIndex.connect([_parse_address(a) for a in shards.split(",")], _authkey())
+        return ShardedJobIndex.spawn(path, int(os.getenv("JOB_INDEX_WORKERS", os.cpu_count() or 1)))
+    raise ValueError(f"Unknown JOB_INDEX_MODE: {mode}")
+
+def _authkey() -> bytes:
+    authkey = os.getenv("JOB_INDEX_AUTHKEY")
+    if not authkey:
+        raise ValueError("JOB_INDEX_AUTHKEY is required for remote index shards")
+    return authkey.encode()
+
+def serve(path: str, shard: int, shards: int, host: str, port: int) -> None:
+    """Serve one shard to coordinators on other nodes (one thread per connection)"""
+    index = JobIndex.load(path, shard=(shard, shards))
+    print(f"Serving shard {shard}/{shards} ({len(index)} jobs, version {index.version}) on {host}:{port}")
+    with Listener((host, port), authkey=_authkey()) as listener:
+        while True:
+            try:
+                conn = listener.accept()
+            except Exception as e: # Failed handshakes must not stop the server
+                print(f"Rejected index connection: {e}")
+                continue
+            threading.Thread(target=_serve_connection, args=(conn, index), daemon=True).start()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="embed all postings into a new index generation and publish it")
+    build.add_argument("--path", default=os.getenv("JOB_INDEX_PATH", "job_index"))
+    build.add_argument("--batch-size", type=int, default=256)
+    build.add_argument("--deployment", default=os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT"),
+                       help="embedding deployment to build with (default: AZURE_OPENAI_EMBEDDING_DEPLOYMENT)")
+    build.add_argument("--rate", type=float, default=float(os.getenv("JOB_INDEX_BUILD_RATE", 0)),
+                       help="texts embedded per minute, to leave quota to live queries (0: unpaced)")
+    build.add_argument("--no-publish", action="store_true", help="build the generation without switching to it")
+    gc = commands.add_parser("gc", help="delete generations that are neither current nor leased by a process")
+    gc.add_argument("--path", default=os.getenv("JOB_INDEX_PATH", "job_index"))
+    shard = commands.add_parser("serve", help="serve one shard of the index to remote coordinators")
+    shard.add_argument("--path", default=os.getenv("JOB_INDEX_PATH", "job_index"))
+    shard.add_argument("--shard", default="0/1", help="i/n: serve the i-th of n slices")
+    shard.add_argument("--host", default="0.0.0.0")
+    shard.add_argument("--port", type=int, default=7100)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        from database.session import SessionLocal, init_db
+        from services.job_matching import JobMatchingService
+
+        if args.deployment:
+            os.environ["AZURE_OPENAI_EMBEDDING_DEPLOYMENT"] = args.deployment
+        service = JobMatchingService()
+        init_db()
+        store = IndexStore(args.path)
+        generation = store.create(service.embedding_deployment_name)
+        with store.holding(generation): # The served generation is untouched until publish
+            db = SessionLocal()
+            try:
+                index = JobIndex.build(db, paced(service.embed_documents, args.rate), args.batch_size,
+                                       model=service.embedding_deployment_name, version=generation)
+            finally:
+                db.close()
+            index.save(store.path(generation))
+            store.complete(generation)
+            print(f"Wrote {len(index)} job vectors ({index.model}) to {store.path(generation)}")
+            if not args.no_publish:
+                store.publish(generation)
+        store.collect_garbage()
+    elif args.command == "gc":
+        IndexStore(args.path).collect_garbage()
+    else:
+        i, _, n = args.shard.partition("/")
+        serve(args.path, int(i), int(n), args.host, args.port)
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 from sqlalchemy.orm import Session
-from typing import List, Optional, Dict, Any
+from typing import Callable, List, Optional, Dict, Any, Set, Tuple
 import numpy as np
 import numpy as np # Added numpy import
 from sqlalchemy import func
@@ -9,14 +9,58 @@ from sqlalchemy import or_ # Import or_ for keyword searching
 from langchain_openai import AzureOpenAIEmbeddings # Added AzureOpenAIEmbeddings import
 
 from models.database import JobPosting # Changed JobEmbedding to JobPosting
-from models.schemas import JobResponse
+from models.schemas import JobResponse, JobFilters
+from services.job_fields import normalize_place
+from services.index_store import IndexStore
+from services.job_index import job_text, late_interaction, normalize_rows, open_index
+from services.cv_sections import section_weight, split_sections
+from services.chunking import embed_chunked, pool
+from services.dedup import collapse_duplicates
+from services.azure_gateway import get_gateway
+from services.fallback_ranker import KeywordRanker
+from services.diversify import mmr, similarity_matrix
+from services.metrics import stage, record_cache, EMBEDDING_CALLS, ZERO_VECTOR_FALLBACKS
+from services.projection import load_columns
+from services.resilience import CircuitOpen, get_breaker, mark_degraded
+from services.rebuild import RebuildOrchestrator, VersionedSlot, with_session
+from services.result_cache import ResultCache, corpus_version
+
+# Embedded with a new index generation's model to check that it ranks jobs before it is swapped in
+INDEX_SAMPLE_QUERY = "Software engineer with Python, SQL and cloud experience"
 
 class JobMatchingService:
-    def __init__(self):
+    def __init__(self, embeddings_client=None):
         self.azure_api_key = os.getenv("AZURE_OPENAI_API_KEY")
         self.azure_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
         self.embedding_deployment_name = os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT") # Read deployment name
         self.api_version = os.getenv("AZURE_OPENAI_API_VERSION", "2023-05-15") # Read API version, added default
+        # Generations of (precomputed job vectors (JOB_INDEX_MODE), client embedding queries for them); the
+        # client is None when the index was built with the configured deployment
+        self.index_slot: VersionedSlot[Tuple[Any, Optional[Any]]] = VersionedSlot("job_index", close=self._retire_index)
+        self.index_store: Optional[IndexStore] = None # Set when JOB_INDEX_PATH holds model-versioned generations
+        self._query_clients: Dict[str, Any] = {}
+        self.index_check_seconds = float(os.getenv("JOB_INDEX_CHECK_SECONDS", 30))
+        self.result_cache = ResultCache.from_env() # Ranked ids per query embedding (RESULT_CACHE_BACKEND)
+        # "single": one embedding of the whole CV summary; "sections": one per summary section, late interaction
+        self.scoring_mode = os.getenv("MATCH_SCORING_MODE", "single")
+        # Longer texts are split into chunks embedded in one batched call
+        self.embedding_max_tokens = int(os.getenv("EMBEDDING_MAX_TOKENS", 8000))
+        # "mean": token-weighted mean of the chunk vectors; "multi": keep one vector per chunk (late interaction)
+        self.chunk_pooling = os.getenv("EMBEDDING_CHUNK_POOLING", "mean")
+        # Return only the best posting of each near-duplicate cluster (services/dedup.py)
+        self.collapse_duplicates = os.getenv("MATCH_COLLAPSE_DUPLICATES", "true").lower() == "true"
+        # MMR re-ranking of the top MMR_SHORTLIST matches; MMR_LAMBDA (1 = relevance only) unset disables it
+        self.mmr_lambda = float(os.getenv("MMR_LAMBDA")) if os.getenv("MMR_LAMBDA") else None
+        self.mmr_shortlist = int(os.getenv("MMR_SHORTLIST", 100))
+        # Embedding calls fail fast while Azure is failing; matches are then ranked by the keyword fallback
+        self.embeddings_breaker = get_breaker("azure_embeddings")
+        self.fallback = KeywordRanker() if os.getenv("FALLBACK_RANKER", "tfidf") == "tfidf" else None
+
+        if embeddings_client is not None:
+            # Any object exposing embed_query/embed_documents (e.g. benchmarks.fakes.FakeEmbeddings)
+            self.client = embeddings_client
+            self.embedding_deployment_name = self.embedding_deployment_name or "custom"
+            return
 
         if not self.azure_api_key or not self.azure_endpoint:
             raise ValueError("Azure OpenAI API key and endpoint are required")
@@ -25,13 +69,108 @@ class JobMatchingService:
         if not self.api_version: # Check if API version is set
              raise ValueError("Azure OpenAI API version is required (AZURE_OPENAI_API_VERSION)")
 
-        # Use AzureOpenAIEmbeddings for embeddings
-        self.client = AzureOpenAIEmbeddings(
-            azure_deployment=self.embedding_deployment_name,
-            openai_api_version=self.api_version,
-            azure_endpoint=self.azure_endpoint,
-            openai_api_key=self.azure_api_key
-        )
+        self.client = self._embeddings_client(self.embedding_deployment_name)
+
+    def _embeddings_client(self, deployment: str) -> AzureOpenAIEmbeddings:
+        # Use AzureOpenAIEmbeddings for embeddings, on the process-wide Azure connection pool
+        return get_gateway().embeddings(deployment, self.api_version)
+
+    @property
+    def index(self):
+        serving = self.index_slot.value
+        return serving[0] if serving is not None else None
+
+    def warm_up(self) -> None:
+        """Load the tokenizer the embeddings client uses, otherwise fetched on the first request"""
+        if isinstance(self.client, AzureOpenAIEmbeddings) and self.client.check_embedding_ctx_length:
+            import tiktoken
+            tiktoken.encoding_for_model(self.client.tiktoken_model_name or self.client.model)
+
+    def load_index(self) -> None:
+        """Open the job index configured by JOB_INDEX_MODE (no-op when it is "none").
+
+        When JOB_INDEX_PATH is a generation store (services/index_store.py), the
+        generations published later on are switched to by `register_rebuilds`.
+        """
+        path = os.getenv("JOB_INDEX_PATH", "job_index")
+        if os.getenv("JOB_INDEX_MODE", "none") == "none":
+            return
+        if IndexStore.is_store(path) and not os.getenv("JOB_INDEX_SHARDS"):
+            self.index_store = IndexStore(path)
+            self.index_slot.swap(*self.build_index_generation())
+        else:
+            index = open_index()
+            self._log_index(index)
+            self.index_slot.swap((index, self._query_client(index.model)), index.version)
+
+    def build_index_generation(self) -> Tuple[Tuple[Any, Optional[Any]], str]:
+        """Open the store's CURRENT generation, paired with the client for its embedding model"""
+        generation = self.index_store.current()
+        self.index_store.lease(*filter(None, (self.index_slot.version, generation))) # Both, until one is dropped
+        index = open_index(self.index_store.path(generation))
+        self._log_index(index)
+        return (index, self._query_client(index.model)), generation
+
+    def _log_index(self, index) -> None:
+        print(f"Loaded job index version {index.version} ({index.model or self.embedding_deployment_name}) "
+              f"with {len(index)} jobs")
+
+    def _index_due(self, rejected: Optional[str]) -> bool:
+        # Also the lease heartbeat that keeps the served generation from garbage collection
+        self.index_store.lease(self.index_slot.version)
+        return self.index_store.current() not in (None, self.index_slot.version, rejected)
+
+    def validate_index(self, serving: Tuple[Any, Optional[Any]]) -> None:
+        """Sample queries: a query embedded with the generation's model ranks jobs, and a job's vector finds itself"""
+        index, client = serving
+        query = self.embed_documents([INDEX_SAMPLE_QUERY], purpose="index_validation", client=client)[0]
+        ranked = index.search(query, 5)
+        if not ranked:
+            raise ValueError("the sample query returned no job")
+        job_id = ranked[0][0]
+        own = index.search(index.vectors_for([job_id])[job_id], 1)
+        if not own or own[0][1] < 0.99:
+            raise ValueError(f"job {job_id} does not find itself (best score {own[0][1] if own else None})")
+
+    def _retire_index(self, serving: Tuple[Any, Optional[Any]]) -> None:
+        serving[0].close()
+        if self.index_store is not None:
+            self.index_store.lease(self.index_slot.version) # Drop the retired generation from this process's lease
+            self.index_store.collect_garbage()
+
+    def _query_client(self, model: str):
+        """Client embedding queries for an index built with `model` (None: the configured one)"""
+        if not model or model == self.embedding_deployment_name or not isinstance(self.client, AzureOpenAIEmbeddings):
+            return None
+        if model not in self._query_clients:
+            self._query_clients[model] = self._embeddings_client(model)
+        return self._query_clients[model]
+
+    def build_fallback(self, session_factory: Callable[[], Session]) -> None:
+        """Build the keyword fallback index (no-op with FALLBACK_RANKER=none)"""
+        if self.fallback is not None:
+            with_session(session_factory, self.fallback.build)
+
+    def register_rebuilds(self, orchestrator: RebuildOrchestrator, session_factory: Callable[[], Session]) -> None:
+        """Let the orchestrator switch to newly published index generations and refresh the keyword fallback"""
+        if self.index_store is not None:
+            orchestrator.register("job_index", self.index_slot, self.build_index_generation, self.index_check_seconds,
+                                  due=lambda: self._index_due(orchestrator.rejected_version("job_index")),
+                                  validate=self.validate_index,
+                                  size=lambda serving: len(serving[0]))
+        if self.fallback is not None:
+            fallback = self.fallback
+            orchestrator.register(
+                "fallback_ranker", fallback.slot, lambda: with_session(session_factory, fallback.build_generation),
+                fallback.refresh_seconds, validate=fallback.validate, size=lambda index: len(index[2]),
+                due=lambda: str(with_session(session_factory, corpus_version)) != fallback.slot.version
+            )
+
+    def close(self) -> None:
+        if self.index is not None:
+            self.index.close()
+        if self.index_store is not None:
+            self.index_store.release()
 
     def _cosine_similarity(self, vec1: List[float], vec2: List[float]) -> float:
         """Calculate cosine similarity between two vectors"""
@@ -48,119 +187,397 @@ class JobMatchingService:
         similarity = dot_product / (norm_a * norm_b)
         return similarity
 
-    def _get_embedding(self, text: str) -> List[float]: # Removed model parameter
-        """Generate embedding for the given text using Azure OpenAI."""
+    def _get_embedding(self, text: str, purpose: str = "query") -> List[float]: # Removed model parameter
+        """Generate embedding for the given text using Azure OpenAI (chunks of long texts are pooled)."""
+        chunks = self._get_chunk_embeddings(text, purpose)
+        if chunks is None:
+            # Determine dimension based on the expected model (e.g., text-embedding-3-small is 1536)
+            # TODO: Make dimension dynamic or configurable if different embedding models might be used
+            return [0.0] * 1536 # Assuming text-embedding-3-small dimension
+        return pool(*chunks).tolist()
+
+    def _get_chunk_embeddings(self, text: str, purpose: str = "query",
+                              client=None) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Normalised vectors of the text's token-budget chunks and their token counts, None on error"""
         if not self.embedding_deployment_name:
              # This should ideally be caught in __init__, but double-check
              raise ValueError("Embedding deployment name not configured.")
+        if not text.strip():
+            return None
         try:
-            # Use the deployment name read from environment variables
-            # The AzureOpenAIEmbeddings client handles the API call
-            return self.client.embed_query(text)
+            # Chunking keeps every request under the model's input limit, so long texts never fail on length
+            return self._embed_chunked([text], purpose, client)[0]
+        except CircuitOpen:
+            ZERO_VECTOR_FALLBACKS.labels(purpose=purpose).inc()
+            return None
         except Exception as e:
             # Log the error appropriately in a real application
             # Consider more specific error handling for Azure API errors
             print(f"Error generating embedding for text snippet '{text[:50]}...': {e}")
-            # Return a zero vector or handle appropriately
-            # Determine dimension based on the expected model (e.g., text-embedding-3-small is 1536)
-            # TODO: Make dimension dynamic or configurable if different embedding models might be used
-            return [0.0] * 1536 # Assuming text-embedding-3-small dimension
+            ZERO_VECTOR_FALLBACKS.labels(purpose=purpose).inc()
+            return None
 
-    def find_matches(
+    def _embed_chunked(self, texts: List[str], purpose: str, client=None) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """embed_chunked through the circuit breaker (raises CircuitOpen while Azure is failing)"""
+        EMBEDDING_CALLS.labels(purpose=purpose).inc()
+        return self.embeddings_breaker.call(embed_chunked, (client or self.client).embed_documents, texts,
+                                            self.embedding_max_tokens)
+
+    def embed_documents(self, texts: List[str], purpose: str = "job", client=None) -> np.ndarray:
+        """One pooled, normalised vector per text, all chunks in one batched call (errors propagate)"""
+        return normalize_rows([pool(*chunks) for chunks in self._embed_chunked(texts, purpose, client)])
+
+    def _apply_filters(self, query, filters: Optional[JobFilters]):
+        """Restrict a JobPosting query with the structured filters (served by the B-tree indices)"""
+        if filters is None:
+            return query
+        if filters.min_salary is not None:
+            query = query.filter(JobPosting.salary_max >= filters.min_salary)
+        if filters.max_salary is not None:
+            query = query.filter(JobPosting.salary_min <= filters.max_salary)
+        if filters.currency:
+            query = query.filter(JobPosting.salary_currency == filters.currency.upper())
+        if filters.seniority is not None:
+            query = query.filter(JobPosting.seniority == filters.seniority)
+        if filters.work_mode is not None:
+            query = query.filter(JobPosting.work_mode == filters.work_mode)
+        if filters.country:
+            query = query.filter(JobPosting.country == normalize_place(filters.country))
+        if filters.city:
+            query = query.filter(JobPosting.city == normalize_place(filters.city))
+        return query
+
+    def _to_job_response(self, job: JobPosting, score: Optional[float] = None,
+                         fields: Optional[Tuple[str, ...]] = None) -> JobResponse:
+        """Map a JobPosting row to the API response model (only `fields` are set when given)"""
+        if fields is not None:
+            return JobResponse(id=job.id, match_score=score, **{name: getattr(job, name) for name in fields})
+        return JobResponse(
+            id=job.id,
+            job_title=job.job_title,
+            job_description=job.job_description,
+            company=job.company,
+            location=job.location,
+            level=job.level,
+            description=job.description,
+            key_responsibilities=job.key_responsibilities,
+            required_qualifications=job.required_qualifications,
+            preferred_qualifications=job.preferred_qualifications,
+            benefits=job.benefits,
+            salary=job.salary,
+            application_instructions=job.application_instructions,
+            salary_min=job.salary_min,
+            salary_max=job.salary_max,
+            salary_currency=job.salary_currency,
+            seniority=job.seniority,
+            work_mode=job.work_mode,
+            city=job.city,
+            country=job.country,
+            cluster_id=job.cluster_id,
+            match_score=score
+        )
+
+    def _score_candidates(
         self,
         cv_content: str,
-        interests: Optional[str] = None,
-        soft_skills: Optional[str] = None,
-        db: Session = None,
-        limit: int = 10
-    ) -> List[JobResponse]:
-        """Find matching jobs for a CV using embedding similarity"""
-        print(f"find_matches called with limit: {limit}") # Added print statement
-        try:
-            # 1. Combine input text and generate CV embedding
-            query_text = cv_content
+        interests: Optional[str],
+        soft_skills: Optional[str],
+        db: Session,
+        limit: int,
+        filters: Optional[JobFilters],
+        mmr_lambda: Optional[float] = None,
+        fields: Optional[Tuple[str, ...]] = None
+    ) -> List[Tuple[JobPosting, float]]:
+        """Embed the CV and return candidate jobs sorted by similarity (descending), or MMR order"""
+        if mmr_lambda is None:
+            mmr_lambda = self.mmr_lambda
+        if mmr_lambda is not None and mmr_lambda >= 1:
+            mmr_lambda = None # Pure relevance: nothing to re-rank
+        # 1. Combine input text and generate CV embedding
+        query_text = cv_content
+        if interests:
+            query_text += f" Interests: {interests}"
+        if soft_skills:
+            query_text += f" Soft Skills: {soft_skills}"
+
+        if not query_text.strip():
+             return [] # Return empty if no text provided
+
+        # The index generation is pinned until scoring is done, so a request never mixes vector spaces
+        with self.index_slot.acquire() as serving:
+            index, index_client = serving if serving is not None else (None, None)
+            with stage("cv_embedding"):
+                query, weights = self._embed_query(query_text, cv_content, interests, soft_skills, index_client)
+            if query is None or self._needs_fallback():
+                if self._fallback_ready():
+                    return self._fallback_rank(query_text, db, limit, filters, fields)
+                print("Warning: Could not generate a valid embedding for the CV.")
+                return [] # Cannot match without a valid CV embedding
+
+            cache_key = None
+            # Only full-corpus rankings are cached: the scan path ranks a limit-sized window of the postings,
+            # which would answer a larger limit or a later page with a different candidate set
+            if self.result_cache is not None and index is not None:
+                cache_key = self.result_cache.key(
+                    np.append(query.ravel(), weights), filters.model_dump() if filters else {},
+                    self.result_cache.current_version(db),
+                    f"{index.model or self.embedding_deployment_name}:{index.version}:{'collapsed' if self.collapse_duplicates else 'all'}"
+                    f":mmr={mmr_lambda}/{self.mmr_shortlist}"
+                )
+                ranked = self.result_cache.get(cache_key, limit)
+                record_cache("results", ranked is not None)
+                if ranked is not None:
+                    return self._load_ranked(ranked, db, fields)
+
+            scored_jobs, complete = self._rank_candidates(query, weights, db, limit, filters, mmr_lambda, fields, index)
+            if self._needs_fallback() and self._fallback_ready():
+                # The circuit opened while the scan was embedding jobs: the scores are partly zero vectors
+                return self._fallback_rank(query_text, db, limit, filters, fields)
+            if cache_key is not None:
+                self.result_cache.put(cache_key, [(job.id, float(score)) for job, score in scored_jobs], complete)
+            return scored_jobs
+
+    def _needs_fallback(self) -> bool:
+        # The scan path embeds every candidate job, so it cannot score while the breaker is open
+        return self.index is None and self.embeddings_breaker.is_open
+
+    def _fallback_ready(self) -> bool:
+        return self.fallback is not None and self.fallback.ready
+
+    def _fallback_rank(
+        self,
+        query_text: str,
+        db: Session,
+        limit: int,
+        filters: Optional[JobFilters],
+        fields: Optional[Tuple[str, ...]] = None
+    ) -> List[Tuple[JobPosting, float]]:
+        """Rank by TF-IDF keyword similarity while embeddings are unavailable (never cached)"""
+        mark_degraded("embeddings")
+        allowed_ids = self._allowed_ids(db, filters)
+        if allowed_ids is not None and not allowed_ids:
+            return []
+        with stage("fallback_scoring"):
+            ranked = self.fallback.search(query_text, limit * 3 if self.collapse_duplicates else limit, allowed_ids)
+        scored_jobs = self._load_ranked(ranked, db, fields)
+        if self.collapse_duplicates:
+            scored_jobs = collapse_duplicates(scored_jobs)
+        return scored_jobs[:limit]
+
+    def _allowed_ids(self, db: Session, filters: Optional[JobFilters]) -> Optional[Set[str]]:
+        """Ids of the jobs passing the structured filters, None when there are no filters"""
+        if filters is None or not filters.model_dump(exclude_none=True):
+            return None
+        with stage("db_fetch"):
+            return {row.id for row in self._apply_filters(db.query(JobPosting.id), filters)}
+
+    def _embed_query(
+        self,
+        query_text: str,
+        cv_content: str,
+        interests: Optional[str],
+        soft_skills: Optional[str],
+        client=None
+    ) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+        """Normalised query vectors (one row, or one per CV section) and their weights"""
+        if self.scoring_mode == "sections":
+            sections = split_sections(cv_content)
             if interests:
-                query_text += f" Interests: {interests}"
+                sections.append(("Interests", interests))
             if soft_skills:
-                query_text += f" Soft Skills: {soft_skills}"
-
-            if not query_text.strip():
-                 return [] # Return empty if no text provided
-
-            cv_embedding = self._get_embedding(query_text)
-            if not cv_embedding or np.linalg.norm(cv_embedding) == 0:
-                 print("Warning: Could not generate a valid embedding for the CV.")
-                 return [] # Cannot match without a valid CV embedding
-
-            # 2. Retrieve candidate jobs (Consider optimizing this retrieval)
-            # Option A: Retrieve all jobs (can be slow/memory intensive)
-            # jobs = db.query(JobPosting).all()
-
-            # 2. Retrieve candidate jobs
-            # 2. Retrieve candidate jobs (Removed keyword pre-filtering)
-            # Determine a fetch limit to get enough candidates for scoring
-            fetch_limit = max(limit * 3, 100) # Fetch at least 100 or 3x the desired limit
-
-            # Fetch jobs directly without keyword filtering.
-            # Consider adding an ORDER BY clause if there's a relevant column (e.g., date_posted DESC)
-            # For now, just limit the total fetched.
-            jobs = db.query(JobPosting).limit(fetch_limit).all()
-
-            if not jobs:
-                print(f"No jobs found in the database (fetched up to {fetch_limit}).")
-                return []
-            else:
-                 print(f"Fetched {len(jobs)} candidate jobs with fetch_limit={fetch_limit}.")
-
-            # 3. Calculate scores for candidate jobs
-            scored_jobs = []
+                sections.append(("Soft Skills", soft_skills))
+            if len(sections) >= 2:
+                try:
+                    # All sections in one round-trip; an over-long section is pooled from its chunks
+                    vectors = self.embed_documents([text for _, text in sections], purpose="cv_sections", client=client)
+                    keep = np.linalg.norm(vectors, axis=1) > 0
+                    if keep.any():
+                        weights = np.array([section_weight(title) for title, _ in sections], dtype=np.float32)
+                        return vectors[keep], weights[keep]
+                except Exception as e:
+                    print(f"Error embedding CV sections, falling back to a single embedding: {e}")
+                    ZERO_VECTOR_FALLBACKS.labels(purpose="cv_sections").inc()
+
+        chunks = self._get_chunk_embeddings(query_text, client=client)
+        if chunks is None or not np.linalg.norm(chunks[0], axis=1).any():
+            return None, None
+        if self.chunk_pooling == "multi":
+            return chunks # One query row per chunk, weighted by its token count
+        return normalize_rows([pool(*chunks)]), np.ones(1, dtype=np.float32)
+
+    def _rank_candidates(
+        self,
+        query: np.ndarray,
+        weights: np.ndarray,
+        db: Session,
+        limit: int,
+        filters: Optional[JobFilters],
+        mmr_lambda: Optional[float] = None,
+        fields: Optional[Tuple[str, ...]] = None,
+        index=None
+    ) -> Tuple[List[Tuple[JobPosting, float]], bool]:
+        """Score candidate jobs against the CV query vectors (the job `index` when given), by similarity (descending).
+
+        Also returns whether the list holds every match, so a larger limit would not find more.
+        """
+        if index is not None:
+            return self._score_with_index(query, weights, db, limit, filters, mmr_lambda, fields, index)
+
+        # 2. Retrieve candidate jobs (Consider optimizing this retrieval)
+        # Option A: Retrieve all jobs (can be slow/memory intensive)
+        # jobs = db.query(JobPosting).all()
+
+        # 2. Retrieve candidate jobs
+        # 2. Retrieve candidate jobs (Removed keyword pre-filtering)
+        # Determine a fetch limit to get enough candidates for scoring
+        fetch_limit = max(limit * 3, 100) # Fetch at least 100 or 3x the desired limit
+
+        # Fetch jobs directly without keyword filtering.
+        # Consider adding an ORDER BY clause if there's a relevant column (e.g., date_posted DESC)
+        # For now, just limit the total fetched.
+        with stage("db_fetch"):
+            jobs = self._apply_filters(db.query(JobPosting), filters).limit(fetch_limit).all()
+
+        if not jobs:
+            print(f"No jobs found in the database (fetched up to {fetch_limit}).")
+            return [], True
+        else:
+             print(f"Fetched {len(jobs)} candidate jobs with fetch_limit={fetch_limit}.")
+
+        # 3. Calculate scores for candidate jobs
+        with stage("scoring"):
+            # Jobs without text or whose embedding fails keep a zero vector, i.e. a zero score
+            rows, offsets = [], []
+            cluster_chunks = {} # Near-duplicates share the embedding of the first one fetched
             for job in jobs:
+                offsets.append(len(rows))
                 # Combine relevant job fields into a single string for embedding
-                job_text_parts = [
-                    job.job_title,
-                    job.description,
-                    job.job_description,
-                    job.key_responsibilities,
-                    job.required_qualifications,
-                    job.preferred_qualifications,
-                    job.company # Maybe include company name?
-                ]
-                job_text = " ".join(filter(None, job_text_parts)) # Filter out None values
-
-                if not job_text.strip():
-                    score = 0.0 # Assign zero score if no text content for the job
-                else:
-                    job_embedding = self._get_embedding(job_text)
-                    if not job_embedding or np.linalg.norm(job_embedding) == 0:
-                        score = 0.0 # Assign zero score if embedding fails
+                text = job_text(job)
+                cluster = job.cluster_id or job.id
+                if cluster not in cluster_chunks:
+                    cluster_chunks[cluster] = self._get_chunk_embeddings(text, purpose="job")
+                chunks = cluster_chunks[cluster]
+                if chunks is None:
+                    if text.strip():
                         print(f"Warning: Could not generate embedding for job ID {job.id}")
-                    else:
-                        score = self._cosine_similarity(cv_embedding, job_embedding)
+                    rows.append(np.zeros(query.shape[1], dtype=np.float32))
+                elif self.chunk_pooling == "multi":
+                    rows.extend(chunks[0]) # Scored by the job's best-matching chunk
+                else:
+                    rows.append(pool(*chunks))
+            multi = self.chunk_pooling == "multi"
+            job_vectors = normalize_rows(np.vstack(rows))
+            scores = late_interaction(job_vectors, query, weights, np.array(offsets) if multi else None)
+        scored_jobs = list(zip(jobs, scores.tolist()))
+
+        # 4. Sort jobs by score (descending)
+        scored_jobs.sort(key=lambda item: item[1], reverse=True)
+        if self.collapse_duplicates:
+            scored_jobs = collapse_duplicates(scored_jobs)
+        if mmr_lambda is not None:
+            if multi:
+                # One vector per job for the similarity matrix: the mean of its chunk vectors
+                job_vectors = normalize_rows(np.add.reduceat(job_vectors, offsets, axis=0))
+            vectors = {job.id: job_vectors[row] for row, job in enumerate(jobs)}
+            scored_jobs = self._diversify(scored_jobs, vectors, limit, mmr_lambda)
+        return scored_jobs, len(jobs) < fetch_limit
+
+    def _score_with_index(
+        self,
+        query: np.ndarray,
+        weights: np.ndarray,
+        db: Session,
+        limit: int,
+        filters: Optional[JobFilters],
+        mmr_lambda: Optional[float] = None,
+        fields: Optional[Tuple[str, ...]] = None,
+        index=None
+    ) -> Tuple[List[Tuple[JobPosting, float]], bool]:
+        """Rank the whole corpus against the precomputed job vectors, then load the top `limit` rows"""
+        index = index if index is not None else self.index
+        allowed_ids = self._allowed_ids(db, filters)
+        if allowed_ids is not None and not allowed_ids:
+            return [], True
+
+        # Duplicates have identical vectors and rank next to each other; over-fetch so collapsing still fills `limit`
+        depth = max(limit, self.mmr_shortlist) if mmr_lambda is not None else limit
+        if self.collapse_duplicates:
+            depth *= 3
+        with stage("scoring"):
+            ranked = index.search(query if len(query) > 1 else query[0], depth, allowed_ids,
+                                  weights if len(query) > 1 else None)
 
-                scored_jobs.append((job, score))
+        scored_jobs = self._load_ranked(ranked, db, fields)
+        if self.collapse_duplicates:
+            scored_jobs = collapse_duplicates(scored_jobs)
+        if mmr_lambda is not None:
+            shortlist = scored_jobs[:max(limit, self.mmr_shortlist)]
+            vectors = index.vectors_for([job.id for job, _ in shortlist])
+            scored_jobs = self._diversify(shortlist, vectors, limit, mmr_lambda)
+        # Complete only when the index ran out of matches before `depth` and nothing was cut to fit `limit`:
+        # a short list after collapsing duplicates says nothing about what lies deeper in the index
+        complete = len(ranked) < depth and len(scored_jobs) <= limit
+        return scored_jobs[:limit], complete
 
-            # 4. Sort jobs by score (descending)
-            scored_jobs.sort(key=lambda item: item[1], reverse=True)
+    def _diversify(
+        self,
+        scored_jobs: List[Tuple[JobPosting, float]],
+        vectors: Dict[str, np.ndarray],
+        limit: int,
+        mmr_lambda: float
+    ) -> List[Tuple[JobPosting, float]]:
+        """Re-rank the top MMR_SHORTLIST matches by maximal marginal relevance (scores stay the relevance)"""
+        shortlist = [(job, score) for job, score in scored_jobs[:self.mmr_shortlist] if job.id in vectors]
+        if len(shortlist) < 2:
+            return scored_jobs
+        with stage("diversify"):
+            similarities = similarity_matrix(np.stack([vectors[job.id] for job, _ in shortlist]))
+            order = mmr(np.array([score for _, score in shortlist]), similarities,
+                        min(limit, len(shortlist)), mmr_lambda)
+        picked = set(order.tolist())
+        diversified = [shortlist[i] for i in order]
+        # Shortlisted jobs not picked follow in relevance order, then everything below the shortlist
+        diversified += [item for i, item in enumerate(shortlist) if i not in picked]
+        shortlisted = {job.id for job, _ in shortlist}
+        diversified += [item for item in scored_jobs if item[0].id not in shortlisted]
+        return diversified
+
+    def _load_ranked(
+        self,
+        ranked: List[Tuple[str, float]],
+        db: Session,
+        fields: Optional[Tuple[str, ...]] = None
+    ) -> List[Tuple[JobPosting, float]]:
+        """Load the rows for ranked (job id, score) pairs in ranking order (only the `fields` columns when given)"""
+        if not ranked:
+            return []
+        query = db.query(*load_columns(fields)) if fields is not None else db.query(JobPosting)
+        with stage("db_fetch"):
+            jobs = query.filter(JobPosting.id.in_([job_id for job_id, _ in ranked])).all()
+        jobs_by_id = {job.id: job for job in jobs}
+        # Jobs deleted since the ranking was computed are skipped
+        return [(jobs_by_id[job_id], score) for job_id, score in ranked if job_id in jobs_by_id]
+
+    def find_matches(
+        self,
+        cv_content: str,
+        interests: Optional[str] = None,
+        soft_skills: Optional[str] = None,
+        db: Session = None,
+        limit: int = 10,
+        filters: Optional[JobFilters] = None,
+        mmr_lambda: Optional[float] = None,
+        fields: Optional[Tuple[str, ...]] = None
+    ) -> List[JobResponse]:
+        """Find matching jobs for a CV using embedding similarity (`fields` projects the responses)"""
+        print(f"find_matches called with limit: {limit}") # Added print statement
+        try:
+            scored_jobs = self._score_candidates(cv_content, interests, soft_skills, db, limit, filters,
+                                                 mmr_lambda, fields)
 
             # 5. Format results into JobResponse
-            results = [
-                JobResponse(
-                    id=job.id,
-                    job_title=job.job_title,
-                    job_description=job.job_description,
-                    company=job.company,
-                    location=job.location,
-                    level=job.level,
-                    description=job.description,
-                    key_responsibilities=job.key_responsibilities,
-                    required_qualifications=job.required_qualifications,
-                    preferred_qualifications=job.preferred_qualifications,
-                    benefits=job.benefits,
-                    salary=job.salary,
-                    application_instructions=job.application_instructions,
-                    match_score=score # Assign calculated score
-                ) for job, score in scored_jobs
-            ]
+            with stage("hydration"):
+                results = [self._to_job_response(job, score, fields) for job, score in scored_jobs[:limit]]
 
             # 6. Return top 'limit' results
             return results[:limit]
@@ -171,34 +588,57 @@ class JobMatchingService:
             # Re-raise or return an empty list/error response
             raise Exception(f"Error finding matches: {str(e)}")
 
-    def get_job_by_id(self, job_id: str, db: Session) -> Optional[JobResponse]: # Changed job_id type hint to str
+    def rank_matches(
+        self,
+        cv_content: str,
+        interests: Optional[str] = None,
+        soft_skills: Optional[str] = None,
+        db: Session = None,
+        limit: int = 10,
+        filters: Optional[JobFilters] = None,
+        mmr_lambda: Optional[float] = None
+    ) -> List[Tuple[str, float]]:
+        """Like find_matches, but return only the ranked (job id, score) pairs so they can be cached"""
+        try:
+            scored_jobs = self._score_candidates(cv_content, interests, soft_skills, db, limit, filters, mmr_lambda)
+            return [(job.id, float(score)) for job, score in scored_jobs[:limit]]
+        except Exception as e:
+            print(f"Error ranking matches: {str(e)}")
+            raise Exception(f"Error ranking matches: {str(e)}")
+
+    def hydrate_matches(
+        self,
+        ranked: List[Tuple[str, float]],
+        db: Session,
+        fields: Optional[Tuple[str, ...]] = None
+    ) -> List[JobResponse]:
+        """Load the jobs for ranked (job id, score) pairs, preserving the ranking order"""
+        scored_jobs = self._load_ranked(ranked, db, fields)
+        with stage("hydration"):
+            return [self._to_job_response(job, score, fields) for job, score in scored_jobs]
+
+    def get_job_by_id(self, job_id: str, db: Session) -> Optional[JobResponse]:
         """Get job details by ID"""
-        job = db.query(JobPosting).filter(JobPosting.id == job_id).first()
+        with stage("db_fetch"):
+            job = db.query(JobPosting).filter(JobPosting.id == job_id).first()
         if job:
-            # Updated JobResponse mapping
-            return JobResponse(
-                id=job.id,
-                job_title=job.job_title,
-                job_description=job.job_description,
-                company=job.company,
-                location=job.location,
-                level=job.level,
-                description=job.description,
-                key_responsibilities=job.key_responsibilities,
-                required_qualifications=job.required_qualifications,
-                preferred_qualifications=job.preferred_qualifications,
-                benefits=job.benefits,
-                salary=job.salary,
-                application_instructions=job.application_instructions,
-                match_score=None # No score applicable here
-            )
+            with stage("hydration"):
+                return self._to_job_response(job)
         return None
 
-    def search_jobs_by_keyword(self, keyword: str, limit: int, db: Session) -> List[JobResponse]:
-        """Search jobs by keyword using simple ILIKE"""
+    def search_jobs_by_keyword(
+        self,
+        keyword: str,
+        limit: int,
+        db: Session,
+        filters: Optional[JobFilters] = None,
+        fields: Optional[Tuple[str, ...]] = None
+    ) -> List[JobResponse]:
+        """Search jobs by keyword using simple ILIKE (only the `fields` columns are selected when given)"""
         # Remove tsvector logic, implement basic keyword search
         search_term = f"%{keyword}%"
-        jobs = db.query(JobPosting).filter(
+        query = db.query(*load_columns(fields)) if fields is not None else db.query(JobPosting)
+        query = query.filter(
             or_(
                 JobPosting.job_title.ilike(search_term),
                 JobPosting.description.ilike(search_term),
@@ -207,24 +647,9 @@ class JobMatchingService:
                 JobPosting.required_qualifications.ilike(search_term),
                 JobPosting.company.ilike(search_term)
             )
-        ).limit(limit).all()
-
-        # Updated JobResponse mapping
-        return [
-            JobResponse(
-                id=job.id,
-                job_title=job.job_title,
-                job_description=job.job_description,
-                company=job.company,
-                location=job.location,
-                level=job.level,
-                description=job.description,
-                key_responsibilities=job.key_responsibilities,
-                required_qualifications=job.required_qualifications,
-                preferred_qualifications=job.preferred_qualifications,
-                benefits=job.benefits,
-                salary=job.salary,
-                application_instructions=job.application_instructions,
-                match_score=None # No score applicable here
-            ) for job in jobs
-        ]
+        )
+        with stage("db_fetch"):
+            jobs = self._apply_filters(query, filters).limit(limit).all()
+
+        with stage("hydration"):
+            return [self._to_job_response(job, fields=fields) for job in jobs]
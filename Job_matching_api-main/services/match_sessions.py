@@ -0,0 +1,75 @@
+import base64
+import binascii
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+class MatchSession:
+    """A ranked list of (job id, score) pairs kept for paging through one CV match"""
+
+    def __init__(self, result_id: str, ranked: List[Tuple[str, float]], expires_at: float):
+        self.result_id = result_id
+        self.ranked = ranked
+        self.expires_at = expires_at
+
+class MatchSessionStore:
+    """Short-lived, bounded in-process store of match rankings keyed by result id.
+
+    Only ids and scores are kept (a few KB per session), so paging never re-runs
+    the PDF extraction, GPT summary or embedding; each page only hydrates its rows.
+    """
+
+    def __init__(self, ttl_seconds: Optional[int] = None, max_sessions: Optional[int] = None):
+        self.ttl_seconds = ttl_seconds or int(os.getenv("MATCH_SESSION_TTL_SECONDS", 900))
+        self.max_sessions = max_sessions or int(os.getenv("MATCH_SESSION_MAX_ENTRIES", 1000))
+        self._sessions: "OrderedDict[str, MatchSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, ranked: List[Tuple[str, float]]) -> MatchSession:
+        """Store a ranking and return its session"""
+        session = MatchSession(secrets.token_urlsafe(16), ranked, time.time() + self.ttl_seconds)
+        with self._lock:
+            self._evict_expired()
+            self._sessions[session.result_id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False) # Oldest first
+        return session
+
+    def get(self, result_id: str) -> Optional[MatchSession]:
+        """Return a live session or None if it is unknown or expired"""
+        with self._lock:
+            session = self._sessions.get(result_id)
+            if session is None:
+                return None
+            if session.expires_at < time.time():
+                del self._sessions[result_id]
+                return None
+            return session
+
+    def _evict_expired(self) -> None:
+        now = time.time()
+        # Sessions are inserted in expiry order, so stop at the first live one
+        while self._sessions:
+            result_id, session = next(iter(self._sessions.items()))
+            if session.expires_at >= now:
+                break
+            del self._sessions[result_id]
+
+def encode_cursor(offset: int) -> str:
+    """Encode a page offset as an opaque cursor"""
+    return base64.urlsafe_b64encode(f"o:{offset}".encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: Optional[str]) -> int:
+    """Decode a cursor produced by encode_cursor; raises ValueError when malformed"""
+    if not cursor:
+        return 0
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    except (binascii.Error, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+    if not raw.startswith("o:") or not raw[2:].isdigit():
+        raise ValueError("Invalid cursor")
+    return int(raw[2:])
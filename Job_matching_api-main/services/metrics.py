@@ -0,0 +1,186 @@
+import contextvars
+import functools
+import inspect
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import Response
+from fastapi.routing import APIRoute
+from prometheus_client import (CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY,
+                               generate_latest, multiprocess)
+
+# Pipeline stages take from sub-millisecond (hydration) to tens of seconds (GPT summary)
+_STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40)
+
+STAGE_SECONDS = Histogram(
+    "job_matching_stage_seconds", "Time spent in each pipeline stage",
+    ["stage"], buckets=_STAGE_BUCKETS
+)
+REQUEST_SECONDS = Histogram(
+    "job_matching_http_request_seconds", "End-to-end HTTP request latency",
+    ["method", "route", "status"], buckets=_STAGE_BUCKETS
+)
+EMBEDDING_CALLS = Counter(
+    "job_matching_embedding_calls_total", "Embedding API calls", ["purpose"]
+)
+ZERO_VECTOR_FALLBACKS = Counter(
+    "job_matching_zero_vector_fallbacks_total", "Embeddings replaced by the zero vector after an error", ["purpose"]
+)
+CACHE_REQUESTS = Counter(
+    "job_matching_cache_requests_total", "Cache lookups", ["cache", "result"]
+)
+TASKS = Counter(
+    "job_matching_tasks_total", "Queued match tasks by outcome", ["status"]
+)
+TASK_QUEUE_DEPTH = Gauge(
+    "job_matching_task_queue_depth", "Match tasks waiting for a worker", multiprocess_mode="livesum"
+)
+CIRCUIT_STATE = Gauge(
+    "job_matching_circuit_state", "Circuit breaker state per dependency (0 closed, 1 half-open, 2 open)",
+    ["dependency"], multiprocess_mode="livemax"
+)
+DEGRADED_RESPONSES = Counter(
+    "job_matching_degraded_responses_total", "Requests answered with a fallback", ["reason"]
+)
+REBUILDS = Counter(
+    "job_matching_rebuilds_total", "Background rebuilds of in-process structures by outcome", ["structure", "result"]
+)
+AZURE_IN_FLIGHT = Gauge(
+    "job_matching_azure_in_flight", "Requests in flight to each Azure OpenAI deployment", ["deployment"],
+    multiprocess_mode="livesum"
+)
+INDEX_GENERATION = Gauge(
+    "job_matching_index_generation", "Generations swapped in since start, per structure", ["structure"],
+    multiprocess_mode="livemax"
+)
+
+# (stage, seconds) pairs recorded during the current request, reported in the Server-Timing header
+_request_timings: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar(
+    "request_timings", default=None
+)
+# perf_counter() at which the endpoint function returned; what follows is response serialization
+_endpoint_done: contextvars.ContextVar[Optional[List[float]]] = contextvars.ContextVar(
+    "endpoint_done", default=None
+)
+
+def record_stage(name: str, seconds: float) -> None:
+    """Record a stage duration in the histogram and the current request's Server-Timing"""
+    STAGE_SECONDS.labels(stage=name).observe(seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((name, seconds))
+
+@contextmanager
+def stage(name: str):
+    """Time the enclosed block as one pipeline stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+@contextmanager
+def collect_stages():
+    """Collect the stages timed in the enclosed work apart from the current request's Server-Timing"""
+    timings: List[Tuple[str, float]] = []
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+def add_stages(timings: List[Tuple[str, float]]) -> None:
+    """Add stages timed elsewhere (already in the histogram) to the current request's Server-Timing"""
+    current = _request_timings.get()
+    if current is not None:
+        current.extend(timings)
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+def _mark_endpoint_done() -> None:
+    marker = _endpoint_done.get()
+    if marker is not None:
+        marker.append(time.perf_counter())
+
+class TimedRoute(APIRoute):
+    """APIRoute that marks when the endpoint returns, so serialization can be timed separately"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        endpoint = self.dependant.call
+        if inspect.iscoroutinefunction(endpoint):
+            @functools.wraps(endpoint)
+            async def call(*a, **kw):
+                try:
+                    return await endpoint(*a, **kw)
+                finally:
+                    _mark_endpoint_done()
+        else:
+            @functools.wraps(endpoint)
+            def call(*a, **kw):
+                try:
+                    return endpoint(*a, **kw)
+                finally:
+                    _mark_endpoint_done()
+        self.dependant.call = call
+
+def _server_timing(timings: List[Tuple[str, float]], total: float) -> str:
+    merged: Dict[str, float] = {}
+    for name, seconds in timings:
+        merged[name] = merged.get(name, 0.0) + seconds
+    parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in merged.items()]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency and attaching a Server-Timing header"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        timings: List[Tuple[str, float]] = []
+        endpoint_done: List[float] = []
+        timings_token = _request_timings.set(timings)
+        done_token = _endpoint_done.set(endpoint_done)
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                now = time.perf_counter()
+                if endpoint_done:
+                    record_stage("serialization", now - endpoint_done[-1])
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", _server_timing(timings, now - start).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            REQUEST_SECONDS.labels(
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=str(status["code"])
+            ).observe(time.perf_counter() - start)
+            _request_timings.reset(timings_token)
+            _endpoint_done.reset(done_token)
+
+def metrics_response() -> Response:
+    """Render the Prometheus exposition, aggregating worker processes when PROMETHEUS_MULTIPROC_DIR is set"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(content=generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,239 @@
+import cProfile
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+# Leaf frames (module, qualified function) of threads that are idle: event loop polling, thread pools and
+# queues waiting for work. Qualified so that application code with the same names (`get`, `wait`) is kept
+_IDLE_LEAVES = {
+    ("selectors", "SelectSelector.select"),
+    ("selectors", "_PollLikeSelector.select"),
+    ("selectors", "EpollSelector.select"),
+    ("selectors", "KqueueSelector.select"),
+    ("threading", "Condition.wait"),
+    ("threading", "Event.wait"),
+    ("threading", "Thread._wait_for_tstate_lock"),
+    ("queue", "Queue.get"),
+    ("concurrent.futures.thread", "_worker"),
+    ("socket", "socket.accept"),
+}
+
+def _collapse(frame) -> Optional[str]:
+    """Render a thread's stack as one collapsed-stack line (root first, ';'-separated)"""
+    names = []
+    leaf = (frame.f_globals.get("__name__"), frame.f_code.co_qualname)
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    if leaf in _IDLE_LEAVES:
+        return None
+    return ";".join(reversed(names))
+
+class Capture:
+    """Stack samples collected while one request was in flight"""
+
+    def __init__(self):
+        self.stacks: Counter = Counter()
+        self.samples = 0
+
+    def add(self, stacks: List[str]) -> None:
+        self.samples += 1
+        self.stacks.update(stacks)
+
+class StackSampler:
+    """Background thread sampling every thread's stack while at least one capture is active.
+
+    Requests run on the event loop thread and in the thread pool, so a capture
+    holds the stacks of all busy threads during the request; under concurrency it
+    includes work of overlapping requests.
+    """
+
+    def __init__(self, interval_seconds: float):
+        self.interval = interval_seconds
+        self._captures = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start_capture(self) -> Capture:
+        capture = Capture()
+        with self._lock:
+            self._captures.add(capture)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+        return capture
+
+    def stop_capture(self, capture: Capture) -> None:
+        with self._lock:
+            self._captures.discard(capture)
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while True:
+            with self._lock:
+                captures = list(self._captures)
+            if not captures:
+                self._wakeup.wait(timeout=1.0)
+                self._wakeup.clear()
+                continue
+            stacks = []
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = _collapse(frame)
+                if stack:
+                    stacks.append(stack)
+            for capture in captures:
+                capture.add(stacks)
+            time.sleep(self.interval)
+
+class Profiler:
+    """Opt-in request profiling: a sampled fraction of requests plus every request slower than a threshold.
+
+    Profiles are written as collapsed stacks (`.folded`, for flamegraph.pl / speedscope)
+    into a directory bounded to `max_files` entries, by a background thread so
+    the request never waits on the disk. With format "pstats" a sampled request
+    also gets a cProfile dump; cProfile only sees the event loop thread, so the
+    thread-pool work (extraction, embedding, scoring) is only in the `.folded` file.
+    """
+
+    def __init__(self):
+        self.output_dir = os.getenv("PROFILE_DIR", "/tmp/job-matching-profiles")
+        self.max_files = int(os.getenv("PROFILE_MAX_FILES", 50))
+        # Off by default: while it is on, every request runs the stack sampler
+        self.slow_request_ms = float(os.getenv("PROFILE_SLOW_REQUEST_MS", 0))
+        self.sample_rate = 0.0 # Set through the admin endpoint
+        self.format = "folded"
+        self.sample_until: Optional[float] = None
+        self.sampler = StackSampler(float(os.getenv("PROFILE_INTERVAL_MS", 10)) / 1000)
+        self._cprofile_lock = threading.Lock() # Only one cProfile may run per process
+        self._pending: "queue.Queue" = queue.Queue(maxsize=self.max_files) # Profiles waiting for the writer thread
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+
+    def configure(self, sample_rate: float, duration_seconds: Optional[int] = None,
+                  slow_request_ms: Optional[float] = None, fmt: Optional[str] = None) -> None:
+        self.sample_rate = max(0.0, min(1.0, sample_rate))
+        self.sample_until = time.time() + duration_seconds if duration_seconds else None
+        if slow_request_ms is not None:
+            self.slow_request_ms = slow_request_ms
+        if fmt is not None:
+            if fmt not in ("folded", "pstats"):
+                raise ValueError("format must be 'folded' or 'pstats'")
+            self.format = fmt
+
+    def status(self) -> Dict[str, object]:
+        return {
+            "sample_rate": self._current_sample_rate(),
+            "sample_until": self.sample_until,
+            "slow_request_ms": self.slow_request_ms,
+            "format": self.format,
+            "output_dir": self.output_dir,
+            "profiles": self.list_profiles(),
+        }
+
+    def list_profiles(self) -> List[str]:
+        if not os.path.isdir(self.output_dir):
+            return []
+        return sorted(os.listdir(self.output_dir), reverse=True)
+
+    def _current_sample_rate(self) -> float:
+        if self.sample_until is not None and time.time() > self.sample_until:
+            self.sample_rate = 0.0
+            self.sample_until = None
+        return self.sample_rate
+
+    def save(self, name: str, capture: Capture, cprofile: Optional[cProfile.Profile]) -> None:
+        """Queue a finished profile for the writer thread (dropped when the queue is full)"""
+        try:
+            self._pending.put_nowait((name, capture, cprofile))
+        except queue.Full:
+            print(f"Profile writer busy, dropping profile {name}")
+            return
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_pending, name="profile-writer", daemon=True)
+                self._writer.start()
+
+    def _write_pending(self) -> None:
+        while True:
+            name, capture, cprofile = self._pending.get()
+            try:
+                self._write(name, capture, cprofile)
+            except OSError as e:
+                print(f"Could not write profile {name}: {e}")
+
+    def _write(self, name: str, capture: Capture, cprofile: Optional[cProfile.Profile]) -> None:
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, name)
+        if cprofile is not None:
+            cprofile.dump_stats(path + ".pstats")
+        with open(path + ".folded", "w") as f:
+            for stack, count in capture.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        self._enforce_bound()
+
+    def _enforce_bound(self) -> None:
+        paths = [os.path.join(self.output_dir, name) for name in os.listdir(self.output_dir)]
+        paths.sort(key=os.path.getmtime)
+        for path in paths[:max(0, len(paths) - self.max_files)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+class ProfilingMiddleware:
+    """ASGI middleware deciding per request whether to profile and whether to keep the profile"""
+
+    def __init__(self, app, profiler: Profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        profiler = self.profiler
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        sampled = random.random() < profiler._current_sample_rate()
+        if not sampled and profiler.slow_request_ms <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        cprofile = None
+        if sampled and profiler.format == "pstats" and profiler._cprofile_lock.acquire(blocking=False):
+            cprofile = cProfile.Profile() # Event loop thread only; the sampler below covers the thread pool
+            cprofile.enable()
+        capture = profiler.sampler.start_capture()
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if cprofile is not None:
+                cprofile.disable()
+                profiler._cprofile_lock.release()
+            profiler.sampler.stop_capture(capture)
+
+            slow = profiler.slow_request_ms > 0 and elapsed_ms >= profiler.slow_request_ms
+            if sampled or slow:
+                route = getattr(scope.get("route"), "path", scope.get("path", ""))
+                name = "{}-{}-{}-{}-{:.0f}ms".format(
+                    datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f"),
+                    "slow" if slow else "sampled",
+                    scope["method"],
+                    re.sub(r"[^A-Za-z0-9_.-]+", "_", route).strip("_") or "root",
+                    elapsed_ms,
+                )
+                profiler.save(name, capture, cprofile)
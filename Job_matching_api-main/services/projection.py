@@ -0,0 +1,27 @@
+from typing import List, Optional, Tuple
+
+from models.database import JobPosting
+from models.schemas import JobResponse
+
+# Always returned, whatever `fields=` asks for
+ALWAYS_FIELDS = ("id", "match_score")
+# JobResponse fields backed by a JobPosting column, i.e. the ones a projection can select
+JOB_FIELDS = tuple(name for name in JobResponse.model_fields if name not in ALWAYS_FIELDS)
+
+def parse_fields(value: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """Column fields named in a comma-separated `fields=` value (None = every field).
+
+    Raises ValueError on unknown names.
+    """
+    if value is None or not value.strip():
+        return None
+    names = list(dict.fromkeys(name.strip() for name in value.split(",") if name.strip()))
+    unknown = [name for name in names if name not in JOB_FIELDS and name not in ALWAYS_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)} (available: {', '.join(ALWAYS_FIELDS + JOB_FIELDS)})")
+    return tuple(name for name in names if name in JOB_FIELDS)
+
+def load_columns(fields: Tuple[str, ...]) -> List:
+    """JobPosting columns to load for a projection (cluster_id is needed to collapse duplicates)"""
+    names = dict.fromkeys(("id", "cluster_id") + tuple(fields))
+    return [getattr(JobPosting, name) for name in names]
@@ -0,0 +1,255 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Generic, List, Optional, Tuple, TypeVar
+
+from services.metrics import INDEX_GENERATION, REBUILDS
+
+T = TypeVar("T")
+
+class Generation(Generic[T]):
+    """One complete build of a structure, with the number of requests currently using it"""
+
+    __slots__ = ("value", "version", "number", "built_at", "refs", "retired")
+
+    def __init__(self, value: T, version: str, number: int):
+        self.value = value
+        self.version = version
+        self.number = number
+        self.built_at = time.time()
+        self.refs = 0
+        self.retired = False
+
+class VersionedSlot(Generic[T]):
+    """Version pointer to the generation of an in-process structure that requests are served from.
+
+    `swap` repoints it in O(1). Requests pin the generation they started with
+    through `acquire`; a replaced generation is closed (in a background thread,
+    never on a request) once the last of them releases it.
+    """
+
+    def __init__(self, name: str, close: Optional[Callable[[T], None]] = None):
+        self.name = name
+        self._close = close
+        self._current: Optional[Generation[T]] = None
+        self._draining: List[Generation[T]] = []
+        self._count = 0
+        self._lock = threading.Lock()
+
+    @property
+    def value(self) -> Optional[T]:
+        """The current generation's value, unpinned (for sizes and readiness checks)"""
+        current = self._current
+        return current.value if current is not None else None
+
+    @property
+    def version(self) -> Optional[str]:
+        current = self._current
+        return current.version if current is not None else None
+
+    @property
+    def built_at(self) -> float:
+        current = self._current
+        return current.built_at if current is not None else 0.0
+
+    @contextmanager
+    def acquire(self):
+        """Pin the current generation for the enclosed work; yields its value (None before the first swap)"""
+        with self._lock:
+            generation = self._current
+            if generation is not None:
+                generation.refs += 1
+        try:
+            yield generation.value if generation is not None else None
+        finally:
+            if generation is not None:
+                self._release(generation)
+
+    def _release(self, generation: Generation[T]) -> None:
+        with self._lock:
+            generation.refs -= 1
+            drained = generation.retired and generation.refs == 0
+            if drained:
+                self._draining.remove(generation)
+        if drained:
+            self._free(generation)
+
+    def swap(self, value: T, version: str) -> None:
+        """Serve `value` from now on; the previous generation is freed once its requests are done"""
+        with self._lock:
+            self._count += 1
+            previous, self._current = self._current, Generation(value, version, self._count)
+            drained = previous is not None and previous.refs == 0
+            if previous is not None:
+                previous.retired = True
+                if not drained:
+                    self._draining.append(previous)
+        INDEX_GENERATION.labels(structure=self.name).set(self._count)
+        if drained:
+            self._free(previous)
+
+    def discard(self, value: T) -> None:
+        """Close a value that was built but never swapped in (e.g. rejected by validation)"""
+        if self._close is not None:
+            self._close(value)
+
+    def _free(self, generation: Generation[T]) -> None:
+        value, generation.value = generation.value, None # Drop the slot's reference so memory is released
+        if self._close is not None:
+            threading.Thread(target=self._close, args=(value,), name=f"{self.name}-close", daemon=True).start()
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            current = self._current
+            return {
+                "version": current.version if current is not None else None,
+                "generation": current.number if current is not None else 0,
+                "built_at": current.built_at if current is not None else None,
+                "in_flight": current.refs if current is not None else 0,
+                "draining": [{"version": g.version, "in_flight": g.refs} for g in self._draining],
+            }
+
+class RebuildRejected(Exception):
+    """A new generation failed validation; the current one keeps serving"""
+
+class _Job:
+    def __init__(self, name: str, slot: VersionedSlot, build: Callable[[], Tuple[Any, str]],
+                 due: Optional[Callable[[], bool]], validate: Optional[Callable[[Any], None]],
+                 size: Optional[Callable[[Any], int]], interval: float):
+        self.name = name
+        self.slot = slot
+        self.build = build
+        self.due = due
+        self.validate = validate
+        self.size = size
+        self.interval = interval
+        self.next_check = time.monotonic() + interval
+        self.forced = False
+        self.last_result: Optional[str] = None
+        self.rejected_version: Optional[str] = None
+        self.last_error: Optional[str] = None
+        self.last_seconds: Optional[float] = None
+
+class RebuildOrchestrator:
+    """Rebuilds in-process structures (job index, keyword index, suggestion index) off the request path.
+
+    A single background thread checks each registered structure every
+    `interval` seconds and, when `due()` says so, builds a complete new
+    generation next to the served one, validates it and swaps it in. Rebuilds
+    run one at a time, so scheduled rebuilds never compete with each other for
+    the CPU, and requests only ever see a finished generation.
+
+    Validation rejects a generation with fewer than REBUILD_MIN_ROW_RATIO times
+    the rows of the current one (a truncated read must not replace a good index)
+    and runs the structure's own sample queries, which also fault in its pages
+    before the first request does.
+    """
+
+    def __init__(self, min_row_ratio: Optional[float] = None):
+        self.min_row_ratio = min_row_ratio if min_row_ratio is not None else float(
+            os.getenv("REBUILD_MIN_ROW_RATIO", 0.5))
+        self._jobs: Dict[str, _Job] = {}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._running = threading.Lock() # One rebuild at a time, scheduled or triggered
+
+    def register(self, name: str, slot: VersionedSlot, build: Callable[[], Tuple[Any, str]], interval: float,
+                 due: Optional[Callable[[], bool]] = None, validate: Optional[Callable[[Any], None]] = None,
+                 size: Optional[Callable[[Any], int]] = None) -> None:
+        """Rebuild `slot` with `build() -> (value, version)` when `due()` (always, if None), checked every `interval` s.
+
+        `validate(value)` raises to reject a generation; `size(value)` gives its row count.
+        """
+        self._jobs[name] = _Job(name, slot, build, due, validate, size, interval)
+
+    def start(self) -> None:
+        if self._thread is None and self._jobs:
+            self._thread = threading.Thread(target=self._loop, name="index-rebuilds", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def trigger(self, name: str) -> None:
+        """Rebuild `name` now, whether or not it is due"""
+        job = self._jobs[name]
+        job.forced = True
+        job.next_check = 0.0
+        self._wake.set()
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            now = time.monotonic()
+            for job in sorted(self._jobs.values(), key=lambda j: j.next_check):
+                if self._stop.is_set() or job.next_check > time.monotonic():
+                    continue
+                forced, job.forced = job.forced, False
+                self.run(job.name, force=forced)
+                job.next_check = time.monotonic() + job.interval
+            next_check = min((job.next_check for job in self._jobs.values()), default=now + 60)
+            self._wake.wait(max(0.0, next_check - time.monotonic()))
+            self._wake.clear()
+
+    def run(self, name: str, force: bool = False) -> str:
+        """Check and, if due, rebuild one structure in the calling thread; returns the outcome"""
+        job = self._jobs[name]
+        with self._running:
+            start = time.perf_counter()
+            try:
+                if not force and job.due is not None and not job.due():
+                    return "skipped"
+                value, version = job.build()
+                self._validate(job, value)
+            except RebuildRejected as e:
+                result, job.last_error = "rejected", str(e)
+                job.rejected_version = version
+                job.slot.discard(value)
+            except Exception as e:
+                result, job.last_error = "failed", str(e)
+            else:
+                job.slot.swap(value, version)
+                result, job.last_error, job.rejected_version = "swapped", None, None
+            job.last_result = result
+            job.last_seconds = time.perf_counter() - start
+            REBUILDS.labels(structure=name, result=result).inc()
+            detail = f": {job.last_error}" if job.last_error else ""
+            print(f"Rebuild of {name} {result} after {job.last_seconds:.1f}s{detail}")
+            return result
+
+    def _validate(self, job: _Job, value: Any) -> None:
+        if job.size is not None:
+            rows = job.size(value)
+            current = job.slot.value
+            previous = job.size(current) if current is not None else 0
+            if previous and rows < previous * self.min_row_ratio:
+                raise RebuildRejected(f"{rows} rows, below {self.min_row_ratio:.0%} of the {previous} served")
+        if job.validate is not None:
+            try:
+                job.validate(value)
+            except RebuildRejected:
+                raise
+            except Exception as e:
+                raise RebuildRejected(f"sample queries failed: {e}") from e
+
+    def rejected_version(self, name: str) -> Optional[str]:
+        """Version of the last generation that failed validation (a `due` check can skip rebuilding it)"""
+        job = self._jobs.get(name)
+        return job.rejected_version if job is not None else None
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        return {name: {**job.slot.status(), "last_result": job.last_result, "last_error": job.last_error,
+                       "rejected_version": job.rejected_version, "last_seconds": job.last_seconds}
+                for name, job in self._jobs.items()}
+
+def with_session(session_factory: Callable[[], Any], fn: Callable[[Any], T]) -> T:
+    """`fn(db)` on a session of its own (builds run outside any request)"""
+    db = session_factory()
+    try:
+        return fn(db)
+    finally:
+        db.close()
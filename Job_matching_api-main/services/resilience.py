@@ -0,0 +1,154 @@
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, TypeVar
+
+import openai
+
+from services.metrics import CIRCUIT_STATE, DEGRADED_RESPONSES
+
+T = TypeVar("T")
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+class CircuitOpen(Exception):
+    """Raised instead of calling a dependency whose circuit breaker is open"""
+
+def is_outage(error: Exception) -> bool:
+    """Whether an error says the provider is down or overloaded (timeouts, connection errors, 429, 5xx).
+
+    Other API errors (bad request, content filter, auth) are about the request
+    itself and do not open the breaker.
+    """
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return True
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker for one external dependency.
+
+    After CIRCUIT_FAILURE_THRESHOLD outage errors in a row the circuit opens and
+    calls fail immediately with CircuitOpen. After CIRCUIT_RESET_SECONDS one trial
+    call is let through: success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, name: str, failure_threshold: Optional[int] = None, reset_seconds: Optional[float] = None):
+        self.name = name
+        self.failure_threshold = failure_threshold or int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", 5))
+        self.reset_seconds = reset_seconds or float(os.getenv("CIRCUIT_RESET_SECONDS", 30))
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+        CIRCUIT_STATE.labels(dependency=name).set(0)
+
+    @property
+    def is_open(self) -> bool:
+        """True while calls would be rejected (open and not yet due for a trial call)"""
+        return self.state == OPEN and time.monotonic() - self._opened_at < self.reset_seconds
+
+    def _set_state(self, state: str) -> None:
+        if state != self.state:
+            print(f"Circuit {self.name}: {self.state} -> {state}")
+            self.state = state
+            CIRCUIT_STATE.labels(dependency=self.name).set({CLOSED: 0, HALF_OPEN: 1, OPEN: 2}[state])
+
+    def _before_call(self) -> None:
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self._set_state(HALF_OPEN) # This caller makes the trial call
+                return
+            raise CircuitOpen(f"{self.name} unavailable (circuit {self.state})")
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._set_state(CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self.state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._set_state(OPEN)
+
+    def call(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """Run `fn` through the breaker (raises CircuitOpen without calling it while open)"""
+        self._before_call()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            if is_outage(e):
+                self.record_failure()
+            elif self.state == HALF_OPEN:
+                self.record_success() # The provider answered, the request was just bad
+            raise
+        self.record_success()
+        return result
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """The process-wide breaker for a dependency, shared by every service instance"""
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+# Degradations applied while serving the current request (e.g. "cv_summary", "embeddings")
+_degraded: contextvars.ContextVar[Optional[List[str]]] = contextvars.ContextVar("degraded", default=None)
+
+def mark_degraded(reason: str) -> None:
+    """Record that the current request is answered with a fallback"""
+    reasons = _degraded.get()
+    if reasons is not None and reason not in reasons:
+        reasons.append(reason)
+
+def degraded_reasons() -> List[str]:
+    return list(_degraded.get() or [])
+
+@contextmanager
+def collect_degraded():
+    """Collect the degradations of the enclosed work (also seen from threads it starts), without counting them"""
+    reasons: List[str] = []
+    token = _degraded.set(reasons)
+    try:
+        yield reasons
+    finally:
+        _degraded.reset(token)
+
+@contextmanager
+def track_degraded():
+    """Collect the degradations of one response or task, counted in job_matching_degraded_responses_total"""
+    with collect_degraded() as reasons:
+        try:
+            yield reasons
+        finally:
+            for reason in reasons:
+                DEGRADED_RESPONSES.labels(reason=reason).inc()
+
+class DegradedModeMiddleware:
+    """ASGI middleware adding an X-Degraded header that lists the fallbacks used for the response"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_degraded() as reasons:
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start" and reasons:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-degraded", ", ".join(reasons).encode()))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
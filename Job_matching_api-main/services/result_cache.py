@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from models.database import CorpusState
+
+def corpus_version(db: Session) -> int:
+    """Current corpus version (0 until postings are first ingested through the pipeline)"""
+    state = db.get(CorpusState, 1)
+    return state.version if state else 0
+
+def bump_corpus_version(db: Session) -> None:
+    """Mark the postings as changed; commits with the caller's transaction"""
+    updated = db.query(CorpusState).filter(CorpusState.id == 1).update(
+        {CorpusState.version: CorpusState.version + 1}, synchronize_session=False
+    )
+    if not updated:
+        db.add(CorpusState(id=1, version=1))
+
+class InProcessBackend:
+    """Bounded LRU dict with per-entry expiry"""
+
+    def __init__(self, max_entries: int = 2000, ttl_seconds: int = 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value: bytes) -> None:
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+class RedisBackend:
+    """Entries in Redis (or any client exposing get / set(ex=)), shared by all workers and pods"""
+
+    def __init__(self, client: Any = None, url: Optional[str] = None, prefix: str = "job-matching:results:",
+                 ttl_seconds: int = 3600):
+        if client is None:
+            import redis # Optional dependency, only needed with RESULT_CACHE_BACKEND=redis
+            client = redis.Redis.from_url(url or "redis://localhost:6379/0")
+        self.client = client
+        self.prefix = prefix
+        self.ttl_seconds = ttl_seconds
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(self.prefix + key)
+
+    def set(self, key: str, value: bytes) -> None:
+        self.client.set(self.prefix + key, value, ex=self.ttl_seconds)
+
+    def clear(self) -> None:
+        # Keys embed the corpus version, so stale entries are unreachable and expire on their own
+        pass
+
+class ResultCache:
+    """Ranked (job id, score) lists keyed by query embedding, filters and corpus / index version.
+
+    A ranking cached for a larger `limit` also answers smaller ones. Any change
+    to the postings bumps the corpus version, which changes every key.
+    """
+
+    def __init__(self, backend, version_ttl_seconds: float = 5.0, max_depth: int = 500):
+        self.backend = backend
+        self.version_ttl_seconds = version_ttl_seconds
+        self.max_depth = max_depth
+        self._version: Optional[int] = None
+        self._version_checked = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> Optional["ResultCache"]:
+        """Cache selected by RESULT_CACHE_BACKEND (memory | redis | none)"""
+        backend_name = os.getenv("RESULT_CACHE_BACKEND", "memory")
+        ttl = int(os.getenv("RESULT_CACHE_TTL_SECONDS", 3600))
+        if backend_name == "none":
+            return None
+        if backend_name == "memory":
+            backend = InProcessBackend(int(os.getenv("RESULT_CACHE_MAX_ENTRIES", 2000)), ttl)
+        elif backend_name == "redis":
+            backend = RedisBackend(url=os.getenv("RESULT_CACHE_REDIS_URL"), ttl_seconds=ttl)
+        else:
+            raise ValueError(f"Unknown RESULT_CACHE_BACKEND: {backend_name}")
+        return cls(backend, float(os.getenv("RESULT_CACHE_VERSION_TTL_SECONDS", 5)),
+                   int(os.getenv("RESULT_CACHE_MAX_DEPTH", 500)))
+
+    def current_version(self, db: Session) -> int:
+        """Corpus version, re-read from the database at most every `version_ttl_seconds`"""
+        now = time.monotonic()
+        with self._lock:
+            if self._version is not None and now - self._version_checked < self.version_ttl_seconds:
+                return self._version
+        version = corpus_version(db)
+        with self._lock:
+            if self._version is not None and version != self._version:
+                self.backend.clear()
+            self._version = version
+            self._version_checked = now
+        return version
+
+    def key(self, embedding: List[float], filters: Dict[str, Any], version: int, namespace: str) -> str:
+        digest = hashlib.sha256(np.asarray(embedding, dtype=np.float32).tobytes())
+        digest.update(json.dumps([filters, version, namespace], sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    def get(self, key: str, limit: int) -> Optional[List[Tuple[str, float]]]:
+        """The top `limit` of a cached ranking, if one deep enough (or complete) is stored"""
+        raw = self.backend.get(key)
+        if raw is None:
+            return None
+        entry = json.loads(raw)
+        if limit > len(entry["ranked"]) and not entry["complete"]:
+            return None
+        return [(job_id, score) for job_id, score in entry["ranked"][:limit]]
+
+    def put(self, key: str, ranked: List[Tuple[str, float]], complete: bool = False) -> None:
+        """Store a ranking, unless a deeper one is already cached; `complete` when it holds every match"""
+        raw = self.backend.get(key)
+        if raw is not None and len(json.loads(raw)["ranked"]) >= len(ranked):
+            return
+        self.backend.set(key, json.dumps({
+            "ranked": [[job_id, float(score)] for job_id, score in ranked[:self.max_depth]],
+            "complete": complete and len(ranked) <= self.max_depth,
+        }).encode())
@@ -0,0 +1,51 @@
+import asyncio
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, Dict, List, Tuple, TypeVar
+
+from services.metrics import add_stages, collect_stages
+from services.resilience import collect_degraded, mark_degraded
+
+T = TypeVar("T")
+
+def request_key(content: bytes, **params: Any) -> str:
+    """Hash of the uploaded bytes plus the request parameters"""
+    digest = hashlib.sha256(content)
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+async def _collecting(fn: Callable[[], Awaitable[T]]) -> Tuple[T, List[Tuple[str, float]], List[str]]:
+    # Collected apart from the starting request, then added to the context of every caller
+    with collect_stages() as timings, collect_degraded() as reasons:
+        result = await fn()
+    return result, timings, reasons
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key onto one in-flight computation.
+
+    The computation runs as its own task, so it keeps going for the callers that
+    share it even if the request that started it is cancelled. Only calls that
+    overlap are coalesced; nothing is cached once the computation finishes.
+    Every caller gets the computation's Server-Timing stages and degradations
+    (X-Degraded) in its own request, not only the one that started it.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """Return (result, shared): shared is True when another caller's computation was reused"""
+        task = self._calls.get(key)
+        shared = task is not None
+        if not shared:
+            task = asyncio.ensure_future(_collecting(fn))
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._calls.pop(key) if self._calls.get(key) is done else None)
+        result, timings, reasons = await asyncio.shield(task)
+        add_stages(timings)
+        for reason in reasons:
+            mark_degraded(reason)
+        return result, shared
@@ -0,0 +1,240 @@
+"""Typeahead suggestions for job titles, companies and skills.
+
+Terms are read from the postings once, counted, and kept in one sorted array of
+word-start keys per kind ("data engineer" is found by "dat" and by "eng"). A
+prefix is looked up with bisect, and the most frequent terms of the matching
+range are returned. Wide ranges (short prefixes) are answered from top-k lists
+precomputed at build time, so no request scans more than a few hundred keys.
+"""
+import os
+import re
+import time
+import unicodedata
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from models.database import JobPosting
+from services.rebuild import VersionedSlot
+from services.result_cache import corpus_version
+
+KINDS = ("title", "company", "skill")
+
+# Skills recognised in the qualification and description texts (extend with SUGGEST_SKILLS_FILE, one per line).
+# Names that are also common words ("Go", "R", "Express", "REST") are left out or spelled unambiguously.
+SKILLS = [
+    # Languages
+    "Python", "Java", "JavaScript", "TypeScript", "Golang", "Rust", "C++", "C#", "Ruby", "PHP", "Scala", "Kotlin",
+    "Swift", "Objective-C", "MATLAB", "Julia", "Perl", "Bash", "PowerShell", "SQL", "PL/SQL", "T-SQL", "Dart",
+    "Elixir", "Haskell", "Lua", "COBOL", "Fortran", "VBA", "Solidity", "HTML", "CSS", "Sass", "GraphQL",
+    # Frameworks and libraries
+    "React", "React Native", "Angular", "Vue.js", "Next.js", "Node.js", "Express.js", "NestJS", "Svelte", "jQuery",
+    "Django", "Flask", "FastAPI", "Spring Boot", "Hibernate", ".NET", "ASP.NET", "Entity Framework",
+    "Ruby on Rails", "Laravel", "Symfony", "Flutter", "Xamarin", "Unity", "Unreal Engine", "Qt", "Electron",
+    "Pandas", "NumPy", "SciPy", "scikit-learn", "TensorFlow", "PyTorch", "Keras", "XGBoost", "LightGBM",
+    "Hugging Face", "LangChain", "OpenCV", "spaCy", "NLTK", "Matplotlib", "Plotly", "Redux", "Tailwind CSS",
+    "Bootstrap", "Jest", "Cypress", "Selenium", "Playwright", "JUnit", "pytest", "Mockito",
+    # Data and storage
+    "PostgreSQL", "MySQL", "MariaDB", "SQL Server", "Oracle", "SQLite", "MongoDB", "Cassandra", "Redis",
+    "Elasticsearch", "OpenSearch", "DynamoDB", "Cosmos DB", "Neo4j", "Snowflake", "BigQuery", "Redshift",
+    "Databricks", "Spark", "PySpark", "Hadoop", "Hive", "Kafka", "RabbitMQ", "Airflow", "dbt", "Flink",
+    "Talend", "Informatica", "SSIS", "Power BI", "Tableau", "Looker", "Qlik", "Excel", "ETL", "Data Warehouse",
+    "Data Lake", "Data Modeling",
+    # Cloud and operations
+    "AWS", "Azure", "GCP", "Google Cloud", "Docker", "Kubernetes", "OpenShift", "Helm", "Terraform", "Ansible",
+    "Puppet", "Jenkins", "GitLab CI", "GitHub Actions", "Azure DevOps", "CI/CD", "Git", "Linux", "Unix",
+    "Windows Server", "Nginx", "Prometheus", "Grafana", "Datadog", "Splunk", "ELK", "Serverless",
+    "AWS Lambda", "Microservices", "REST API", "RESTful", "gRPC", "SOAP", "OAuth", "DevOps", "MLOps", "SRE",
+    "Networking", "TCP/IP", "VMware", "Active Directory", "Cybersecurity", "SIEM", "Penetration Testing", "ISO 27001",
+    # Practices and domains
+    "Machine Learning", "Deep Learning", "NLP", "Computer Vision", "LLM", "Generative AI", "Data Science",
+    "Data Analysis", "Data Engineering", "Statistics", "A/B Testing", "Agile", "Scrum", "Kanban", "TDD",
+    "UML", "Design Patterns", "System Design", "Product Management", "Project Management", "UX", "UI Design",
+    "Figma", "Sketch", "Adobe XD", "Photoshop", "Illustrator", "SEO", "SEM", "Google Analytics", "Salesforce",
+    "SAP", "ERP", "CRM", "Jira", "Confluence", "ITIL", "PMP", "Six Sigma", "Embedded Systems",
+    "FPGA", "PLC", "AutoCAD", "SolidWorks", "CATIA", "Blockchain", "IoT", "Mobile Development", "iOS", "Android",
+    # Soft skills
+    "Communication", "Leadership", "Teamwork", "Problem Solving", "Stakeholder Management", "Mentoring",
+    "Negotiation", "Public Speaking",
+]
+
+_NON_TERM_RE = re.compile(r"[^a-z0-9+#./ -]+")
+_SPACES_RE = re.compile(r"\s+")
+# Gender markers and bracketed notes in titles: "Data Engineer (H/F)", "Entwickler (m/w/d)", "[CDI]"
+_TITLE_NOISE_RE = re.compile(r"\(.*?\)|\[.*?\]|\b(?:h\s*/\s*f|f\s*/\s*h|m\s*/\s*f|m\s*/\s*w\s*/\s*d)\b", re.I)
+# Title suffixes after a separator are usually a location or team: "Data Engineer - Paris"
+_TITLE_SUFFIX_RE = re.compile(r"\s+[-|–—@]\s+.*$")
+_MAX_SKILL_WORDS = 3
+
+def normalize(text: str) -> str:
+    """Lowercase, accent-free, single-spaced form used for keys and queries"""
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+    return _SPACES_RE.sub(" ", _NON_TERM_RE.sub(" ", text.lower())).strip()
+
+def clean_title(title: Optional[str]) -> Optional[str]:
+    """Display form of a job title without gender markers, brackets and location suffixes"""
+    if not title:
+        return None
+    title = _TITLE_SUFFIX_RE.sub("", _TITLE_NOISE_RE.sub(" ", title))
+    title = _SPACES_RE.sub(" ", title).strip(" -,/|")
+    return title or None
+
+def load_skills() -> Dict[str, str]:
+    """Normalised skill -> display name, including SUGGEST_SKILLS_FILE entries"""
+    skills = list(SKILLS)
+    path = os.getenv("SUGGEST_SKILLS_FILE")
+    if path:
+        with open(path, encoding="utf-8") as f:
+            skills.extend(line.strip() for line in f if line.strip())
+    return {normalize(skill): skill for skill in skills if normalize(skill)}
+
+def find_skills(text: str, skills: Dict[str, str]) -> set:
+    """Normalised skills mentioned in `text` (1- to 3-word phrases looked up in the vocabulary)"""
+    words = [word.rstrip(".-/") or word for word in normalize(text).split()] # Sentence ends, keeping ".net"
+    found = set()
+    for i in range(len(words)):
+        for n in range(1, min(_MAX_SKILL_WORDS, len(words) - i) + 1):
+            phrase = " ".join(words[i:i + n])
+            if phrase in skills:
+                found.add(phrase)
+    return found
+
+class _PrefixTable:
+    """Terms of one kind, sorted by word-start keys; term ids are ranks by frequency (0 = most frequent)"""
+
+    def __init__(self, terms: Dict[str, Tuple[str, int]], max_limit: int, wide_range: int):
+        ordered = sorted(terms.items(), key=lambda item: (-item[1][1], item[0]))
+        self.texts = [display for _, (display, _) in ordered]
+        self.counts = np.array([count for _, (_, count) in ordered], dtype=np.int32)
+        pairs = []
+        for term_id, (key, _) in enumerate(ordered):
+            words = key.split(" ")
+            for start in range(len(words)):
+                pairs.append((" ".join(words[start:]), term_id))
+        pairs.sort()
+        self.keys = [key for key, _ in pairs]
+        self.ids = np.array([term_id for _, term_id in pairs], dtype=np.int32)
+        self.max_limit = max_limit
+        self._top: Dict[str, np.ndarray] = {}
+        self._precompute(wide_range)
+
+    def _precompute(self, wide_range: int) -> None:
+        # Prefixes matching more than `wide_range` keys get their best term ids stored, level by level
+        keys, ranges, length = self.keys, [(0, len(self.keys))], 1
+        while ranges:
+            wide = []
+            for lo, hi in ranges:
+                i = lo
+                while i < hi:
+                    if len(keys[i]) < length:
+                        i += 1 # A shorter key is already covered by its parent prefix
+                        continue
+                    prefix = keys[i][:length]
+                    j = bisect_left(keys, prefix + "\U0010ffff", i, hi)
+                    if j - i > wide_range:
+                        self._top[prefix] = np.unique(self.ids[i:j])[:self.max_limit]
+                        wide.append((i, j))
+                    i = j
+            ranges, length = wide, length + 1
+
+    def search(self, prefix: str, limit: int) -> List[int]:
+        """Ids of the `limit` most frequent terms with a word starting with `prefix`"""
+        top = self._top.get(prefix)
+        if top is None:
+            lo = bisect_left(self.keys, prefix)
+            hi = bisect_left(self.keys, prefix + "\U0010ffff", lo)
+            top = np.unique(self.ids[lo:hi]) # Sorted ids are frequency order, duplicates removed
+        return top[:limit].tolist()
+
+class SuggestIndex:
+    """In-memory prefix index over normalised job titles, companies and skills, weighted by posting count.
+
+    Rebuilt in the background by the RebuildOrchestrator when the corpus version
+    (bumped by every ingestion batch) changes, checked every SUGGEST_REFRESH_SECONDS.
+    """
+
+    def __init__(self, max_limit: int = 50, wide_range: Optional[int] = None, refresh_seconds: Optional[int] = None):
+        self.max_limit = max_limit
+        self.wide_range = wide_range or int(os.getenv("SUGGEST_WIDE_RANGE", 256))
+        self.refresh_seconds = refresh_seconds or int(os.getenv("SUGGEST_REFRESH_SECONDS", 60))
+        self.skills = load_skills()
+        self.slot: VersionedSlot[Dict[str, _PrefixTable]] = VersionedSlot("suggest_index") # Tables by kind
+
+    @property
+    def ready(self) -> bool:
+        return self.slot.value is not None
+
+    def build(self, db: Session) -> None:
+        """Build a generation and serve it (start-up; later rebuilds go through the orchestrator)"""
+        self.slot.swap(*self.build_generation(db))
+
+    def build_generation(self, db: Session, batch_size: int = 5000) -> Tuple[Dict[str, _PrefixTable], str]:
+        """Count the terms of every posting (keyset-paginated by id) into new tables, with their corpus version"""
+        start = time.perf_counter()
+        version = str(corpus_version(db))
+        terms: Dict[str, Dict[str, List]] = {kind: {} for kind in KINDS}
+
+        def add(kind: str, key: str, display: str) -> None:
+            entry = terms[kind].get(key)
+            if entry is None:
+                terms[kind][key] = [display, 1]
+            else:
+                entry[1] += 1
+
+        query = db.query(JobPosting.id, JobPosting.job_title, JobPosting.company, JobPosting.required_qualifications,
+                         JobPosting.preferred_qualifications, JobPosting.key_responsibilities,
+                         JobPosting.job_description).order_by(JobPosting.id)
+        last_id = None
+        postings = 0
+        while True:
+            page = query if last_id is None else query.filter(JobPosting.id > last_id)
+            rows = page.limit(batch_size).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            postings += len(rows)
+            for row in rows:
+                title = clean_title(row.job_title)
+                if title and normalize(title):
+                    add("title", normalize(title), title)
+                company = (row.company or "").strip()
+                if company and normalize(company):
+                    add("company", normalize(company), company)
+                text = " ".join(filter(None, (row.required_qualifications, row.preferred_qualifications,
+                                               row.key_responsibilities, row.job_description, row.job_title)))
+                for skill in find_skills(text, self.skills):
+                    add("skill", skill, self.skills[skill])
+
+        tables = {kind: _PrefixTable({key: (display, count) for key, (display, count) in entries.items()},
+                                     self.max_limit, self.wide_range)
+                  for kind, entries in terms.items()}
+        sizes = ", ".join(f"{kind}={len(table.texts)}" for kind, table in tables.items())
+        print(f"Built suggestion index from {postings} postings (terms: {sizes}) in {time.perf_counter() - start:.1f}s")
+        return tables, version
+
+    def validate(self, tables: Dict[str, _PrefixTable]) -> None:
+        """Sample queries: the first word of each kind's most frequent term must suggest that term"""
+        for kind, table in tables.items():
+            if table.texts and 0 not in table.search(table.keys[np.flatnonzero(table.ids == 0)[0]].split(" ")[0], 1):
+                raise ValueError(f"most frequent {kind} {table.texts[0]!r} is not suggested")
+
+    def suggest(self, query: str, limit: int = 10, kinds: Sequence[str] = KINDS) -> List[Dict[str, object]]:
+        """Most frequent terms with a word starting with `query`, across `kinds`"""
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        with self.slot.acquire() as tables:
+            return self._suggest(tables, prefix, limit, kinds) if tables is not None else []
+
+    def _suggest(self, tables: Dict[str, _PrefixTable], prefix: str, limit: int,
+                 kinds: Sequence[str]) -> List[Dict[str, object]]:
+        limit = min(limit, self.max_limit)
+        candidates = []
+        for kind in kinds:
+            table = tables[kind]
+            for term_id in table.search(prefix, limit):
+                candidates.append((int(table.counts[term_id]), kind, table.texts[term_id]))
+        candidates.sort(key=lambda item: -item[0]) # Stable: ties keep the kind order
+        return [{"text": text, "kind": kind, "count": count} for count, kind, text in candidates[:limit]]
@@ -0,0 +1,413 @@
+"""Submit/poll task queue for long-running CV matches.
+
+A submitted task gets an id right away; a bounded pool of asyncio workers runs
+tasks by priority, and clients poll for the result or receive it on a webhook.
+Task state lives in a pluggable backend (TASK_QUEUE_BACKEND):
+
+    memory   in-process (default); queued tasks are lost on restart
+    sqlite   TASK_QUEUE_SQLITE_PATH; queued and interrupted tasks survive restarts
+    pkg.module:Class   any class implementing TaskBackend
+"""
+import asyncio
+import hashlib
+from abc import ABC, abstractmethod
+import heapq
+import hmac
+import importlib
+import ipaddress
+import itertools
+import json
+import os
+import secrets
+import socket
+import sqlite3
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlparse
+
+import httpx
+
+from services.metrics import TASK_QUEUE_DEPTH, TASKS
+from services.resilience import track_degraded
+
+# Priority names accepted by the API; higher runs first, ties in submission order
+PRIORITIES = {"low": 0, "normal": 5, "high": 9}
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+class QueueFull(Exception):
+    """Raised by submit when TASK_QUEUE_MAX_PENDING tasks are already waiting"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Task queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+class Task:
+    """One queued unit of work: JSON parameters plus an optional binary payload (the CV file)"""
+
+    def __init__(self, task_id: str, params: Dict[str, Any], priority: int = PRIORITIES["normal"],
+                 webhook_url: Optional[str] = None, created_at: Optional[float] = None):
+        self.task_id = task_id
+        self.params = params
+        self.priority = priority
+        self.webhook_url = webhook_url
+        self.status = QUEUED
+        self.created_at = created_at or time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.degraded: Optional[List[str]] = None # Fallbacks used while running (services/resilience.py)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "task_id": self.task_id,
+            "status": self.status,
+            "priority": self.priority,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+            "degraded": self.degraded,
+        }
+
+class TaskBackend(ABC):
+    """Storage and ordering of tasks. Methods are blocking; the queue calls them from a thread."""
+
+    @abstractmethod
+    def put(self, task: Task, payload: bytes) -> None:
+        ...
+
+    @abstractmethod
+    def claim(self) -> Optional[Tuple[Task, bytes]]:
+        """Mark the highest-priority queued task as running and return it with its payload"""
+
+    @abstractmethod
+    def finish(self, task: Task) -> None:
+        """Store a finished task's status, result and error (its payload is no longer needed)"""
+
+    @abstractmethod
+    def get(self, task_id: str) -> Optional[Task]:
+        ...
+
+    @abstractmethod
+    def pending(self) -> int:
+        """Number of queued tasks"""
+
+    @abstractmethod
+    def expire(self, before: float) -> None:
+        """Drop finished tasks that finished before `before`"""
+
+    def requeue_running(self) -> int:
+        """Put tasks left running by a previous process back in the queue"""
+        return 0
+
+class MemoryTaskBackend(TaskBackend):
+    """Dict of tasks plus a priority heap of the queued ones"""
+
+    def __init__(self):
+        self._tasks: Dict[str, Task] = {}
+        self._payloads: Dict[str, bytes] = {}
+        self._heap: List[Tuple[int, int, str]] = []
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+
+    def put(self, task: Task, payload: bytes) -> None:
+        with self._lock:
+            self._tasks[task.task_id] = task
+            self._payloads[task.task_id] = payload
+            heapq.heappush(self._heap, (-task.priority, next(self._order), task.task_id))
+
+    def claim(self) -> Optional[Tuple[Task, bytes]]:
+        with self._lock:
+            while self._heap:
+                _, _, task_id = heapq.heappop(self._heap)
+                task = self._tasks.get(task_id)
+                if task is not None and task.status == QUEUED:
+                    task.status, task.started_at = RUNNING, time.time()
+                    return task, self._payloads.pop(task_id, b"")
+            return None
+
+    def finish(self, task: Task) -> None:
+        with self._lock:
+            self._tasks[task.task_id] = task
+
+    def get(self, task_id: str) -> Optional[Task]:
+        with self._lock:
+            return self._tasks.get(task_id)
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._heap)
+
+    def expire(self, before: float) -> None:
+        with self._lock:
+            for task_id in [task_id for task_id, task in self._tasks.items()
+                            if task.finished_at is not None and task.finished_at < before]:
+                del self._tasks[task_id]
+
+class SQLiteTaskBackend(TaskBackend):
+    """Tasks in one SQLite table, so queued work survives a restart of the API process"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("TASK_QUEUE_SQLITE_PATH", "tasks.db")
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                task_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                priority INTEGER NOT NULL,
+                params TEXT NOT NULL,
+                payload BLOB,
+                webhook_url TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                result TEXT,
+                error TEXT,
+                degraded TEXT
+            )""")
+        if "degraded" not in {row[1] for row in self._conn.execute("PRAGMA table_info(tasks)")}:
+            self._conn.execute("ALTER TABLE tasks ADD COLUMN degraded TEXT") # Files created before the column existed
+        # Serves claim(): next queued task by priority, then age
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_tasks_queue ON tasks (status, priority DESC, created_at)")
+        self._lock = threading.Lock()
+
+    def _task(self, row) -> Task:
+        task = Task(row[0], json.loads(row[3]), row[2], row[5], row[6])
+        task.status, task.started_at, task.finished_at = row[1], row[7], row[8]
+        task.result = json.loads(row[9]) if row[9] is not None else None
+        task.error = row[10]
+        task.degraded = json.loads(row[11]) if row[11] else None
+        return task
+
+    def put(self, task: Task, payload: bytes) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO tasks (task_id, status, priority, params, payload, webhook_url, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (task.task_id, task.status, task.priority, json.dumps(task.params), payload,
+                 task.webhook_url, task.created_at))
+
+    def claim(self) -> Optional[Tuple[Task, bytes]]:
+        with self._lock:
+            while True:
+                row = self._conn.execute(
+                    "SELECT task_id, status, priority, params, payload, webhook_url, created_at FROM tasks "
+                    "WHERE status = ? ORDER BY priority DESC, created_at LIMIT 1", (QUEUED,)).fetchone()
+                if row is None:
+                    return None
+                started_at = time.time()
+                # The status guard makes the claim atomic when several processes share the file
+                if self._conn.execute("UPDATE tasks SET status = ?, started_at = ? WHERE task_id = ? AND status = ?",
+                                      (RUNNING, started_at, row[0], QUEUED)).rowcount:
+                    break
+        task = Task(row[0], json.loads(row[3]), row[2], row[5], row[6])
+        task.status, task.started_at = RUNNING, started_at
+        return task, row[4] or b""
+
+    def finish(self, task: Task) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE tasks SET status = ?, finished_at = ?, result = ?, error = ?, degraded = ?, payload = NULL "
+                "WHERE task_id = ?",
+                (task.status, task.finished_at, json.dumps(task.result) if task.result is not None else None,
+                 task.error, json.dumps(task.degraded) if task.degraded else None, task.task_id))
+
+    def get(self, task_id: str) -> Optional[Task]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT task_id, status, priority, params, NULL, webhook_url, created_at, started_at, finished_at, "
+                "result, error, degraded FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+        return self._task(row) if row else None
+
+    def pending(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM tasks WHERE status = ?", (QUEUED,)).fetchone()[0]
+
+    def expire(self, before: float) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM tasks WHERE finished_at IS NOT NULL AND finished_at < ?", (before,))
+
+    def requeue_running(self) -> int:
+        with self._lock:
+            return self._conn.execute("UPDATE tasks SET status = ?, started_at = NULL WHERE status = ?",
+                                      (QUEUED, RUNNING)).rowcount
+
+def open_task_backend() -> TaskBackend:
+    """The backend selected by TASK_QUEUE_BACKEND (memory | sqlite | module:Class)"""
+    name = os.getenv("TASK_QUEUE_BACKEND", "memory")
+    if name == "memory":
+        return MemoryTaskBackend()
+    if name == "sqlite":
+        return SQLiteTaskBackend()
+    if ":" in name:
+        module, _, cls = name.partition(":")
+        return getattr(importlib.import_module(module), cls)()
+    raise ValueError(f"Unknown TASK_QUEUE_BACKEND: {name}")
+
+def _resolve(host: str, port: int) -> List[str]:
+    return sorted({info[4][0] for info in socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)})
+
+def _is_public(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split("%")[0]) # Drop an IPv6 zone id
+    if ip.version == 6 and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+def webhook_address(url: str) -> Optional[str]:
+    """Address a webhook must be delivered to (None: a TASK_WEBHOOK_ALLOWED_HOSTS host, resolved as usual).
+
+    Without an allowlist, the host is resolved and rejected when any of its
+    addresses is loopback, private, link-local or otherwise not public, so API
+    callers cannot make the workers POST to internal services.
+    """
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        raise ValueError("webhook_url must be an http(s) URL")
+    allowed = os.getenv("TASK_WEBHOOK_ALLOWED_HOSTS")
+    if allowed:
+        if parsed.hostname not in {host.strip() for host in allowed.split(",")}:
+            raise ValueError(f"webhook host {parsed.hostname} is not allowed")
+        return None
+    try:
+        addresses = _resolve(parsed.hostname, parsed.port or (443 if parsed.scheme == "https" else 80))
+    except (OSError, UnicodeError) as e:
+        raise ValueError(f"webhook host {parsed.hostname} cannot be resolved: {e}") from e
+    if not addresses or not all(_is_public(address) for address in addresses):
+        raise ValueError(f"webhook host {parsed.hostname} does not resolve to a public address")
+    return addresses[0]
+
+def validate_webhook_url(url: str) -> str:
+    """Reject non-HTTP(S) URLs and hosts webhooks may not be sent to (see webhook_address; resolves DNS)"""
+    webhook_address(url)
+    return url
+
+class TaskQueue:
+    """Bounded worker pool over a TaskBackend.
+
+    `handler(params, payload)` does the work and returns a JSON-serialisable
+    result. At most TASK_QUEUE_WORKERS tasks run at once; submit raises QueueFull
+    once TASK_QUEUE_MAX_PENDING tasks are waiting, with a retry delay estimated
+    from recent task durations. Finished tasks are kept for TASK_RESULT_TTL_SECONDS.
+    """
+
+    def __init__(self, handler: Callable[[Dict[str, Any], bytes], Awaitable[Any]],
+                 backend: Optional[TaskBackend] = None, workers: Optional[int] = None,
+                 max_pending: Optional[int] = None, result_ttl: Optional[int] = None):
+        self.handler = handler
+        self.backend = backend or open_task_backend()
+        self.workers = workers or int(os.getenv("TASK_QUEUE_WORKERS", 4))
+        self.max_pending = max_pending or int(os.getenv("TASK_QUEUE_MAX_PENDING", 100))
+        self.result_ttl = result_ttl or int(os.getenv("TASK_RESULT_TTL_SECONDS", 3600))
+        self.webhook_secret = os.getenv("TASK_WEBHOOK_SECRET")
+        self.webhook_attempts = int(os.getenv("TASK_WEBHOOK_ATTEMPTS", 3))
+        self._avg_seconds = 10.0 # Moving average of task durations, for Retry-After
+        self._wakeup: Optional[asyncio.Event] = None
+        self._workers: List[asyncio.Task] = []
+        self._notifications: Set[asyncio.Task] = set()
+        self._http: Optional[httpx.AsyncClient] = None
+
+    async def start(self) -> None:
+        self._wakeup = asyncio.Event()
+        self._http = httpx.AsyncClient(timeout=10.0)
+        requeued = await asyncio.to_thread(self.backend.requeue_running)
+        if requeued:
+            print(f"Requeued {requeued} tasks interrupted by the previous shutdown")
+            TASK_QUEUE_DEPTH.inc(requeued)
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        if requeued:
+            self._wakeup.set()
+
+    async def stop(self) -> None:
+        for worker in self._workers + list(self._notifications):
+            worker.cancel()
+        await asyncio.gather(*self._workers, *self._notifications, return_exceptions=True)
+        self._workers = []
+        if self._http is not None:
+            await self._http.aclose()
+
+    async def submit(self, params: Dict[str, Any], payload: bytes = b"", priority: int = PRIORITIES["normal"],
+                     webhook_url: Optional[str] = None) -> Task:
+        """Queue a task and return it immediately (QueueFull when the queue is at capacity)"""
+        pending = await asyncio.to_thread(self.backend.pending)
+        if pending >= self.max_pending:
+            TASKS.labels(status="rejected").inc()
+            raise QueueFull(max(1, int(pending / self.workers * self._avg_seconds)))
+        task = Task(secrets.token_urlsafe(16), params, priority, webhook_url)
+        await asyncio.to_thread(self.backend.put, task, payload)
+        await asyncio.to_thread(self.backend.expire, time.time() - self.result_ttl)
+        TASK_QUEUE_DEPTH.inc()
+        TASKS.labels(status=QUEUED).inc()
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return task
+
+    async def get(self, task_id: str) -> Optional[Task]:
+        return await asyncio.to_thread(self.backend.get, task_id)
+
+    async def _work(self) -> None:
+        while True:
+            claimed = await asyncio.to_thread(self.backend.claim)
+            if claimed is None:
+                self._wakeup.clear()
+                # Also polls, for tasks put into a shared backend by another process
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=1.0)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            TASK_QUEUE_DEPTH.dec()
+            task, payload = claimed
+            try:
+                with track_degraded() as degraded:
+                    task.result = await self.handler(task.params, payload)
+                task.status, task.degraded = SUCCEEDED, degraded or None
+            except asyncio.CancelledError:
+                raise # Left running; the SQLite backend requeues it on the next start
+            except Exception as e:
+                print(f"Task {task.task_id} failed: {e}")
+                task.status, task.error = FAILED, str(e)
+            task.finished_at = time.time()
+            self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * (task.finished_at - task.started_at)
+            await asyncio.to_thread(self.backend.finish, task)
+            TASKS.labels(status=task.status).inc()
+            if task.webhook_url:
+                # Delivered in the background so slow receivers and retries do not hold a worker
+                notification = asyncio.create_task(self._notify(task))
+                self._notifications.add(notification)
+                notification.add_done_callback(self._notifications.discard)
+
+    async def _notify(self, task: Task) -> None:
+        """POST the finished task to its webhook, retrying with backoff; signed when TASK_WEBHOOK_SECRET is set"""
+        body = json.dumps(task.to_dict()).encode()
+        headers = {"Content-Type": "application/json"}
+        if self.webhook_secret:
+            digest = hmac.new(self.webhook_secret.encode(), body, hashlib.sha256).hexdigest()
+            headers["X-Signature-SHA256"] = digest
+        url = httpx.URL(task.webhook_url)
+        for attempt in range(self.webhook_attempts):
+            try:
+                # Checked again at delivery and the connection pinned to the checked address, so a DNS
+                # answer that changed since submission (rebinding) cannot redirect the POST
+                address = await asyncio.to_thread(webhook_address, task.webhook_url)
+            except ValueError as e:
+                print(f"Webhook for task {task.task_id} not delivered: {e}")
+                return
+            target, extensions = url, {}
+            if address is not None:
+                target = url.copy_with(host=address)
+                extensions = {"sni_hostname": url.host} # TLS still verifies the certificate of the named host
+            try:
+                response = await self._http.post(target, content=body, headers={**headers, "Host": url.netloc.decode()},
+                                                  extensions=extensions)
+                if response.status_code < 500:
+                    return
+                print(f"Webhook for task {task.task_id} returned {response.status_code}")
+            except httpx.HTTPError as e:
+                print(f"Webhook for task {task.task_id} failed: {e}")
+            if attempt + 1 < self.webhook_attempts:
+                await asyncio.sleep(2 ** attempt)
@@ -0,0 +1,84 @@
+import os
+import re
+from collections import Counter
+from typing import Optional
+
+_TABLE_SEPARATOR_RE = re.compile(r"^\s*\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)*\|?\s*$")
+_PAGE_NUMBER_RE = re.compile(r"^(page\s*)?\d+(\s*(/|of|sur)\s*\d+)?$", re.IGNORECASE)
+_BOILERPLATE_RE = re.compile(
+    r"^(curriculum vitae|cv|r[ée]sum[ée]|references? (are )?available (up)?on request|"
+    r"r[ée]f[ée]rences? disponibles? sur demande)\.?$",
+    re.IGNORECASE,
+)
+_IMAGE_RE = re.compile(r"!\[[^\]]*\]\([^)]*\)")
+_LINK_RE = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+_URL_RE = re.compile(r"(https?://|www\.)\S+", re.IGNORECASE)
+_EMAIL_RE = re.compile(r"\S+@\S+\.\w+")
+_PHONE_RE = re.compile(r"\+?\d[\d .()-]{7,}\d")
+_MARKUP_RE = re.compile(r"[*_`#>]+|<[^>]+>")
+_SPACE_RE = re.compile(r"[ \t ]+")
+
+# Lines up to this length that occur more than once are treated as page headers / footers
+_REPEATED_LINE_MAX_CHARS = 80
+
+def clean_cv_markdown(text: str) -> str:
+    """Strip layout noise from pymupdf4llm markdown, keeping the CV's content words.
+
+    Drops repeated page headers/footers, page numbers, images, contact details,
+    URLs and stock phrases; table rows are flattened to their cell text.
+    """
+    lines = [_SPACE_RE.sub(" ", line).strip() for line in text.splitlines()]
+    counts = Counter(line.lower() for line in lines if line and len(line) <= _REPEATED_LINE_MAX_CHARS)
+    seen = set()
+    cleaned = []
+    for line in lines:
+        if not line or _TABLE_SEPARATOR_RE.match(line):
+            continue
+        key = line.lower()
+        if counts.get(key, 0) > 1:
+            if key in seen:
+                continue
+            seen.add(key)
+        if line.startswith("|"):
+            line = " ".join(cell.strip() for cell in line.strip("|").split("|") if cell.strip())
+        line = _IMAGE_RE.sub(" ", line)
+        line = _LINK_RE.sub(r"\1", line)
+        line = _URL_RE.sub(" ", line)
+        line = _EMAIL_RE.sub(" ", line)
+        # Date ranges like 2016-2019 have 8 digits; phone numbers have at least 9
+        line = _PHONE_RE.sub(lambda m: " " if sum(c.isdigit() for c in m.group()) >= 9 else m.group(), line)
+        line = _SPACE_RE.sub(" ", _MARKUP_RE.sub(" ", line)).strip(" -•·|")
+        if not line or _PAGE_NUMBER_RE.match(line) or _BOILERPLATE_RE.match(line):
+            continue
+        cleaned.append(line)
+    return "\n".join(cleaned)
+
+_encoding = None
+
+def get_encoding():
+    """The embedding model's tokenizer, or None when tiktoken or its data is unavailable"""
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding(os.getenv("EMBEDDING_TOKENIZER", "cl100k_base"))
+        except Exception as e:
+            print(f"Tokenizer unavailable, estimating tokens from characters: {e}")
+            _encoding = False
+    return _encoding or None
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Cut `text` to at most `max_tokens` embedding tokens (about 4 characters per token without tiktoken)"""
+    encoding = get_encoding()
+    if encoding is None:
+        return text[:max_tokens * 4]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+def prepare_cv_text(text: str, max_tokens: Optional[int] = None) -> str:
+    """Cleaned CV text, cut to FAST_MODE_MAX_TOKENS when set (longer texts are otherwise embedded in chunks)"""
+    max_tokens = max_tokens or int(os.getenv("FAST_MODE_MAX_TOKENS", 0))
+    text = clean_cv_markdown(text)
+    return truncate_tokens(text, max_tokens) if max_tokens else text
@@ -0,0 +1,49 @@
+import asyncio
+import os
+import time
+from typing import Callable, Dict, List, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+class Warmup:
+    """Startup steps run in the background after the server starts accepting connections.
+
+    Required steps are retried until they succeed and gate readiness; optional
+    steps (cache priming) are attempted once and only logged on failure.
+    """
+
+    def __init__(self):
+        self.retry_seconds = float(os.getenv("WARMUP_RETRY_SECONDS", 5))
+        self.steps: List[Tuple[str, Callable[[], None], bool]] = []
+        self.status: Dict[str, str] = {}
+        self.started_at = time.time()
+        self.ready_at = None
+
+    def add_step(self, name: str, fn: Callable[[], None], required: bool = True) -> None:
+        self.steps.append((name, fn, required))
+        self.status[name] = "pending"
+
+    @property
+    def ready(self) -> bool:
+        return all(self.status[name] == "ok" for name, _, required in self.steps if required)
+
+    async def run(self) -> None:
+        for name, fn, required in self.steps:
+            while True:
+                start = time.perf_counter()
+                try:
+                    await run_in_threadpool(fn)
+                    self.status[name] = "ok"
+                    print(f"Warm-up step {name} done in {time.perf_counter() - start:.2f}s")
+                    break
+                except Exception as e:
+                    self.status[name] = f"error: {e}"
+                    print(f"Warm-up step {name} failed: {e}")
+                    if not required:
+                        break
+                    await asyncio.sleep(self.retry_seconds)
+        self.ready_at = time.time()
+        print(f"Warm-up finished in {self.ready_at - self.started_at:.2f}s")
+
+    def report(self) -> Dict[str, object]:
+        return {"ready": self.ready, "steps": dict(self.status)}
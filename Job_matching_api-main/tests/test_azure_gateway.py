@@ -0,0 +1,84 @@
+import threading
+
+import httpx
+import pytest
+
+from services.azure_gateway import AzureGateway, _LimitedTransport, parse_limits
+from services.metrics import AZURE_IN_FLIGHT
+
+EMBEDDINGS_URL = "https://example.invalid/openai/deployments/emb/embeddings?api-version=2024-02-01"
+
+@pytest.fixture
+def gateway(monkeypatch):
+    monkeypatch.setenv("AZURE_DEPLOYMENT_CONCURRENCY", "2")
+    monkeypatch.setenv("AZURE_DEPLOYMENT_CONCURRENCY_OVERRIDES", "gpt-4=1, unlimited=0")
+    monkeypatch.setenv("AZURE_QUEUE_TIMEOUT_SECONDS", "0.05")
+    monkeypatch.setenv("AZURE_HTTP2", "false")
+    return AzureGateway()
+
+def in_flight(deployment: str) -> float:
+    return AZURE_IN_FLIGHT.labels(deployment=deployment)._value.get()
+
+def test_parse_limits():
+    assert parse_limits("text-embedding-3-small=32, gpt-4o=4") == {"text-embedding-3-small": 32, "gpt-4o": 4}
+    assert parse_limits("") == {}
+    assert parse_limits("broken,=3,name=") == {}
+
+def test_limiter_per_deployment(gateway):
+    embeddings = gateway.limiter_for("/openai/deployments/emb/embeddings")
+    assert embeddings.limit == 2
+    assert gateway.limiter_for("/openai/deployments/emb/embeddings") is embeddings
+    assert gateway.limiter_for("/openai/deployments/gpt-4/chat/completions").limit == 1
+    assert gateway.limiter_for("/openai/deployments/unlimited/embeddings") is None
+    assert gateway.limiter_for("/openai/models") is None
+
+def test_limiter_times_out_when_full(gateway):
+    limiter = gateway.limiter_for("/openai/deployments/gpt-4/chat/completions")
+    limiter.acquire()
+    try:
+        with pytest.raises(httpx.PoolTimeout):
+            limiter.acquire()
+    finally:
+        limiter.release()
+    limiter.acquire() # The released slot is free again
+    limiter.release()
+
+def test_transport_holds_a_slot_until_the_body_is_read(gateway):
+    seen = []
+
+    def handler(request):
+        seen.append(in_flight("emb"))
+        return httpx.Response(200, json={"data": []})
+
+    before = in_flight("emb")
+    with httpx.Client(transport=_LimitedTransport(gateway, httpx.MockTransport(handler))) as client:
+        response = client.post(EMBEDDINGS_URL, json={"input": ["python"]})
+    assert response.json() == {"data": []}
+    assert seen == [before + 1]
+    assert in_flight("emb") == before
+
+def test_transport_caps_concurrent_requests(gateway):
+    release = threading.Event()
+    entered = threading.Semaphore(0)
+
+    def handler(request):
+        entered.release()
+        release.wait(5)
+        return httpx.Response(200, json={})
+
+    client = httpx.Client(transport=_LimitedTransport(gateway, httpx.MockTransport(handler)))
+    threads = [threading.Thread(target=client.post, args=(EMBEDDINGS_URL,)) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    assert entered.acquire(timeout=5) and entered.acquire(timeout=5)
+    with pytest.raises(httpx.PoolTimeout): # Both slots of the deployment are taken
+        client.post(EMBEDDINGS_URL)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert client.post(EMBEDDINGS_URL).status_code == 200
+    client.close()
+
+def test_unlimited_paths_bypass_the_limiter(gateway):
+    with httpx.Client(transport=_LimitedTransport(gateway, httpx.MockTransport(lambda r: httpx.Response(204)))) as client:
+        assert client.get("https://example.invalid/openai/models").status_code == 204
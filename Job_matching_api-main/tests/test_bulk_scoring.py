@@ -0,0 +1,101 @@
+import hashlib
+import os
+
+import numpy as np
+import pyarrow.parquet as pq
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from models.database import JobPosting
+from services.bulk_scoring import BulkScorer, top_k_blocks
+from services.job_index import JobIndex, normalize_rows
+
+def brute_force(queries, vectors, k):
+    scores = queries @ vectors.T
+    rows = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+    return rows, np.take_along_axis(scores, rows, axis=1)
+
+@pytest.mark.parametrize("block_rows", [1, 7, 50, 1000])
+@pytest.mark.parametrize("k", [1, 5, 50, 80])
+def test_top_k_blocks_matches_brute_force(block_rows, k):
+    rng = np.random.default_rng(0)
+    vectors = normalize_rows(rng.normal(size=(50, 16)).astype(np.float32))
+    queries = normalize_rows(rng.normal(size=(4, 16)).astype(np.float32))
+    rows, scores = top_k_blocks(queries, vectors, k, block_rows)
+    expected_rows, expected_scores = brute_force(queries, vectors, min(k, 50))
+    assert rows.shape == (4, min(k, 50))
+    np.testing.assert_allclose(scores, expected_scores, rtol=1e-5)
+    np.testing.assert_array_equal(rows, expected_rows) # Random scores have no ties
+
+def test_top_k_blocks_rejects_k_below_one():
+    with pytest.raises(ValueError):
+        top_k_blocks(np.ones((1, 2), dtype=np.float32), np.ones((3, 2), dtype=np.float32), 0, 10)
+
+class CVService:
+    default_mode = "fast"
+
+    def __init__(self):
+        self.prepared = []
+
+    def prepare_text(self, text, mode):
+        self.prepared.append(text)
+        return text
+
+class MatchingService:
+    embedding_deployment_name = "emb"
+
+    def embed_documents(self, texts, purpose=None):
+        return [normalize_rows(np.frombuffer(hashlib.sha256(text.encode()).digest()[:16], dtype=np.uint8)
+                               .astype(np.float32) - 128) for text in texts]
+
+@pytest.fixture
+def corpus(tmp_path):
+    engine = create_engine("sqlite://")
+    JobPosting.__table__.create(engine)
+    db = sessionmaker(bind=engine)()
+    ids = [f"job-{i}" for i in range(30)]
+    db.add_all([JobPosting(id=job_id, job_title=f"Title {job_id}", company="Acme") for job_id in ids])
+    db.commit()
+    vectors = normalize_rows(np.random.default_rng(1).normal(size=(30, 16)).astype(np.float32))
+    index = JobIndex(np.array(ids, dtype=str), vectors, version="v1", model="emb")
+    cv_dir = tmp_path / "cvs"
+    (cv_dir / "nested").mkdir(parents=True)
+    for name in ("a.md", "b.md", "nested/c.md"):
+        (cv_dir / name).write_text(f"Curriculum vitae {name}")
+    yield str(cv_dir), index, db
+    db.close()
+
+def test_run_writes_top_k_per_cv(corpus, tmp_path):
+    cv_dir, index, db = corpus
+    output = str(tmp_path / "out")
+    scorer = BulkScorer(CVService(), MatchingService(), output, top_k=3, batch_size=2, workers=1)
+    assert scorer.run(cv_dir, index, db) == 3
+    rows = pq.read_table(output).to_pylist()
+    ranks = {}
+    for row in rows:
+        ranks.setdefault(row["cv"], []).append(row["rank"])
+        assert row["job_title"] == f"Title {row['job_id']}"
+    assert ranks == {"a.md": [1, 2, 3], "b.md": [1, 2, 3], os.path.join("nested", "c.md"): [1, 2, 3]}
+    assert len(scorer._parts()) == 2 # Batches of two CVs
+
+def test_completed_resumes_an_interrupted_run(corpus, tmp_path):
+    cv_dir, index, db = corpus
+    output = str(tmp_path / "out")
+    first = BulkScorer(CVService(), MatchingService(), output, top_k=3, batch_size=2, workers=1)
+    first.run(cv_dir, index, db)
+    os.remove(os.path.join(output, "part-00001.parquet")) # Interrupted before the last batch was written
+    with open(os.path.join(output, ".part-00001.parquet.tmp"), "wb") as f:
+        f.write(b"partial") # Leftover of the interrupted write
+    assert first.completed() == {"a.md", "b.md"}
+
+    cv_service = CVService()
+    resumed = BulkScorer(cv_service, MatchingService(), output, top_k=3, batch_size=2, workers=1)
+    assert resumed.run(cv_dir, index, db) == 1
+    assert cv_service.prepared == [] # The text of c.md was cached by the first run
+    assert resumed.completed() == {"a.md", "b.md", os.path.join("nested", "c.md")}
+    assert resumed.run(cv_dir, index, db) == 0
+
+def test_top_k_must_be_positive(tmp_path):
+    with pytest.raises(ValueError):
+        BulkScorer(CVService(), MatchingService(), str(tmp_path), top_k=0)
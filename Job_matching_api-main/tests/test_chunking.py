@@ -0,0 +1,113 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from services.chunking import count_tokens, embed_chunked, pool, split_text
+from services.cv_processing import CVProcessingService
+from services.resilience import track_degraded
+from services.text_cleanup import prepare_cv_text
+
+CV = """# Jane Doe
+
+## Experience
+Data engineer at Acme since 2019. Built streaming pipelines on Kafka and Spark.
+Migrated the warehouse to dbt and mentored two junior engineers.
+
+## Skills
+Python, SQL, Airflow, Docker, Kubernetes.
+
+## Education
+MSc Computer Science, 2018.
+"""
+
+@pytest.fixture(autouse=True)
+def no_tokenizer(monkeypatch):
+    # Token counts estimated from characters (3 per token), the same with or without tiktoken's data
+    monkeypatch.setattr("services.chunking.get_encoding", lambda: None)
+
+def words(text: str) -> list:
+    return text.split()
+
+def test_short_and_empty_texts_stay_whole():
+    assert split_text("", 10) == [""]
+    assert split_text("Python and SQL", 100) == ["Python and SQL"]
+
+def test_chunks_fit_and_split_on_section_boundaries():
+    chunks = split_text(CV, 40)
+    assert len(chunks) > 1
+    assert all(count_tokens(chunk) <= 40 for chunk in chunks)
+    # Adjacent chunks do not overlap and, together, keep every word in order
+    assert [word for chunk in chunks for word in words(chunk)] == words(CV)
+    # Lines that fit are never cut, and pieces are packed back together up to the limit
+    lines = {line.strip() for line in CV.splitlines()}
+    assert all(line in lines for chunk in chunks for line in chunk.splitlines())
+    assert len(chunks) < len([line for line in lines if line])
+    # With room for a whole section, the split falls between sections
+    sections = split_text(CV, 60)
+    assert len(sections) == 2 and sections[1].startswith("## Skills")
+
+def test_unbreakable_text_is_cut_hard():
+    chunks = split_text("x" * 100, 10)
+    assert "".join(chunks) == "x" * 100
+    assert all(count_tokens(chunk) <= 10 for chunk in chunks)
+
+class Embeddings:
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, texts):
+        self.batches.append(list(texts))
+        return [[len(text), 1.0] for text in texts]
+
+def test_embed_chunked_batches_every_chunk_and_weights_by_tokens():
+    embed = Embeddings()
+    (short_vectors, short_weights), (long_vectors, long_weights) = embed_chunked(embed, ["Python", CV], 40)
+    assert len(embed.batches) == 1 # One call for all chunks of all texts
+    assert short_vectors.shape == (1, 2) and short_weights.tolist() == [1.0]
+    assert len(long_vectors) == len(split_text(CV, 40))
+    assert long_weights.tolist() == [count_tokens(chunk) for chunk in split_text(CV, 40)]
+    np.testing.assert_allclose(np.linalg.norm(long_vectors, axis=1), 1.0, rtol=1e-5)
+
+def test_pool_is_the_token_weighted_mean():
+    vectors = np.array([[1.0, 0.0], [0.0, 1.0]], dtype=np.float32)
+    np.testing.assert_allclose(pool(vectors, np.array([3.0, 1.0])), [0.75, 0.25])
+    np.testing.assert_array_equal(pool(vectors[:1], np.array([1.0])), vectors[0])
+
+class FailingChat:
+    def __init__(self):
+        self.calls = 0
+        self.chat = self
+        self.completions = self
+
+    def create(self, **kwargs):
+        self.calls += 1
+        raise RuntimeError("deployment unavailable")
+
+def test_fast_mode_embeds_the_cleaned_text_without_gpt(monkeypatch):
+    monkeypatch.delenv("FAST_MODE_MAX_TOKENS", raising=False)
+    client = FailingChat()
+    service = CVProcessingService(openai_client=client)
+    text = asyncio.run(service.process_cv_content(CV.encode(), "cv.md", mode="fast"))
+    assert text == prepare_cv_text(CV) and "Kafka" in text
+    assert client.calls == 0
+
+def test_missing_summary_falls_back_to_the_cleaned_text(monkeypatch):
+    monkeypatch.setenv("CV_SUMMARY_FALLBACK", "true")
+    monkeypatch.delenv("FAST_MODE_MAX_TOKENS", raising=False)
+    service = CVProcessingService(openai_client=FailingChat())
+
+    async def process():
+        with track_degraded() as reasons:
+            text = await service.process_cv_content(CV.encode(), "cv.md", mode="summary")
+        return text, reasons
+
+    text, reasons = asyncio.run(process())
+    assert text == prepare_cv_text(CV)
+    assert reasons == ["cv_summary"]
+
+def test_summary_failure_raises_without_the_fallback(monkeypatch):
+    monkeypatch.setenv("CV_SUMMARY_FALLBACK", "false")
+    service = CVProcessingService(openai_client=FailingChat())
+    with pytest.raises(Exception, match="deployment unavailable"):
+        asyncio.run(service.process_cv_content(CV.encode(), "cv.md", mode="summary"))
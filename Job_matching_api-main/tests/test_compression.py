@@ -0,0 +1,98 @@
+import gzip
+import json
+
+import pytest
+from fastapi import FastAPI, Header
+from fastapi.responses import Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from services.compression import CompressionMiddleware, encoded_etag, negotiate, strip_encoding_suffix
+
+BODY = json.dumps([{"id": str(i), "job_title": "Data Engineer"} for i in range(100)]).encode()
+ETAG = '"v1"'
+
+@pytest.mark.parametrize("accept, expected", [
+    ("gzip, br", "br"), # Equal q-values: the server's preference order wins
+    ("br;q=0.5, gzip", "gzip"),
+    ("GZIP", "gzip"),
+    ("*", "br"),
+    ("*;q=0.3, br;q=0", "gzip"),
+    ("gzip;q=0, br;q=0", None),
+    ("deflate, identity", None),
+    ("gzip;q=bad", None), # An unparsable q-value counts as refused
+    ("", None),
+])
+def test_negotiate(accept, expected):
+    assert negotiate(accept) == expected
+
+def test_negotiate_only_offers_available_encodings():
+    assert negotiate("br, gzip", available=("gzip",)) == "gzip"
+    assert negotiate("br", available=("gzip",)) is None
+
+def test_encoded_etag_round_trip():
+    for encoding in ("gzip", "br"):
+        assert strip_encoding_suffix(encoded_etag(ETAG, encoding)) == ETAG
+    assert encoded_etag(ETAG, "gzip") != encoded_etag(ETAG, "br")
+    assert strip_encoding_suffix(ETAG) == ETAG
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+
+    @app.get("/jobs")
+    def jobs(if_none_match: str = Header(None)):
+        candidates = [strip_encoding_suffix(etag.strip()) for etag in (if_none_match or "").split(",")]
+        if ETAG in candidates:
+            return Response(status_code=304, headers={"ETag": ETAG})
+        return Response(content=BODY, media_type="application/json", headers={"ETag": ETAG})
+
+    @app.get("/small")
+    def small():
+        return {"ok": True}
+
+    @app.get("/pdf")
+    def pdf():
+        return Response(content=b"%PDF" * 1000, media_type="application/pdf")
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse(iter([BODY[:500], BODY[500:]]), media_type="application/json")
+
+    compressed = CompressionMiddleware(app, minimum_size=100)
+    compressed.encodings = ("gzip",) # Same result whether or not brotli is installed
+    return TestClient(compressed)
+
+def test_large_json_is_gzipped_with_its_own_etag(client):
+    response = client.get("/jobs", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == '"v1-gzip"'
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert response.content == BODY # Decoded by the client
+    identity = client.get("/jobs", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in identity.headers and identity.headers["etag"] == ETAG
+
+def test_small_and_binary_responses_are_not_compressed(client):
+    assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/pdf", headers={"Accept-Encoding": "gzip"}).headers
+
+def test_streamed_response_is_compressed_incrementally(client):
+    with client.stream("GET", "/stream", headers={"Accept-Encoding": "gzip"}) as response:
+        raw = b"".join(response.iter_raw())
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert gzip.decompress(raw) == BODY
+
+@pytest.mark.parametrize("accept, if_none_match", [
+    ("gzip", '"v1-gzip"'),
+    ("identity", ETAG),
+    ("gzip", '"other", "v1-gzip"'),
+])
+def test_if_none_match_gives_304_with_the_etag_the_client_holds(client, accept, if_none_match):
+    response = client.get("/jobs", headers={"Accept-Encoding": accept, "If-None-Match": if_none_match})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] in if_none_match
+
+def test_stale_etag_gets_the_full_response(client):
+    response = client.get("/jobs", headers={"Accept-Encoding": "gzip", "If-None-Match": '"v0-gzip"'})
+    assert response.status_code == 200 and response.content == BODY
@@ -0,0 +1,41 @@
+import pytest
+
+from services.cv_sections import section_weight, split_sections
+
+SUMMARY = """1. **Professional Summary**: Data engineer with six years in retail analytics.
+2. **Key Skills and Expertise**:
+- Python, SQL
+- Stakeholder communication
+3. **Work Experience**:
+  - **Job Title**: Data Engineer
+  - **Company**: Acme
+4. **Certifications and Training**: N/A
+**Languages**: French (native), English (C1)
+"""
+
+def test_split_sections():
+    assert split_sections(SUMMARY) == [
+        ("Professional Summary", "Data engineer with six years in retail analytics."),
+        ("Key Skills and Expertise", "- Python, SQL - Stakeholder communication"),
+        # Indented bold sub-items stay in their section
+        ("Work Experience", "- **Job Title**: Data Engineer - **Company**: Acme"),
+        ("Languages", "French (native), English (C1)"), # The empty certifications section is dropped
+    ]
+
+def test_split_sections_without_headers():
+    assert split_sections("") == []
+    assert split_sections("Plain text before any header") == []
+
+@pytest.mark.parametrize("title, weight", [
+    ("Key Skills and Expertise", 1.5),
+    ("Technologies and Tools", 1.5),
+    ("Soft Skills", 0.5),
+    ("Languages", 0.3),
+    ("Language Skills", 0.3),
+    ("Programming Languages", 1.5),
+    ("Work Experience", 1.2),
+    ("EDUCATION", 0.6),
+    ("Hobbies", 1.0), # Unknown sections keep the default weight
+])
+def test_section_weight(title, weight):
+    assert section_weight(title) == weight
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from models.database import JobPosting
+from services.dedup import MinHasher, MinHashLSH, NearDuplicateStage, collapse_duplicates, similarity
+
+DESCRIPTION = ("We are looking for a data engineer to design and maintain batch and streaming pipelines "
+               "on Spark and Kafka, model warehouse tables in dbt, and work with analysts on reporting. "
+               "You have five years of Python and SQL experience and enjoy mentoring junior engineers.")
+REPOST = DESCRIPTION.replace("five years", "5+ years") + " Hybrid, two days a week in the office."
+OTHER = ("Our bakery is hiring a pastry chef to prepare croissants, tarts and seasonal cakes, "
+         "manage the morning shift and keep the kitchen spotless. Early starts, weekends off.")
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    JobPosting.__table__.create(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+def posting(job_id: str, description: str, city: str = "Berlin") -> JobPosting:
+    return JobPosting(id=job_id, job_title="Data Engineer", company="Acme", location=city, description=description)
+
+def test_signatures_estimate_jaccard_similarity():
+    hasher = MinHasher(num_perm=128)
+    original, repost, other = hasher.signatures([DESCRIPTION, REPOST, OTHER])
+    assert similarity(original, original) == 1.0
+    assert similarity(original, repost) > 0.6
+    assert similarity(original, other) < 0.1
+    assert hasher.signature("") is None
+    np.testing.assert_array_equal(hasher.signature(DESCRIPTION), original) # Batched and single agree
+
+def test_chunked_signatures_match_a_single_pass():
+    texts = [DESCRIPTION, "", "short", REPOST, OTHER * 3]
+    single_pass = MinHasher(num_perm=64, chunk_shingles=10 ** 6).signatures(texts)
+    for chunk in (1, 7, 40): # Chunk boundaries inside texts and across several of them
+        chunked = MinHasher(num_perm=64, chunk_shingles=chunk).signatures(texts)
+        assert chunked[1] is None
+        for expected, signature in zip(single_pass[:1] + single_pass[2:], chunked[:1] + chunked[2:]):
+            np.testing.assert_array_equal(signature, expected)
+
+def test_lsh_finds_the_closest_cluster():
+    hasher = MinHasher(num_perm=64)
+    lsh = MinHashLSH(num_perm=64, bands=16)
+    original, other = hasher.signatures([DESCRIPTION, OTHER])
+    lsh.insert("a", original, "a")
+    lsh.insert("b", other, "b")
+    assert lsh.query(hasher.signature(REPOST), 0.5)[0] == "a"
+    assert lsh.query(hasher.signature("completely unrelated words about gardening tools"), 0.5) is None
+    lsh.remove("a")
+    assert len(lsh) == 1 and lsh.query(original, 0.5) is None
+
+def test_bands_must_divide_num_perm():
+    with pytest.raises(ValueError):
+        MinHashLSH(num_perm=100, bands=16)
+
+def test_stage_clusters_reposts_across_batches(db):
+    stage = NearDuplicateStage(threshold=0.5)
+    first = [posting("1", DESCRIPTION), posting("2", OTHER)]
+    stage(first, db)
+    db.add_all(first)
+    db.commit()
+
+    # A fresh stage reloads the stored signatures before clustering the next batch
+    reloaded = NearDuplicateStage(threshold=0.5)
+    second = [posting("3", REPOST, city="Munich"), JobPosting(id="4")] # No text to sign
+    reloaded(second, db)
+    assert [job.cluster_id for job in first + second] == ["1", "2", "1", "4"]
+    assert second[1].minhash == b""
+
+def test_updated_posting_does_not_match_itself(db):
+    stage = NearDuplicateStage(threshold=0.5)
+    job = posting("1", DESCRIPTION)
+    stage([job], db)
+    job.description = OTHER
+    stage([job], db)
+    assert job.cluster_id == "1"
+
+def test_collapse_keeps_the_best_of_each_cluster():
+    a, b, c = posting("a", ""), posting("b", ""), posting("c", "")
+    a.cluster_id, b.cluster_id, c.cluster_id = "a", "a", None
+    assert [(job.id, score) for job, score in collapse_duplicates([(a, 0.9), (b, 0.8), (c, 0.7)])] == [("a", 0.9), ("c", 0.7)]
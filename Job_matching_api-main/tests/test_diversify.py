@@ -0,0 +1,29 @@
+import numpy as np
+
+from services.diversify import mmr, similarity_matrix
+
+# Items 0 and 1 are near-duplicates; 2 and 3 each point somewhere else
+VECTORS = np.array([[1.0, 0.0, 0.0], [0.995, 0.0998, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]])
+RELEVANCE = np.array([0.9, 0.89, 0.5, 0.4])
+
+def test_similarity_matrix():
+    similarities = similarity_matrix(VECTORS)
+    assert similarities.shape == (4, 4)
+    np.testing.assert_allclose(np.diag(similarities), 1.0, atol=1e-3)
+    assert similarities[0, 1] > 0.99 and similarities[0, 2] == 0
+
+def test_lambda_one_keeps_the_relevance_order():
+    assert mmr(RELEVANCE, similarity_matrix(VECTORS), 4, 1.0).tolist() == [0, 1, 2, 3]
+
+def test_lower_lambda_pushes_near_duplicates_down():
+    similarities = similarity_matrix(VECTORS)
+    assert mmr(RELEVANCE, similarities, 4, 0.5).tolist() == [0, 2, 3, 1]
+    # Diversity only: after the first item, the least similar ones come first
+    assert mmr(RELEVANCE, similarities, 4, 0.0).tolist() == [0, 2, 3, 1]
+
+def test_selection_is_capped_at_k():
+    similarities = similarity_matrix(VECTORS)
+    assert mmr(RELEVANCE, similarities, 2, 0.5).tolist() == [0, 2]
+    assert len(mmr(RELEVANCE, similarities, 10, 0.5)) == 4 # Never more than the shortlist
+    assert mmr(RELEVANCE, similarities, 0, 0.5).tolist() == []
+    assert mmr(np.array([]), np.empty((0, 0)), 5, 0.5).tolist() == []
@@ -0,0 +1,103 @@
+import json
+import os
+import time
+
+import numpy as np
+import pytest
+
+from services.index_store import LEASES, IndexStore, paced
+from services.job_index import JobIndex, normalize_rows
+
+def build(store: IndexStore, model: str) -> str:
+    generation = store.create(model)
+    vectors = normalize_rows(np.random.default_rng(0).normal(size=(5, 4)).astype(np.float32))
+    JobIndex(np.array([f"job-{i}" for i in range(5)], dtype=str), vectors, version=generation, model=model
+             ).save(store.path(generation))
+    return generation
+
+def test_publish_switches_the_served_generation(tmp_path):
+    store = IndexStore(str(tmp_path))
+    assert store.current() is None and not IndexStore.is_store(store.root)
+    small = build(store, "text-embedding-3-small")
+    assert small.startswith("text-embedding-3-small-")
+    assert store.generations() == {} # Still marked as building
+    with pytest.raises(ValueError):
+        store.publish(small)
+    store.complete(small)
+    store.publish(small)
+    assert store.current() == small and IndexStore.is_store(store.root)
+
+    large = build(store, "text-embedding-3-large")
+    store.complete(large)
+    store.publish(large)
+    assert set(store.generations()) == {small, large}
+    index = JobIndex.load(store.root) # A store path serves its CURRENT generation
+    assert (index.model, index.version) == ("text-embedding-3-large", large)
+
+def test_garbage_collection_keeps_current_and_leased_generations(tmp_path):
+    builder = IndexStore(str(tmp_path))
+    old, served, leased = (build(builder, model) for model in ("old", "served", "leased"))
+    for generation in (old, served, leased):
+        builder.complete(generation)
+    builder.publish(served)
+    builder.release()
+
+    other = IndexStore(str(tmp_path))
+    other.owner = "other-host-1" # Another process still answers queries from `leased`
+    other.lease(leased)
+    assert builder.collect_garbage() == [old]
+    assert set(builder.generations()) == {served, leased}
+
+def test_stale_leases_are_ignored_and_removed(tmp_path):
+    store = IndexStore(str(tmp_path), lease_seconds=60)
+    generation = build(store, "crashed")
+    lease_path = os.path.join(store.root, LEASES, f"{store.owner}.json")
+    with open(lease_path) as f:
+        lease = json.load(f)
+    lease["updated"] = time.time() - 120 # The building process died two minutes ago
+    with open(lease_path, "w") as f:
+        json.dump(lease, f)
+    assert store.leased() == set()
+    assert not os.path.exists(lease_path)
+    assert store.collect_garbage() == [generation] # Half-built generations are collected too
+
+def test_holding_keeps_the_lease_until_the_work_ends(tmp_path):
+    store = IndexStore(str(tmp_path), lease_seconds=0.3)
+    generation = store.create("model")
+    with store.holding(generation):
+        time.sleep(0.5) # Longer than the lease: the heartbeat refreshes it
+        assert store.leased() == {generation}
+    assert store.leased() == set()
+
+def test_paced_retries_and_spaces_batches(monkeypatch):
+    clock, sleeps = [1000.0], []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        clock[0] += seconds
+
+    monkeypatch.setattr("services.index_store.time.monotonic", lambda: clock[0])
+    monkeypatch.setattr("services.index_store.time.sleep", sleep)
+    calls = []
+
+    def embed(texts):
+        calls.append(list(texts))
+        if len(calls) == 1:
+            raise RuntimeError("429 Too Many Requests")
+        return [[0.0]] * len(texts)
+
+    embed_paced = paced(embed, texts_per_minute=60)
+    assert embed_paced(["a", "b"]) == [[0.0], [0.0]]
+    assert len(calls) == 2
+    assert sleeps == [5] # Backoff after the failed batch
+    embed_paced(["c"])
+    assert sleeps == [5, 2] # Two texts at 60 per minute: the next batch waits two seconds
+
+def test_paced_gives_up_after_the_last_attempt(monkeypatch):
+    monkeypatch.setattr("services.index_store.time.sleep", lambda seconds: None)
+
+    def embed(texts):
+        raise RuntimeError("deployment unavailable")
+
+    with pytest.raises(RuntimeError):
+        paced(embed, 0, attempts=3)(["a"])
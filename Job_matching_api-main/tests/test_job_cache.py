@@ -0,0 +1,132 @@
+import pytest
+from fastapi import FastAPI, Header, Response
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from models.database import CorpusState
+from models.schemas import JobResponse
+from services.compression import CompressionMiddleware, encoded_etag, strip_encoding_suffix
+from services.job_cache import JobDetailCache, etag_matches, make_etag
+from services.result_cache import bump_corpus_version
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    CorpusState.__table__.create(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+class Postings:
+    """In-memory `fetch` for JobDetailCache.load, counting database reads"""
+
+    def __init__(self):
+        self.jobs = {"1": JobResponse(id="1", job_title="Data Engineer", description="Pipelines " * 200)}
+        self.reads = 0
+
+    def __call__(self, job_id, db):
+        self.reads += 1
+        return self.jobs.get(job_id)
+
+def test_etag_matches():
+    assert etag_matches('"abc"', '"abc"')
+    assert etag_matches('W/"abc"', '"abc"')
+    assert etag_matches('"x", "abc-gzip"', '"abc"')
+    assert etag_matches('"abc-br"', '"abc"')
+    assert etag_matches("*", '"abc"')
+    assert not etag_matches('"abd"', '"abc"')
+    assert not etag_matches(None, '"abc"')
+
+def test_encoded_etag():
+    assert encoded_etag('"abc"', "gzip") == '"abc-gzip"'
+    assert encoded_etag('W/"abc"', "gzip") == 'W/"abc"'
+    assert strip_encoding_suffix('"abc-br"') == '"abc"'
+    assert strip_encoding_suffix('"abc"') == '"abc"'
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def test_cache_serves_until_the_corpus_version_changes(db, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr("services.job_cache.time.monotonic", clock)
+    postings = Postings()
+    cache = JobDetailCache(version_ttl_seconds=5)
+    first = cache.load("1", db, postings)
+    assert first.etag == make_etag(first.body)
+    assert cache.get("1") is first
+    clock.now += 10 # The version is re-read, but it has not changed
+    assert cache.get("1") is None
+    assert cache.load("1", db, postings) is first
+    assert postings.reads == 1
+
+    bump_corpus_version(db)
+    db.commit()
+    assert cache.get("1") is first # Not re-read yet
+    clock.now += 10
+    again = cache.load("1", db, postings)
+    assert postings.reads == 2
+    assert again.etag == first.etag # Content unchanged, so the ETag is too
+
+    postings.jobs["1"] = JobResponse(id="1", job_title="Senior Data Engineer")
+    bump_corpus_version(db)
+    db.commit()
+    clock.now += 10
+    assert cache.load("1", db, postings).etag != first.etag
+
+def test_missing_job_is_not_cached(db):
+    postings = Postings()
+    cache = JobDetailCache()
+    assert cache.load("2", db, postings) is None
+    assert len(cache) == 0
+
+def test_lru_bound(db):
+    postings = Postings()
+    postings.jobs.update({str(i): JobResponse(id=str(i)) for i in range(2, 5)})
+    cache = JobDetailCache(max_entries=2)
+    for job_id in ("1", "2", "3"):
+        cache.load(job_id, db, postings)
+    assert len(cache) == 2
+    assert cache.get("1") is None
+
+@pytest.fixture
+def client(db):
+    postings = Postings()
+    cache = JobDetailCache()
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware)
+
+    @app.get("/jobs/{job_id}")
+    def get_job(job_id: str, if_none_match: str = Header(None)):
+        entry = cache.load(job_id, db, postings)
+        headers = {"ETag": entry.etag}
+        if etag_matches(if_none_match, entry.etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+
+    return TestClient(app)
+
+def test_each_encoding_gets_its_own_strong_etag(client):
+    identity = client.get("/jobs/1", headers={"Accept-Encoding": "identity"})
+    gzipped = client.get("/jobs/1", headers={"Accept-Encoding": "gzip"})
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert gzipped.headers["etag"] == encoded_etag(identity.headers["etag"], "gzip")
+    assert not gzipped.headers["etag"].startswith("W/")
+    assert "Accept-Encoding" in gzipped.headers["vary"]
+    assert gzipped.json() == identity.json()
+
+def test_not_modified_echoes_the_encoded_etag(client):
+    etag = client.get("/jobs/1", headers={"Accept-Encoding": "gzip"}).headers["etag"]
+    revalidated = client.get("/jobs/1", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.headers["etag"] == etag
+
+    identity_etag = client.get("/jobs/1", headers={"Accept-Encoding": "identity"}).headers["etag"]
+    revalidated = client.get("/jobs/1", headers={"Accept-Encoding": "identity", "If-None-Match": identity_etag})
+    assert revalidated.status_code == 304
+    assert revalidated.headers["etag"] == identity_etag
@@ -0,0 +1,54 @@
+import pytest
+
+from models.database import Seniority, WorkMode
+from services.job_fields import normalize_place, parse_location, parse_salary, parse_seniority, parse_work_mode
+
+@pytest.mark.parametrize("text, expected", [
+    ("€45k-€55k", (45_000, 55_000, "EUR")),
+    ("€60,000 - €75,000 per year", (60_000, 75_000, "EUR")),
+    ("$120k-$150k", (120_000, 150_000, "USD")),
+    ("$55/hour", (55 * 2080, 55 * 2080, "USD")),
+    ("15 000 - 25 000 DH par mois", (180_000, 300_000, "MAD")),
+    ("£70,000", (70_000, 70_000, "GBP")),
+    ("Up to £90k", (None, 90_000, "GBP")),
+    ("90000 USD", (90_000, 90_000, "USD")),
+    ("400€ par jour", (88_000, 88_000, "EUR")),
+    ("Salary: 85000", (85_000, 85_000, None)),
+    ("50k-60k + bonus up to 10k", (50_000, 60_000, None)),
+])
+def test_parse_salary(text, expected):
+    assert parse_salary(text) == expected
+
+def test_parse_salary_ignores_retirement_plan():
+    assert parse_salary("$100K+ with 401k") == (100_000, 100_000, "USD")
+
+@pytest.mark.parametrize("text", ["3 years experience", "Competitive", "", None, "Team of 12, 2 offices"])
+def test_parse_salary_needs_a_salary_marker(text):
+    assert parse_salary(text)[:2] == (None, None)
+
+def test_parse_salary_range_shares_suffix_and_marker():
+    assert parse_salary("50 - 60k") == (50_000, 60_000, None)
+    assert parse_salary("€45 - 55 per hour") == (45 * 2080, 55 * 2080, "EUR")
+
+def test_parse_salary_period_is_read_next_to_the_figures():
+    assert parse_salary("Hiring 3 engineers, 5 days a week, $90k") == (90_000, 90_000, "USD")
+    assert parse_salary("Hourly: $50") == (50 * 2080, 50 * 2080, "USD")
+
+def test_parse_seniority():
+    assert parse_seniority("Mid-Senior level", "Senior Data Engineer") == Seniority.SENIOR
+    assert parse_seniority("Mid-Senior level", "Data Engineer") == Seniority.MID
+    assert parse_seniority(None, "Stagiaire Data") == Seniority.INTERN
+    assert parse_seniority(None, "Data Engineer") is None
+
+def test_parse_work_mode():
+    assert parse_work_mode("Paris, France (Hybrid)") == WorkMode.HYBRID
+    assert parse_work_mode("Remote") == WorkMode.REMOTE
+    assert parse_work_mode("Casablanca, Morocco") == WorkMode.ONSITE
+    assert parse_work_mode(None) is None
+
+def test_parse_location():
+    assert parse_location("Paris, Île-de-France, France") == ("Paris", "France")
+    assert parse_location("Austin, TX") == ("Austin", "United States")
+    assert parse_location("USA") == (None, "United States")
+    assert parse_location("Greater Casablanca Area") == ("Casablanca", None)
+    assert normalize_place("  new york ") == "New York"
@@ -0,0 +1,86 @@
+import threading
+from multiprocessing import Pipe
+
+import numpy as np
+import pytest
+
+from services.job_index import JobIndex, ShardedJobIndex, ShardError, _serve_connection, _Shard, normalize_rows
+
+def make_index(prefix: str, rows: int, seed: int) -> JobIndex:
+    vectors = normalize_rows(np.random.default_rng(seed).normal(size=(rows, 8)).astype(np.float32))
+    return JobIndex(np.array([f"{prefix}-{i}" for i in range(rows)], dtype=object), vectors, version="v1")
+
+class FailingIndex(JobIndex):
+    """Raises on searches with k == 13"""
+
+    def search(self, query, k, allowed_ids=None, weights=None):
+        if k == 13:
+            raise RuntimeError("disk error")
+        return super().search(query, k, allowed_ids, weights)
+
+def thread_shard(name: str, index: JobIndex, opened: list) -> _Shard:
+    def open_shard():
+        parent, child = Pipe()
+        threading.Thread(target=_serve_connection, args=(child, index), daemon=True).start()
+        opened.append(name)
+        return parent, None
+    return _Shard(name, open_shard)
+
+@pytest.fixture
+def shards():
+    indexes = [make_index("a", 20, 1), FailingIndex(*_parts(make_index("b", 20, 2))), make_index("c", 20, 3)]
+    opened = []
+    sharded = ShardedJobIndex([thread_shard(f"s{i}", index, opened) for i, index in enumerate(indexes)])
+    full = JobIndex(np.concatenate([i.ids for i in indexes]), np.concatenate([i.vectors for i in indexes]))
+    yield sharded, full, opened
+    sharded.close()
+
+def _parts(index: JobIndex):
+    return index.ids, index.vectors, index.version
+
+def test_sharded_search_matches_single_index(shards):
+    sharded, full, _ = shards
+    query = np.random.default_rng(9).normal(size=8)
+    assert [job_id for job_id, _ in sharded.search(query, 10)] == [job_id for job_id, _ in full.search(query, 10)]
+    assert len(sharded) == 60
+
+def test_failing_shard_leaves_every_connection_in_step(shards):
+    sharded, full, _ = shards
+    query = np.random.default_rng(4).normal(size=8)
+    with pytest.raises(ShardError, match="s1: RuntimeError: disk error"):
+        sharded.search(query, 13)
+    # The other shards' replies to the failed query were read: the next answer is for the next query
+    other = np.random.default_rng(5).normal(size=8)
+    assert [job_id for job_id, _ in sharded.search(other, 5)] == [job_id for job_id, _ in full.search(other, 5)]
+
+def test_broken_connection_is_reopened(shards):
+    sharded, full, opened = shards
+    broken = sharded._shards[1]
+    broken.conn.close() # The send of the next query fails on this shard
+    query = np.random.default_rng(6).normal(size=8)
+    with pytest.raises(OSError):
+        sharded.search(query, 5)
+    assert opened.count("s1") == 2
+    assert [job_id for job_id, _ in sharded.search(query, 5)] == [job_id for job_id, _ in full.search(query, 5)]
+
+def test_unread_replies_are_drained_when_a_reply_cannot_be_read(shards, monkeypatch):
+    sharded, full, opened = shards
+    conn = sharded._shards[0].conn
+    real_recv = conn.recv
+    calls = []
+
+    def recv_failing_once():
+        if not calls:
+            calls.append(1)
+            real_recv() # Consume the reply, then fail as a dropped connection would
+            raise EOFError
+        return real_recv()
+
+    monkeypatch.setattr(conn, "recv", recv_failing_once, raising=False)
+    sharded.drain_seconds = 0.2 # Shard 0 owes nothing, so it is reopened after this wait
+    query = np.random.default_rng(7).normal(size=8)
+    with pytest.raises(EOFError):
+        sharded.search(query, 5)
+    assert opened.count("s0") == 2
+    other = np.random.default_rng(8).normal(size=8)
+    assert [job_id for job_id, _ in sharded.search(other, 5)] == [job_id for job_id, _ in full.search(other, 5)]
@@ -0,0 +1,46 @@
+import base64
+
+import pytest
+
+from services.match_sessions import MatchSessionStore, decode_cursor, encode_cursor
+
+def raw_cursor(text: bytes) -> str:
+    return base64.urlsafe_b64encode(text).decode().rstrip("=")
+
+@pytest.mark.parametrize("offset", [0, 1, 20, 99, 10 ** 9])
+def test_cursor_round_trip(offset):
+    cursor = encode_cursor(offset)
+    assert "=" not in cursor and "/" not in cursor and "+" not in cursor # Safe in a query string as is
+    assert decode_cursor(cursor) == offset
+
+def test_missing_cursor_is_the_first_page():
+    assert decode_cursor(None) == 0
+    assert decode_cursor("") == 0
+
+@pytest.mark.parametrize("cursor", [
+    "!!!", # Not base64
+    "a", # Truncated
+    raw_cursor(b"\xff\xfe"), # Not UTF-8
+    raw_cursor(b"20"), # No prefix
+    raw_cursor(b"p:20"), # Wrong prefix
+    raw_cursor(b"o:"),
+    raw_cursor(b"o:-5"),
+    raw_cursor(b"o:2.5"),
+    raw_cursor(b"o:20;drop"),
+    "c" + encode_cursor(20)[1:], # Edited by hand: the prefix no longer decodes
+])
+def test_malformed_or_tampered_cursors_are_rejected(cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(cursor)
+
+def test_sessions_expire_and_are_bounded(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("services.match_sessions.time.time", lambda: now[0])
+    store = MatchSessionStore(ttl_seconds=60, max_sessions=2)
+    first = store.create([("job-1", 0.9)])
+    assert store.get(first.result_id).ranked == [("job-1", 0.9)]
+    second, third = store.create([]), store.create([])
+    assert store.get(first.result_id) is None # Oldest evicted beyond max_sessions
+    now[0] += 61
+    assert store.get(second.result_id) is None and store.get(third.result_id) is None
+    assert store.get("unknown") is None
@@ -0,0 +1,43 @@
+import queue
+import sys
+import threading
+
+from services.profiling import _collapse
+
+def get(stop: threading.Event, ready: threading.Event):
+    """Busy application code that happens to be named like an idle frame"""
+    ready.set()
+    while not stop.is_set():
+        sum(range(1000))
+
+def collapsed(thread: threading.Thread):
+    return _collapse(sys._current_frames()[thread.ident])
+
+def test_idle_threads_are_dropped_and_busy_ones_kept():
+    jobs, stop, ready, blocked = queue.Queue(), threading.Event(), threading.Event(), threading.Event()
+
+    def waiter():
+        blocked.set()
+        jobs.get()
+
+    idle, busy = threading.Thread(target=waiter), threading.Thread(target=get, args=(stop, ready))
+    idle.start()
+    busy.start()
+    try:
+        assert ready.wait(5) and blocked.wait(5)
+        for _ in range(100): # Until the waiter is parked inside Queue.get
+            if collapsed(idle) is None:
+                break
+            threading.Event().wait(0.01)
+        assert collapsed(idle) is None
+        leaves = set()
+        for _ in range(1000): # Sampled in `get` or in the Event.is_set it calls, never dropped
+            stack = collapsed(busy)
+            assert stack is not None
+            leaves.add(stack.rsplit(";", 1)[-1].split(" ")[0])
+        assert "get" in leaves
+    finally:
+        stop.set()
+        jobs.put(None)
+        idle.join()
+        busy.join()
@@ -0,0 +1,18 @@
+import pytest
+
+from models.database import JobPosting
+from services.projection import JOB_FIELDS, load_columns, parse_fields
+
+def test_parse_fields():
+    assert parse_fields(None) is None
+    assert parse_fields(" ") is None
+    assert parse_fields("job_title, company,,job_title") == ("job_title", "company") # Deduplicated, in order
+    assert parse_fields("id,match_score") == () # Always returned, so no column to select
+    assert "description" in JOB_FIELDS and "id" not in JOB_FIELDS
+
+def test_parse_fields_rejects_unknown_names():
+    with pytest.raises(ValueError, match="Unknown fields: wage, Job_Title"):
+        parse_fields("job_title,wage,Job_Title")
+
+def test_load_columns_always_include_the_id_and_cluster():
+    assert load_columns(("job_title", "id")) == [JobPosting.id, JobPosting.cluster_id, JobPosting.job_title]
@@ -0,0 +1,142 @@
+import threading
+
+import pytest
+
+from services.rebuild import RebuildOrchestrator, VersionedSlot, with_session
+
+class Closed:
+    """`close` callback recording what was closed; `wait` blocks until `count` values were"""
+
+    def __init__(self):
+        self.values = []
+        self._changed = threading.Condition()
+
+    def __call__(self, value):
+        with self._changed:
+            self.values.append(value)
+            self._changed.notify_all()
+
+    def wait(self, count: int) -> list:
+        with self._changed:
+            assert self._changed.wait_for(lambda: len(self.values) >= count, timeout=5)
+            return list(self.values)
+
+def test_replaced_generation_is_closed_after_its_last_request():
+    closed = Closed()
+    slot = VersionedSlot("test", close=closed)
+    with slot.acquire() as value:
+        assert value is None # Nothing swapped in yet
+    slot.swap(["v1"], "1")
+    with slot.acquire() as pinned:
+        slot.swap(["v2"], "2")
+        assert pinned == ["v1"] # The request keeps the generation it started with
+        assert slot.value == ["v2"]
+        assert slot.status()["draining"] == [{"version": "1", "in_flight": 1}]
+        assert closed.values == []
+    assert closed.wait(1) == [["v1"]]
+    assert slot.status()["draining"] == []
+
+    slot.swap(["v3"], "3") # Unused: closed right away
+    assert closed.wait(2) == [["v1"], ["v2"]]
+    assert slot.status()["generation"] == 3 and slot.version == "3"
+
+def test_discard_closes_a_value_never_served():
+    closed = Closed()
+    slot = VersionedSlot("test", close=closed)
+    slot.discard("rejected")
+    assert closed.values == ["rejected"]
+
+class Structure:
+    """A rebuildable structure: `rows` rows per build, optionally failing"""
+
+    def __init__(self, rows: int = 100):
+        self.rows = rows
+        self.builds = 0
+        self.fail_validation = False
+        self.error = None
+        self.changed = True
+
+    def build(self):
+        self.builds += 1
+        if self.error:
+            raise self.error
+        return list(range(self.rows)), f"v{self.builds}"
+
+    def validate(self, value):
+        if self.fail_validation:
+            raise AssertionError("sample query returned nothing")
+
+@pytest.fixture
+def setup():
+    structure, closed = Structure(), Closed()
+    slot = VersionedSlot("test", close=closed)
+    orchestrator = RebuildOrchestrator(min_row_ratio=0.5)
+    orchestrator.register("test", slot, structure.build, interval=3600, due=lambda: structure.changed,
+                          validate=structure.validate, size=len)
+    return orchestrator, structure, slot, closed
+
+def test_run_swaps_only_when_due(setup):
+    orchestrator, structure, slot, _ = setup
+    assert orchestrator.run("test") == "swapped"
+    assert slot.version == "v1"
+    structure.changed = False
+    assert orchestrator.run("test") == "skipped"
+    assert orchestrator.run("test", force=True) == "swapped"
+    assert structure.builds == 2
+
+def test_truncated_generation_is_rejected(setup):
+    orchestrator, structure, slot, closed = setup
+    orchestrator.run("test")
+    structure.rows = 40 # Below half of the 100 rows served
+    assert orchestrator.run("test") == "rejected"
+    assert slot.version == "v1"
+    assert orchestrator.rejected_version("test") == "v2"
+    assert closed.values == [list(range(40))] # The rejected build is closed
+    structure.rows = 60
+    assert orchestrator.run("test") == "swapped"
+    assert orchestrator.rejected_version("test") is None
+
+def test_failed_sample_queries_and_builds_keep_the_current_generation(setup):
+    orchestrator, structure, slot, _ = setup
+    orchestrator.run("test")
+    structure.fail_validation = True
+    assert orchestrator.run("test") == "rejected"
+    assert "sample queries failed" in orchestrator.status()["test"]["last_error"]
+    structure.fail_validation, structure.error = False, RuntimeError("database unavailable")
+    assert orchestrator.run("test") == "failed"
+    assert slot.version == "v1"
+    assert orchestrator.status()["test"]["last_result"] == "failed"
+
+def test_trigger_rebuilds_in_the_background(setup):
+    orchestrator, structure, slot, _ = setup
+    structure.changed = False
+    swapped = threading.Event()
+    original_swap = slot.swap
+
+    def swap(value, version):
+        original_swap(value, version)
+        swapped.set()
+
+    slot.swap = swap
+    orchestrator.start()
+    try:
+        orchestrator.trigger("test") # Not due, but forced
+        assert swapped.wait(5)
+    finally:
+        orchestrator.stop()
+    assert slot.version == "v1"
+
+def test_with_session_closes_the_session():
+    class Session:
+        closed = False
+
+        def close(self):
+            self.closed = True
+
+    def build(db):
+        raise RuntimeError("query failed")
+
+    session = Session()
+    with pytest.raises(RuntimeError):
+        with_session(lambda: session, build)
+    assert session.closed
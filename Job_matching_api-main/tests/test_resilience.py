@@ -0,0 +1,128 @@
+import httpx
+import openai
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from prometheus_client import REGISTRY
+
+from services.resilience import (CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen, DegradedModeMiddleware,
+                                 collect_degraded, degraded_reasons, is_outage, mark_degraded, track_degraded)
+
+def status_error(status: int) -> openai.APIStatusError:
+    request = httpx.Request("POST", "https://example.invalid/openai/deployments/emb/embeddings")
+    return openai.APIStatusError("error", response=httpx.Response(status, request=request), body=None)
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr("services.resilience.time.monotonic", clock)
+    return clock
+
+def fail():
+    raise httpx.ConnectTimeout("timed out")
+
+def test_is_outage():
+    assert is_outage(httpx.ConnectTimeout("timed out"))
+    assert is_outage(status_error(429))
+    assert is_outage(status_error(503))
+    assert not is_outage(status_error(400))
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker("test-open", failure_threshold=3, reset_seconds=30)
+    for _ in range(2):
+        with pytest.raises(httpx.ConnectTimeout):
+            breaker.call(fail)
+    assert breaker.call(lambda: "ok") == "ok" # A success resets the count
+    for _ in range(3):
+        with pytest.raises(httpx.ConnectTimeout):
+            breaker.call(fail)
+    assert breaker.state == OPEN and breaker.is_open
+    calls = []
+    with pytest.raises(CircuitOpen):
+        breaker.call(calls.append, 1)
+    assert calls == [] # Rejected without calling the dependency
+
+def test_trial_call_after_reset(clock):
+    breaker = CircuitBreaker("test-trial", failure_threshold=1, reset_seconds=30)
+    with pytest.raises(httpx.ConnectTimeout):
+        breaker.call(fail)
+    clock.now += 31
+    assert not breaker.is_open
+    with pytest.raises(httpx.ConnectTimeout):
+        breaker.call(fail) # The trial call fails: open again for another period
+    assert breaker.state == OPEN and breaker.is_open
+    clock.now += 31
+    assert breaker.call(lambda: "ok") == "ok"
+    assert breaker.state == CLOSED
+
+def test_only_one_trial_call_while_half_open(clock):
+    breaker = CircuitBreaker("test-half-open", failure_threshold=1, reset_seconds=30)
+    with pytest.raises(httpx.ConnectTimeout):
+        breaker.call(fail)
+    clock.now += 31
+
+    def trial():
+        assert breaker.state == HALF_OPEN
+        with pytest.raises(CircuitOpen):
+            breaker.call(lambda: "second")
+        return "first"
+
+    assert breaker.call(trial) == "first"
+
+def test_request_errors_do_not_open_the_breaker(clock):
+    breaker = CircuitBreaker("test-bad-request", failure_threshold=1)
+
+    def bad_request():
+        raise status_error(400)
+
+    with pytest.raises(openai.APIStatusError):
+        breaker.call(bad_request)
+    assert breaker.state == CLOSED
+
+def test_degraded_reasons_are_scoped_to_the_tracked_work():
+    mark_degraded("embeddings") # Outside tracked work: ignored
+    with track_degraded() as reasons:
+        mark_degraded("cv_summary")
+        mark_degraded("cv_summary")
+        assert degraded_reasons() == ["cv_summary"]
+    assert reasons == ["cv_summary"]
+    assert degraded_reasons() == []
+
+def test_tracked_work_is_counted_once_per_reason():
+    def count():
+        return REGISTRY.get_sample_value("job_matching_degraded_responses_total", {"reason": "test_reason"}) or 0
+
+    before = count()
+    with track_degraded():
+        with collect_degraded() as shared: # e.g. a computation shared with other requests
+            mark_degraded("test_reason")
+        assert count() == before # Collected, not counted
+        for reason in shared:
+            mark_degraded(reason)
+        mark_degraded("test_reason")
+    assert count() == before + 1
+
+def test_middleware_adds_the_degraded_header():
+    app = FastAPI()
+    app.add_middleware(DegradedModeMiddleware)
+
+    @app.get("/fallback")
+    def fallback():
+        mark_degraded("embeddings") # Runs in a worker thread
+        return {}
+
+    @app.get("/normal")
+    async def normal():
+        return {}
+
+    client = TestClient(app)
+    assert client.get("/fallback").headers["x-degraded"] == "embeddings"
+    assert "x-degraded" not in client.get("/normal").headers
@@ -0,0 +1,146 @@
+import time
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from models.database import CorpusState
+from services.result_cache import InProcessBackend, RedisBackend, ResultCache, bump_corpus_version, corpus_version
+
+RANKED = [(f"job-{i}", 1.0 - i / 100) for i in range(20)]
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    CorpusState.__table__.create(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+def test_corpus_version_counts_bumps(db):
+    assert corpus_version(db) == 0
+    bump_corpus_version(db)
+    bump_corpus_version(db)
+    db.commit()
+    assert corpus_version(db) == 2
+
+def test_in_process_backend_evicts_least_recently_used():
+    backend = InProcessBackend(max_entries=2)
+    backend.set("a", b"1")
+    backend.set("b", b"2")
+    backend.get("a")
+    backend.set("c", b"3")
+    assert backend.get("b") is None
+    assert backend.get("a") == b"1" and backend.get("c") == b"3"
+
+def test_in_process_backend_expires_entries(monkeypatch):
+    backend = InProcessBackend(ttl_seconds=10)
+    backend.set("a", b"1")
+    now = time.time()
+    monkeypatch.setattr("services.result_cache.time.time", lambda: now + 11)
+    assert backend.get("a") is None
+
+def test_deeper_ranking_answers_shallower_requests():
+    cache = ResultCache(InProcessBackend())
+    cache.put("k", RANKED[:10])
+    assert cache.get("k", 5) == RANKED[:5]
+    assert cache.get("k", 10) == RANKED[:10]
+    assert cache.get("k", 11) is None # Deeper than what was stored
+    cache.put("k", RANKED[:5]) # Does not replace the deeper ranking
+    assert cache.get("k", 10) == RANKED[:10]
+
+def test_complete_ranking_answers_any_depth():
+    cache = ResultCache(InProcessBackend())
+    cache.put("k", RANKED[:3], complete=True) # Only three matches exist
+    assert cache.get("k", 50) == RANKED[:3]
+
+def test_max_depth_bounds_stored_rankings():
+    cache = ResultCache(InProcessBackend(), max_depth=5)
+    cache.put("k", RANKED[:4], complete=True)
+    assert cache.get("k", 50) == RANKED[:4]
+    cache.put("deep", RANKED, complete=True)
+    assert cache.get("deep", 5) == RANKED[:5]
+    assert cache.get("deep", 6) is None # Truncated, so not complete
+
+def test_key_depends_on_query_filters_version_and_namespace():
+    cache = ResultCache(InProcessBackend())
+    base = cache.key([0.1, 0.2], {"city": "Berlin"}, 1, "emb:v1")
+    assert base == cache.key([0.1, 0.2], {"city": "Berlin"}, 1, "emb:v1")
+    assert base != cache.key([0.1, 0.3], {"city": "Berlin"}, 1, "emb:v1")
+    assert base != cache.key([0.1, 0.2], {"city": "Paris"}, 1, "emb:v1")
+    assert base != cache.key([0.1, 0.2], {"city": "Berlin"}, 2, "emb:v1")
+    assert base != cache.key([0.1, 0.2], {"city": "Berlin"}, 1, "emb:v2")
+
+def test_version_change_clears_the_backend(db):
+    backend = InProcessBackend()
+    cache = ResultCache(backend, version_ttl_seconds=0)
+    assert cache.current_version(db) == 0
+    cache.put("k", RANKED)
+    assert cache.current_version(db) == 0
+    assert cache.get("k", 5) is not None
+    bump_corpus_version(db)
+    db.commit()
+    assert cache.current_version(db) == 1
+    assert cache.get("k", 5) is None
+
+def test_redis_backend_prefixes_keys():
+    client = FakeRedis()
+    cache = ResultCache(RedisBackend(client=client, prefix="p:"))
+    cache.put("k", RANKED[:2])
+    assert list(client.data) == ["p:k"]
+    assert cache.get("k", 2) == RANKED[:2]
+
+def test_from_env(monkeypatch):
+    monkeypatch.setenv("RESULT_CACHE_BACKEND", "none")
+    assert ResultCache.from_env() is None
+    monkeypatch.setenv("RESULT_CACHE_BACKEND", "memory")
+    assert isinstance(ResultCache.from_env().backend, InProcessBackend)
+    monkeypatch.setenv("RESULT_CACHE_BACKEND", "disk")
+    with pytest.raises(ValueError):
+        ResultCache.from_env()
+
+class QueryEmbeddings:
+    """Embeds every text as the same unit vector"""
+
+    def embed_query(self, text):
+        return [1.0, 0.0, 0.0, 0.0]
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+def test_collapsed_ranking_is_not_taken_for_complete(monkeypatch):
+    from models.database import JobPosting
+    from services.job_index import JobIndex, normalize_rows
+    from services.job_matching import JobMatchingService
+
+    engine = create_engine("sqlite://")
+    CorpusState.__table__.create(engine)
+    JobPosting.__table__.create(engine)
+    session = sessionmaker(bind=engine)()
+    # The six best matches are reposts of one job, then four distinct ones
+    session.add_all([JobPosting(id=f"job-{i}", job_title="Data Engineer", cluster_id="repost" if i < 6 else None)
+                     for i in range(10)])
+    session.commit()
+    vectors = normalize_rows(np.array([[1.0, 0.1 * i, 0.0, 0.0] for i in range(10)], dtype=np.float32))
+    monkeypatch.setenv("RESULT_CACHE_BACKEND", "memory")
+    monkeypatch.delenv("MMR_LAMBDA", raising=False)
+    service = JobMatchingService(embeddings_client=QueryEmbeddings())
+    service.collapse_duplicates = True
+    service.index_slot.swap((JobIndex(np.array([f"job-{i}" for i in range(10)]), vectors, version="v1"), None), "v1")
+
+    first = service._score_candidates("Python", None, None, session, 2, None)
+    assert [job.id for job, _ in first] == ["job-0"] # Three times `limit` fetched, all one cluster
+    deeper = service._score_candidates("Python", None, None, session, 5, None)
+    assert [job.id for job, _ in deeper] == ["job-0", "job-6", "job-7", "job-8", "job-9"]
+    session.close()
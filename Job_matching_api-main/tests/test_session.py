@@ -0,0 +1,21 @@
+import os
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import NullPool, QueuePool, SingletonThreadPool, StaticPool
+
+os.environ.setdefault("DATABASE_URL", "sqlite://") # database.session reads it on import
+from database import session
+
+@pytest.mark.parametrize("pool", [QueuePool, SingletonThreadPool, StaticPool, NullPool])
+def test_warm_pool_handles_every_pool_class(monkeypatch, tmp_path, pool):
+    target = create_engine(f"sqlite:///{tmp_path / 'warm.db'}", poolclass=pool)
+    connects = []
+    event.listen(target, "connect", lambda connection, record: connects.append(record))
+    monkeypatch.setattr(session, "engine", target)
+    monkeypatch.setattr(session, "read_engine", target)
+    monkeypatch.setenv("DB_POOL_WARM", "3")
+    session.warm_pool()
+    assert connects # At least one connection was opened and checked
+    if pool is QueuePool:
+        assert len(connects) == 3 and target.pool.checkedin() == 3
@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+
+from services.metrics import collect_stages, stage
+from services.resilience import mark_degraded, track_degraded
+from services.singleflight import SingleFlight, request_key
+
+def test_request_key():
+    key = request_key(b"cv", endpoint="match-cv", limit=10, interests=None)
+    assert key == request_key(b"cv", interests=None, limit=10, endpoint="match-cv") # Parameter order does not matter
+    assert key != request_key(b"cv2", endpoint="match-cv", limit=10, interests=None)
+    assert key != request_key(b"cv", endpoint="match-cv", limit=20, interests=None)
+
+class Computation:
+    def __init__(self):
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        return f"result {self.calls}"
+
+def test_concurrent_calls_share_one_computation():
+    async def scenario():
+        flights, compute = SingleFlight(), Computation()
+        callers = [asyncio.ensure_future(flights.do("k", compute)) for _ in range(3)]
+        await asyncio.sleep(0)
+        assert len(flights) == 1
+        compute.release.set()
+        results = await asyncio.gather(*callers)
+        assert compute.calls == 1
+        assert results == [("result 1", False), ("result 1", True), ("result 1", True)]
+        assert len(flights) == 0 # Nothing is kept once the computation finishes
+        assert await flights.do("k", compute) == ("result 2", False)
+
+    asyncio.run(scenario())
+
+def test_different_keys_run_separately():
+    async def scenario():
+        flights, compute = SingleFlight(), Computation()
+        compute.release.set()
+        results = await asyncio.gather(flights.do("a", compute), flights.do("b", compute))
+        assert compute.calls == 2
+        assert all(not shared for _, shared in results)
+
+    asyncio.run(scenario())
+
+def test_cancelled_caller_does_not_cancel_the_others():
+    async def scenario():
+        flights, compute = SingleFlight(), Computation()
+        first = asyncio.ensure_future(flights.do("k", compute))
+        second = asyncio.ensure_future(flights.do("k", compute))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        compute.release.set()
+        assert await second == ("result 1", True)
+        assert first.cancelled()
+
+    asyncio.run(scenario())
+
+def test_errors_reach_every_caller_and_are_not_kept():
+    async def scenario():
+        flights = SingleFlight()
+        release = asyncio.Event()
+
+        async def failing():
+            await release.wait()
+            raise RuntimeError("Azure unavailable")
+
+        callers = [asyncio.ensure_future(flights.do("k", failing)) for _ in range(2)]
+        await asyncio.sleep(0)
+        release.set()
+        for caller in callers:
+            with pytest.raises(RuntimeError):
+                await caller
+        assert len(flights) == 0
+
+    asyncio.run(scenario())
+
+def test_every_caller_gets_the_stages_and_degradations():
+    async def scenario():
+        flights = SingleFlight()
+        release = asyncio.Event()
+
+        async def compute():
+            with stage("gpt_summary"):
+                await release.wait()
+            mark_degraded("cv_summary")
+            return "result"
+
+        async def request():
+            # What MetricsMiddleware and DegradedModeMiddleware set up for each request
+            with collect_stages() as timings, track_degraded() as reasons:
+                with stage("upload_read"):
+                    pass
+                result, shared = await flights.do("k", compute)
+            return result, shared, [name for name, _ in timings], reasons
+
+        callers = [asyncio.ensure_future(request()) for _ in range(2)]
+        await asyncio.sleep(0)
+        release.set()
+        return await asyncio.gather(*callers)
+
+    for (result, shared, stages, reasons), expected_shared in zip(asyncio.run(scenario()), (False, True)):
+        assert (result, shared) == ("result", expected_shared)
+        assert stages == ["upload_read", "gpt_summary"]
+        assert reasons == ["cv_summary"]
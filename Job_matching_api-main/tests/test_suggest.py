@@ -0,0 +1,83 @@
+import random
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from models.database import CorpusState, JobPosting
+from services.suggest import SuggestIndex, _PrefixTable, clean_title, find_skills, load_skills, normalize
+
+POSTINGS = [
+    ("Data Engineer (H/F)", "Acme", "Python, SQL and Airflow"),
+    ("Data Engineer - Paris", "Acme", "Python and Spark"),
+    ("Senior Data Engineer", "Globex", "Kafka, Python"),
+    ("Data Analyst", "Globex", "SQL, Power BI and Excel"),
+    ("Backend Developer", "Initech", "Node.js, PostgreSQL and Docker"),
+]
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    JobPosting.__table__.create(engine)
+    CorpusState.__table__.create(engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([JobPosting(id=str(i), job_title=title, company=company, required_qualifications=skills)
+                     for i, (title, company, skills) in enumerate(POSTINGS)])
+    session.commit()
+    yield session
+    session.close()
+
+@pytest.fixture
+def index(db):
+    index = SuggestIndex()
+    index.build(db)
+    return index
+
+def test_normalize_and_clean_title():
+    assert normalize("  Développeur   C++ ") == "developpeur c++"
+    assert clean_title("Data Engineer (H/F)") == "Data Engineer"
+    assert clean_title("Entwickler m/w/d") == "Entwickler"
+    assert clean_title("Data Engineer - Paris") == "Data Engineer"
+    assert clean_title("") is None
+
+def test_find_skills():
+    skills = load_skills()
+    found = find_skills("Experience with Power BI, .NET and machine learning. Python.", skills)
+    assert {"power bi", ".net", "machine learning", "python"} <= found
+    assert "go" not in find_skills("Ready to go", skills)
+
+def test_suggests_by_word_start_most_frequent_first(index):
+    assert index.ready
+    titles = index.suggest("eng", kinds=("title",))
+    assert [item["text"] for item in titles] == ["Data Engineer", "Senior Data Engineer"]
+    assert titles[0]["count"] == 2 # Gender marker and location suffix are stripped before counting
+    assert index.suggest("glob", kinds=("company",)) == [{"text": "Globex", "kind": "company", "count": 2}]
+    assert index.suggest("pyth", kinds=("skill",)) == [{"text": "Python", "kind": "skill", "count": 3}]
+
+def test_suggest_across_kinds_and_limits(index):
+    results = index.suggest("d", limit=3)
+    assert len(results) == 3
+    assert [item["count"] for item in results] == sorted((item["count"] for item in results), reverse=True)
+    assert index.suggest("   ") == []
+    assert index.suggest("zzz") == []
+
+def test_not_ready_index_suggests_nothing():
+    assert SuggestIndex().suggest("data") == []
+
+def test_precomputed_prefixes_match_a_scan():
+    rng = random.Random(3)
+    words = ["data", "dev", "design", "devops", "engineer", "analyst", "architect", "manager", "machine"]
+    terms = {}
+    for _ in range(300):
+        key = " ".join(rng.sample(words, rng.randint(1, 3)))
+        terms[key] = (key.title(), rng.randint(1, 50))
+    precomputed, scanned = _PrefixTable(terms, 10, wide_range=4), _PrefixTable(terms, 10, wide_range=10 ** 6)
+    assert precomputed._top and not scanned._top
+    for prefix in ("d", "de", "dev", "m", "ma", "a", "e", "x"):
+        assert precomputed.search(prefix, 10) == scanned.search(prefix, 10)
+
+def test_validate_accepts_a_built_generation(db):
+    index = SuggestIndex()
+    tables, version = index.build_generation(db)
+    assert version == "0"
+    index.validate(tables)
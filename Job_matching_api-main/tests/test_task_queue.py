@@ -0,0 +1,204 @@
+import asyncio
+import hashlib
+import hmac
+import json
+
+import httpx
+import pytest
+
+from services.task_queue import (FAILED, PRIORITIES, QUEUED, RUNNING, SUCCEEDED, MemoryTaskBackend, QueueFull,
+                                 SQLiteTaskBackend, Task, TaskBackend, TaskQueue, validate_webhook_url,
+                                 webhook_address)
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return MemoryTaskBackend()
+    return SQLiteTaskBackend(str(tmp_path / "tasks.db"))
+
+def test_claims_by_priority_then_age(backend):
+    backend.put(Task("low", {}, PRIORITIES["low"], created_at=1.0), b"")
+    backend.put(Task("normal-1", {}, PRIORITIES["normal"], created_at=2.0), b"first")
+    backend.put(Task("normal-2", {}, PRIORITIES["normal"], created_at=3.0), b"")
+    backend.put(Task("high", {}, PRIORITIES["high"], created_at=4.0), b"")
+    assert backend.pending() == 4
+    claimed = [backend.claim() for _ in range(4)]
+    assert [task.task_id for task, _ in claimed] == ["high", "normal-1", "normal-2", "low"]
+    assert claimed[1][1] == b"first"
+    assert all(task.status == RUNNING for task, _ in claimed)
+    assert backend.claim() is None and backend.pending() == 0
+
+def test_finished_tasks_are_stored_and_expire(backend):
+    backend.put(Task("t", {"limit": 5}), b"cv")
+    task, _ = backend.claim()
+    task.status, task.result, task.degraded, task.finished_at = SUCCEEDED, [{"id": "job-1"}], ["embeddings"], 100.0
+    backend.finish(task)
+    stored = backend.get("t")
+    assert (stored.status, stored.result, stored.degraded, stored.params) == (SUCCEEDED, [{"id": "job-1"}],
+                                                                              ["embeddings"], {"limit": 5})
+    backend.expire(before=50.0)
+    assert backend.get("t") is not None
+    backend.expire(before=150.0)
+    assert backend.get("t") is None
+
+def test_sqlite_requeues_tasks_interrupted_by_a_restart(tmp_path):
+    path = str(tmp_path / "tasks.db")
+    SQLiteTaskBackend(path).put(Task("t", {}), b"cv")
+    assert SQLiteTaskBackend(path).claim()[0].task_id == "t" # The process dies while running it
+    restarted = SQLiteTaskBackend(path)
+    assert restarted.requeue_running() == 1
+    task, payload = restarted.claim()
+    assert (task.task_id, payload) == ("t", b"cv")
+
+@pytest.fixture
+def dns(monkeypatch):
+    """Resolver answering from a dict (host -> addresses) instead of the network"""
+    records = {"hooks.example.com": ["93.184.216.34"]}
+    monkeypatch.delenv("TASK_WEBHOOK_ALLOWED_HOSTS", raising=False)
+    monkeypatch.setattr("services.task_queue._resolve", lambda host, port: records.get(host) or
+                        ([host] if host[0].isdigit() or ":" in host else []))
+    return records
+
+def test_validate_webhook_url(dns):
+    assert validate_webhook_url("https://hooks.example.com/done") == "https://hooks.example.com/done"
+    assert webhook_address("https://hooks.example.com/done") == "93.184.216.34"
+    with pytest.raises(ValueError):
+        validate_webhook_url("file:///etc/passwd")
+    with pytest.raises(ValueError):
+        validate_webhook_url("https://unknown.example.com/")
+
+@pytest.mark.parametrize("url", [
+    "http://localhost:8001/admin",
+    "http://127.0.0.1/",
+    "http://169.254.169.254/latest/meta-data",
+    "http://10.0.0.5/",
+    "http://172.16.3.4/",
+    "http://192.168.1.10/",
+    "http://100.64.0.1/", # Carrier-grade NAT
+    "http://0.0.0.0/",
+    "http://[::1]/",
+    "http://[fe80::1]/",
+    "http://[fd00::1]/",
+    "http://[::ffff:127.0.0.1]/",
+    "http://224.0.0.1/",
+])
+def test_internal_webhook_hosts_are_rejected(dns, url):
+    dns["localhost"] = ["127.0.0.1", "::1"]
+    with pytest.raises(ValueError):
+        validate_webhook_url(url)
+
+def test_host_with_any_internal_address_is_rejected(dns):
+    dns["mixed.example.com"] = ["93.184.216.34", "10.1.2.3"]
+    with pytest.raises(ValueError):
+        validate_webhook_url("https://mixed.example.com/")
+
+def test_allowlist_replaces_the_address_check(dns, monkeypatch):
+    monkeypatch.setenv("TASK_WEBHOOK_ALLOWED_HOSTS", "hooks.internal, other.example.com")
+    assert webhook_address("https://hooks.internal/done") is None # Listed by the operator, may be internal
+    with pytest.raises(ValueError):
+        validate_webhook_url("http://169.254.169.254/latest")
+
+async def wait_finished(queue: TaskQueue, task_id: str) -> Task:
+    for _ in range(200):
+        task = await queue.get(task_id)
+        if task.status not in (QUEUED, RUNNING):
+            return task
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"Task {task_id} did not finish")
+
+def test_queue_runs_tasks_and_records_failures():
+    async def handler(params, payload):
+        if params.get("fail"):
+            raise RuntimeError("CV could not be parsed")
+        return {"cv_bytes": len(payload)}
+
+    async def scenario():
+        queue = TaskQueue(handler, MemoryTaskBackend(), workers=2)
+        await queue.start()
+        try:
+            ok = await queue.submit({}, b"12345")
+            failing = await queue.submit({"fail": True})
+            ok, failing = await wait_finished(queue, ok.task_id), await wait_finished(queue, failing.task_id)
+        finally:
+            await queue.stop()
+        assert (ok.status, ok.result) == (SUCCEEDED, {"cv_bytes": 5})
+        assert (failing.status, failing.error) == (FAILED, "CV could not be parsed")
+
+    asyncio.run(scenario())
+
+def test_submit_rejects_when_the_queue_is_full():
+    async def scenario():
+        queue = TaskQueue(lambda params, payload: None, MemoryTaskBackend(), workers=1, max_pending=2)
+        await queue.submit({}) # Not started, so nothing is claimed
+        await queue.submit({})
+        with pytest.raises(QueueFull) as raised:
+            await queue.submit({})
+        assert raised.value.retry_after >= 1
+
+    asyncio.run(scenario())
+
+def test_webhook_is_signed_and_retried(monkeypatch, dns):
+    monkeypatch.setenv("TASK_WEBHOOK_SECRET", "s3cret")
+    received = []
+
+    def receiver(request):
+        received.append(request)
+        return httpx.Response(503 if len(received) == 1 else 200)
+
+    async def handler(params, payload):
+        return {"ok": True}
+
+    async def scenario():
+        queue = TaskQueue(handler, MemoryTaskBackend(), workers=1)
+        await queue.start()
+        await queue._http.aclose()
+        queue._http = httpx.AsyncClient(transport=httpx.MockTransport(receiver))
+        try:
+            task = await queue.submit({}, webhook_url="https://hooks.example.com/done")
+            await wait_finished(queue, task.task_id)
+            for _ in range(300): # The retry comes after a one-second backoff
+                if len(received) == 2:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await queue.stop()
+        return task
+
+    task = asyncio.run(scenario())
+    assert len(received) == 2 # The 503 was retried
+    body = received[-1].content
+    assert json.loads(body)["task_id"] == task.task_id
+    assert received[-1].headers["X-Signature-SHA256"] == hmac.new(b"s3cret", body, hashlib.sha256).hexdigest()
+    # Sent to the address that was checked, for the named host
+    assert received[-1].url.host == "93.184.216.34"
+    assert received[-1].headers["Host"] == "hooks.example.com"
+    assert received[-1].extensions["sni_hostname"] == "hooks.example.com"
+
+def test_webhook_rebound_to_an_internal_address_is_not_delivered(dns):
+    received = []
+
+    async def handler(params, payload):
+        return {"ok": True}
+
+    async def scenario():
+        queue = TaskQueue(handler, MemoryTaskBackend(), workers=1)
+        await queue.start()
+        await queue._http.aclose()
+        queue._http = httpx.AsyncClient(transport=httpx.MockTransport(lambda r: received.append(r) or httpx.Response(200)))
+        try:
+            task = await queue.submit({}, webhook_url="https://hooks.example.com/done") # Public when submitted
+            dns["hooks.example.com"] = ["127.0.0.1"]
+            await wait_finished(queue, task.task_id)
+            await asyncio.sleep(0.2)
+        finally:
+            await queue.stop()
+
+    asyncio.run(scenario())
+    assert received == []
+
+def test_incomplete_backend_fails_at_construction():
+    class NoExpiry(TaskBackend):
+        put = claim = finish = get = pending = lambda self, *args: None
+
+    with pytest.raises(TypeError):
+        NoExpiry()
@@ -1,4 +1,5 @@
 import os
+import sys
 import numpy as np
 from sqlalchemy import create_engine, Column, Integer, String, Float, Text, ForeignKey, ARRAY, Index
 from sqlalchemy.ext.declarative import declarative_base
@@ -7,9 +8,11 @@ from sqlalchemy import func
 from sqlalchemy.dialects.postgresql import TSVECTOR, JSONB
 from typing import List, Dict, Any, Tuple
 from tqdm import tqdm
-from openai import OpenAI
+from openai import AzureOpenAI
 import pymupdf4llm
-from groq import Groq
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Job_matching_api-main"))
+from services.azure_gateway import get_gateway
 
 # Define SQLAlchemy Base
 Base = declarative_base()
@@ -47,22 +50,29 @@ class JobEmbeddingStore:
         self.openai_api_key = openai_api_key or os.environ.get("AZURE_OPENAI_API_KEY")
         if not self.openai_api_key:
             raise ValueError("Azure OpenAI API key is required")
-        self.openai_client = OpenAI(
+        # The API's Azure gateway: its keep-alive pool, deadlines, retries and per-deployment concurrency caps
+        gateway = get_gateway()
+        self.http_client = gateway.http_client
+        self.openai_client = AzureOpenAI(
             api_key=self.openai_api_key,
             api_version="2024-02-15-preview",
             azure_endpoint=os.environ.get("AZURE_OPENAI_ENDPOINT", "https://your-resource.openai.azure.com/"),
             azure_deployment="text-embedding-3-small",
-            default_headers={"api-key": self.openai_api_key}
+            timeout=gateway.timeout("embeddings"),
+            max_retries=gateway.max_retries("embeddings"),
+            http_client=self.http_client
         )
 
         
         # Initialize Azure OpenAI for summarization
-        self.openai_client_gpt4 = OpenAI(
+        self.openai_client_gpt4 = AzureOpenAI(
             api_key=self.openai_api_key,
             api_version="2024-02-15-preview",
             azure_endpoint=os.environ.get("AZURE_OPENAI_ENDPOINT", "https://your-resource.openai.azure.com/"),
             azure_deployment="gpt-4",
-            default_headers={"api-key": self.openai_api_key}
+            timeout=gateway.timeout("chat"),
+            max_retries=gateway.max_retries("chat"),
+            http_client=self.http_client
         )
     
     def store_job(self, job_title: str, job_description: str, 
@@ -175,7 +185,7 @@ class JobEmbeddingStore:
                         job_description=job_descriptions[idx],
                         job_summary=job_summaries[idx],
                         embedding=embedding,
-                        metadata=metadata_list[idx]
+                        job_metadata=metadata_list[idx]
                     )
                     
                     # Create tsvector